@@ -2,6 +2,9 @@
 Convert your Python functions into CLI commands
 """
 
+from ._locator import FeatureLocator
+from ._output import register_encoder
+from ._types import register_converter
 from .dynacli import main
 
 __version__ = "1.0.9b0"
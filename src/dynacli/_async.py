@@ -0,0 +1,118 @@
+"""
+Running coroutine and async generator commands on a managed event loop
+"""
+
+import asyncio
+import signal
+import sys
+from importlib import import_module
+from inspect import isasyncgen
+from typing import Any, AsyncIterator, Awaitable, Callable, Final, Optional, Union
+
+from ._output import make_writer
+
+LoopFactory = Callable[[], asyncio.AbstractEventLoop]
+
+AUTO_LOOP: Final[str] = "auto"
+
+
+def _get_uvloop_factory() -> LoopFactory:
+    import uvloop  # type: ignore
+
+    return uvloop.new_event_loop
+
+
+def get_loop_factory(name: Optional[str]) -> LoopFactory:
+    """
+    :param name: "auto" (uvloop if it is installed, asyncio otherwise), "asyncio",
+        "uvloop" or "<module>:<function>" returning a new event loop
+    :return: the event loop factory
+    """
+    if not name or name == AUTO_LOOP:
+        try:
+            return _get_uvloop_factory()
+        except ImportError:
+            return asyncio.new_event_loop
+    if name == "asyncio":
+        return asyncio.new_event_loop
+    if name == "uvloop":
+        return _get_uvloop_factory()
+    module, sep, factory = name.partition(":")
+    if not sep:
+        raise ValueError(f"Unsupported event loop {name}")
+    return getattr(import_module(module), factory)
+
+
+async def _stream(results: AsyncIterator[Any], format_: Optional[str]) -> None:
+    write = make_writer(format_, sys.stdout)
+    async for result in results:
+        write(result)
+        sys.stdout.flush()
+
+
+def _cancel_all(loop: asyncio.AbstractEventLoop) -> None:
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+
+def _close(loop: asyncio.AbstractEventLoop) -> None:
+    try:
+        _cancel_all(loop)
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        if hasattr(loop, "shutdown_default_executor"):  # Python 3.9+
+            loop.run_until_complete(loop.shutdown_default_executor())
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def run_async(
+    result: Union[Awaitable[Any], AsyncIterator[Any]],
+    event_loop: Optional[str],
+    stream_format: Optional[str] = None,
+) -> Any:
+    """
+    Run the coroutine or any other awaitable to completion, or print every item of the async generator
+    as soon as it arrives; SIGINT cancels the command and raises KeyboardInterrupt
+    :param result: what the command function has returned
+    :param event_loop: the event loop name, see get_loop_factory
+    :param stream_format: the format of the async generator items, see make_writer
+    :return: the awaitable result
+    """
+    loop = get_loop_factory(event_loop)()
+    asyncio.set_event_loop(loop)
+    try:
+        # ensure_future takes any awaitable, not only coroutines
+        task = asyncio.ensure_future(
+            (
+                _stream(result, stream_format)  # type: ignore
+                if isasyncgen(result)
+                else result
+            ),
+            loop=loop,
+        )
+        interrupted = []
+
+        def _interrupt() -> None:
+            interrupted.append(True)
+            task.cancel()
+
+        try:
+            loop.add_signal_handler(signal.SIGINT, _interrupt)
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass  # e.g. Windows or not the main thread, KeyboardInterrupt as usual
+        try:
+            return loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            if interrupted:
+                raise KeyboardInterrupt from None
+            raise
+        finally:
+            try:
+                loop.remove_signal_handler(signal.SIGINT)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
+    finally:
+        _close(loop)
@@ -0,0 +1,476 @@
+"""
+Shell completion answered from the cached command tree, without importing the features
+"""
+
+import marshal
+import os
+import re
+from contextlib import redirect_stderr, redirect_stdout
+from importlib import import_module
+from io import StringIO
+from itertools import product
+from typing import Any, Dict, Final, Iterator, List, Optional, Tuple
+
+from ._index import _scan_dir, _stat_key, get_cache_file
+from ._output import ENCODERS
+from ._static import get_choices, scan_module_source
+from .dynacli import (
+    _ARGS_FROM_OPTION,
+    _OUTPUT_OPTION,
+    _describe_module,
+    _describe_static,
+    _get_cli_name,
+    _get_command_meta,
+    _is_public,
+    _process_type,
+)
+
+COMPLETION_FORMAT: Final[int] = 3
+
+Node = Dict[str, Any]
+Candidate = Tuple[str, Optional[str]]
+
+_HELP_OPTIONS: Final[Tuple[str, ...]] = ("-h", "--help")
+_VERSION_OPTIONS: Final[Tuple[str, ...]] = ("-v", "--version")
+_VAR_KINDS: Final[Tuple[str, ...]] = ("VAR_POSITIONAL", "VAR_KEYWORD")
+
+_BASH: Final[str] = """\
+_dynacli_complete_{name}() {{
+    local IFS=$'\\n'
+    COMPREPLY=($("${{COMP_WORDS[0]}}" __complete "${{COMP_WORDS[@]:1:COMP_CWORD}}" 2>/dev/null))
+}}
+complete -o default -F _dynacli_complete_{name} {prog}
+"""
+
+_ZSH: Final[str] = """\
+#compdef {prog}
+_dynacli_complete_{name}() {{
+    local -a candidates
+    candidates=("${{(@f)$("${{words[1]}}" __complete "${{(@)words[2,CURRENT]}}" 2>/dev/null)}}")
+    compadd -a candidates
+}}
+compdef _dynacli_complete_{name} {prog}
+"""
+
+_FISH: Final[str] = """\
+function __dynacli_complete_{name}
+    set -l tokens (commandline -opc) (commandline -ct)
+    $tokens[1] __complete --describe $tokens[2..-1] 2>/dev/null
+end
+complete -c {prog} -f -a '(__dynacli_complete_{name})'
+"""
+
+SCRIPTS: Final[Dict[str, str]] = {"bash": _BASH, "zsh": _ZSH, "fish": _FISH}
+
+
+def make_script(shell: str, prog: str) -> str:
+    """
+    :param shell: bash, zsh or fish
+    :param prog: the CLI name
+    :return: the completion script calling `<CLI> __complete`
+    """
+    try:
+        template = SCRIPTS[shell]
+    except KeyError:
+        raise ValueError(
+            f"Unsupported shell {shell}, choose from {', '.join(SCRIPTS)}"
+        ) from None
+    return template.format(prog=prog, name=re.sub(r"\W", "_", prog))
+
+
+def _get_choices(type_: Any) -> List[str]:
+    """
+    :param type_: the manifest type spec, ("enum", name, members) for Enums,
+        ("literal", values) for Literal, ("generic", "Union", [X, "None"]) for Optional
+    :return: the Enum member names or the Literal values, the same choices
+        as _process_type gives
+    """
+    if not isinstance(type_, (list, tuple)):
+        return []
+    if type_[0] == "enum":
+        return list(type_[2])
+    if type_[0] == "literal":
+        return [str(value) for value in type_[1]]
+    if type_[0] == "generic" and type_[1] in ("Union", "|"):
+        args = [arg for arg in type_[2] if arg != "None"]
+        return _get_choices(args[0]) if len(args) == 1 else []
+    return []
+
+
+def _slim(node: Node) -> Node:
+    """
+    Keep only what the completion needs from the manifest tree node
+    """
+    slim: Node = {
+        "kind": node["kind"],
+        "help": node["help"],
+        "version": bool(node.get("version")),
+    }
+    if node["kind"] == "feature":
+        slim["children"] = {
+            name: _slim(child) for name, child in node["children"].items()
+        }
+    elif node["kind"] == "command":
+        slim["params"] = node["params"] and [
+            (kind, _get_choices(type_)) for _, kind, type_, _ in node["params"]
+        ]
+    return slim
+
+
+def _iter_param_candidates(
+    params: List[Tuple[str, List[str]]], args: List[str], text: str
+) -> Iterator[str]:
+    """
+    The Enum choices of the parameter the text is going to be
+    """
+    positional = [arg for arg in args if "=" not in arg and not arg.startswith("-")]
+    for kind, choices in params:
+        if kind == "VAR_KEYWORD":
+            name, eq, _ = text.partition("=")
+            if eq:
+                yield from (f"{name}={choice}" for choice in choices)
+            return
+        if "=" in text:
+            continue
+        if kind == "VAR_POSITIONAL" or not positional:
+            yield from choices
+            return
+        positional.pop(0)
+
+
+def _get_node_candidates(
+    node: Node, args: List[str], text: str, root: bool
+) -> List[Candidate]:
+    if node["kind"] == "feature":
+        candidates = [
+            (name, child["help"])
+            for name, child in node["children"].items()
+            if child["help"] is not None
+        ]
+    elif node["kind"] == "command" and node["params"] is not None:
+        candidates = [
+            (choice, None)
+            for choice in _iter_param_candidates(node["params"], args, text)
+        ]
+    else:
+        return []
+    if text.startswith("-"):
+        variadic = node["kind"] == "command" and any(
+            kind in _VAR_KINDS for kind, _ in node["params"]
+        )
+        options = (
+            *_HELP_OPTIONS,
+            *(_VERSION_OPTIONS if node["version"] else ()),
+            *((_OUTPUT_OPTION,) if root else ()),
+            *((_ARGS_FROM_OPTION,) if variadic else ()),
+        )
+        candidates += [(option, None) for option in options]
+    return candidates
+
+
+def complete(tree: Node, words: List[str]) -> List[Candidate]:
+    """
+    Find the completion candidates for the last word
+    :param tree: the command tree made by load_tree
+    :param words: the command line words after the CLI name, the last one is being typed
+    :return: the matching names with their help
+    """
+    *args, text = words or [""]
+    if args and args[-1] == _OUTPUT_OPTION:
+        return [(name, None) for name in ENCODERS if name.startswith(text)]
+    node = tree
+    for i, arg in enumerate(args):
+        if node["kind"] != "feature":
+            args = args[i:]
+            break
+        if arg.startswith("-") or args[i - 1 : i] == [_OUTPUT_OPTION]:
+            continue
+        node = node["children"].get(_get_cli_name(arg))
+        if node is None:
+            return []
+    else:
+        args = []
+    return [
+        (name, help_)
+        for name, help_ in _get_node_candidates(node, args, text, node is tree)
+        if name.startswith(text)
+    ]
+
+
+class _TreeBuilder:
+    """
+    Builds the command tree the same way the discovery does, but from the module
+    sources instead of the imported modules, see _describe_source; only the modules
+    which cannot be read statically are imported. The module descriptions of the
+    previous tree are reused as long as the module files stay the same.
+    """
+
+    def __init__(
+        self,
+        search_path: List[str],
+        root_packages: Optional[List[str]],
+        files: Dict[str, Any],
+    ) -> None:
+        self._search_path = [p if p.endswith("/") else f"{p}/" for p in search_path]
+        self._root_packages = (
+            [r if r.endswith(".") else f"{r}." for r in root_packages]
+            if root_packages
+            else [""]
+        )
+        self._cached = files
+        self.dirs: Dict[str, Optional[List[int]]] = {}
+        self.files: Dict[str, Any] = {}
+
+    def _list(self, packages: List[str]) -> List[Tuple[str, str, Optional[str]]]:
+        """
+        :param packages: the package name prefixes, e.g. "cli.dev."
+        :return: the sorted modules of the package directories: the name, the full
+            name and the file path; the first directory wins
+        """
+        found: Dict[str, Tuple[str, Optional[str]]] = {}
+        for package, path_ in product(packages, self._search_path):
+            dir_ = (path_ + package.replace(".", "/"))[:-1]
+            self.dirs[dir_] = _stat_key(dir_)
+            if self.dirs[dir_] is not None:
+                for name, _, file_ in _scan_dir(dir_):
+                    found.setdefault(name, (package + name, file_))
+        return [(name, *found[name]) for name in sorted(found)]
+
+    def _describe(self, name: str, full_name: str, file_: Optional[str]) -> Node:
+        key = _stat_key(file_) if file_ else None
+        cached = self._cached.get(file_)
+        if cached is not None and key is not None and cached["stat"] == key:
+            description = cached["description"]
+        else:
+            description = _describe_statically(name, file_) if file_ else None
+            if description is None:
+                description = _describe_imported(name, full_name)
+        if key is not None:
+            self.files[file_] = {"stat": key, "description": description}  # type: ignore
+        return description
+
+    def _discover(self, path_: List[str], full_name: str, help_: str) -> Node:
+        """
+        The packages importing their commands and features in __init__.py take
+        the discovery, see _ManifestBuilder; all their directories are watched
+        """
+        from ._manifest import _ManifestBuilder
+
+        for package, root in product([f"{full_name}."], self._search_path):
+            for dir_, dirs, _ in os.walk((root + package.replace(".", "/"))[:-1]):
+                dirs[:] = [d for d in dirs if d != "__pycache__"]
+                self.dirs[dir_] = _stat_key(dir_)
+        node = _ManifestBuilder(self._search_path, self._root_packages).walk(
+            path_, help_
+        )
+        return _slim(node)
+
+    def module_node(
+        self, path_: List[str], name: str, full_name: str, file_: Optional[str]
+    ) -> Node:
+        try:
+            description = self._describe(name, full_name, file_)
+        except Exception as err:
+            message = err.msg if isinstance(err, ImportError) else str(err)
+            return {
+                "kind": "error",
+                "help": f"[ERROR] failed to import {name} - {message}",
+                "version": False,
+            }
+        if description["kind"] == "command":
+            return _command_node(name, description, description["help"])
+        if description["kind"] == "feature":
+            names = description["all"]
+            children = {
+                name_: _command_node(name_, description, description["commands"][name_])
+                for name_ in (description["commands"] if names is None else names)
+                if name_ in description["commands"]
+            }
+        elif description["imported"]:
+            return self._discover(path_, full_name, description["help"])
+        else:
+            children = self._package_children(path_, full_name, description)
+        return {
+            "kind": "feature",
+            "help": description["help"],
+            "version": bool(description["version"]),
+            "children": children,
+        }
+
+    def _package_children(
+        self, path_: List[str], full_name: str, description: Node
+    ) -> Node:
+        modules = self._list([f"{full_name}."])
+        if description["all"] is not None:
+            files = {name: (name_, file_) for name, name_, file_ in modules}
+            return {
+                _get_cli_name(name): self.module_node(
+                    [*path_, _get_cli_name(name)], name, *files[name]
+                )
+                for name in description["all"]
+                if _is_public(name) and name in files
+            }
+        commands = description["commands"]
+        children = {
+            _get_cli_name(name): self.module_node(
+                [*path_, _get_cli_name(name)], name, name_, file_
+            )
+            for name, name_, file_ in modules
+            if _is_public(name) and name not in commands
+        }
+        children.update(
+            # the package commands are registered without help, as by the discovery
+            (_get_cli_name(name), _command_node(name, description, None))
+            for name in commands
+        )
+        return children
+
+    def build(self) -> Node:
+        return {
+            "kind": "feature",
+            "help": None,
+            "version": False,
+            "children": {
+                _get_cli_name(name): self.module_node(
+                    [_get_cli_name(name)], name, full_name, file_
+                )
+                for name, full_name, file_ in self._list(self._root_packages)
+                if _is_public(name)
+            },
+        }
+
+
+def _command_node(name: str, description: Node, help_: Optional[str]) -> Node:
+    return {
+        "kind": "command",
+        "help": help_,
+        "version": bool(description["version"]),
+        "params": description["params"].get(name),
+    }
+
+
+def _describe_statically(name: str, file_: str) -> Optional[Node]:
+    """
+    :return: the module description read from its source, with the argument choices;
+        None if the module requires import, as well as the package importing
+        anything in __init__.py, which might be its commands and features
+    """
+    module = scan_module_source(file_)
+    info = None if module is None else _describe_static(name, file_, module)
+    if info is None or (
+        info["kind"] == "package"
+        and (module["star_import"] or any(map(_is_public, module["bound"])))  # type: ignore
+    ):
+        return None
+    return {
+        **info,
+        "imported": False,
+        "params": {
+            name_: [
+                (kind, get_choices(annotation, module["enums"]))  # type: ignore
+                for _, kind, annotation in params
+            ]
+            for name_, params in info["params"].items()
+        },
+    }
+
+
+def _get_arg_choices(annotation: Any) -> List[str]:
+    try:
+        _, choices = _process_type(annotation)
+    except ValueError:
+        return []
+    return [str(choice) for choice in choices or ()]
+
+
+def _describe_imported(name: str, full_name: str) -> Node:
+    """
+    :return: the description of the imported module, with the argument choices
+    :raises Exception: if the module fails to import
+    """
+    with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+        module = import_module(full_name)
+    info = _describe_module(name, module)
+    return {
+        **info,
+        "imported": True,
+        "params": {
+            name_: [
+                (param.kind.name, _get_arg_choices(param.annotation))
+                for param in _get_command_meta(module.__dict__[name_]).parameters
+            ]
+            for name_ in info["params"]
+        },
+    }
+
+
+def _load(file_: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(file_, "rb") as f:
+            data = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if isinstance(data, dict) and data.get("format") == COMPLETION_FORMAT:
+        return data
+    return None
+
+
+def _save(file_: str, builder: _TreeBuilder, tree: Node) -> None:
+    from tempfile import NamedTemporaryFile
+
+    dir_ = os.path.dirname(file_)
+    try:
+        os.makedirs(dir_, exist_ok=True)
+        with NamedTemporaryFile("wb", dir=dir_, delete=False) as f:
+            marshal.dump(
+                {
+                    "format": COMPLETION_FORMAT,
+                    "dirs": builder.dirs,
+                    "files": builder.files,
+                    "tree": tree,
+                },
+                f,
+            )
+        os.replace(f.name, file_)
+    except (OSError, ValueError):
+        pass
+
+
+def get_default_cache_dir() -> str:
+    return os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "dynacli"
+    )
+
+
+def load_tree(
+    search_path: List[str],
+    root_packages: Optional[List[str]],
+    cache_dir: str,
+    manifest_file: Optional[str],
+) -> Node:
+    """
+    Get the command tree from the frozen manifest if there is one, otherwise
+    from the cache, rebuilding it from the module sources if any directory
+    in the search path has changed
+    :param search_path: the list of paths to look for features
+    :param root_packages: (optional) the list of root package names
+    :param cache_dir: the cache directory
+    :param manifest_file: (optional) the frozen manifest file
+    :return: the command tree with just the names, help and Enum choices
+    """
+    if manifest_file:
+        from ._manifest import load_manifest
+
+        manifest = load_manifest(manifest_file)
+        if manifest is not None:
+            return _slim(manifest["tree"])
+    file_ = get_cache_file(cache_dir, search_path, root_packages, "complete.marshal")
+    data = _load(file_)
+    if data is not None and all(
+        _stat_key(dir_) == key for dir_, key in data["dirs"].items()
+    ):
+        return data["tree"]
+    builder = _TreeBuilder(search_path, root_packages, data["files"] if data else {})
+    tree = builder.build()
+    _save(file_, builder, tree)
+    return tree
@@ -0,0 +1,221 @@
+"""
+File argument types: the command gets the opened file, or the read-only mapped file
+content, instead of the path; `-` stands for stdin. The values of *args and **kwargs
+can be read from files as well, see read_args()
+"""
+
+import os
+import stat
+import sys
+from argparse import ArgumentTypeError
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    IO,
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Final,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+STDIN: Final[str] = "-"
+RESPONSE_FILE_PREFIX: Final[str] = "@"
+
+# The argument files and stdin are read by chunks of this size
+CHUNK_SIZE: Final[int] = 64 * 1024
+
+
+# What the argument types of the running command line have opened, per thread
+_opened: ContextVar[Optional[List[Any]]] = ContextVar("opened", default=None)
+
+# Whether the running command line has read stdin or argument files, per thread
+_input_read: ContextVar[bool] = ContextVar("input_read", default=False)
+
+
+def _close(resource: Any) -> None:
+    if isinstance(resource, memoryview):
+        obj = resource.obj
+        resource.release()
+        resource = obj
+    try:
+        resource.close()
+    except BufferError:  # the command keeps a slice of the mapped file, leave it to GC
+        pass
+
+
+@contextmanager
+def closing_opened_files() -> Iterator[None]:
+    """
+    Close the files opened by the argument types while parsing the command line,
+    once the command has completed
+    """
+    opened: List[Any] = []
+    token = _opened.set(opened)
+    input_token = _input_read.set(False)
+    try:
+        yield
+    finally:
+        _input_read.reset(input_token)
+        _opened.reset(token)
+        for resource in reversed(opened):
+            _close(resource)
+
+
+def has_read_input() -> bool:
+    """
+    :return: whether the running command line has read stdin or argument files,
+        stdin cannot be read again to parse the command line once more
+    """
+    return _input_read.get()
+
+
+def _keep(resource: Any) -> None:
+    opened = _opened.get()
+    if opened is not None:
+        opened.append(resource)
+
+
+def _open(value: str, mode: str) -> IO[Any]:
+    if value == STDIN:
+        return sys.stdin.buffer if "b" in mode else sys.stdin
+    try:
+        file_ = open(value, mode)
+    except OSError as err:
+        raise ArgumentTypeError(f"can't open '{value}': {err.strerror}") from None
+    _keep(file_)
+    return file_
+
+
+def open_binary(value: str) -> BinaryIO:
+    """
+    :param value: the file path or - for stdin
+    :return: the file opened for reading bytes
+    """
+    return _open(value, "rb")  # type: ignore
+
+
+def open_text(value: str) -> TextIO:
+    """
+    :param value: the file path or - for stdin
+    :return: the file opened for reading text
+    """
+    return _open(value, "r")  # type: ignore
+
+
+def map_file(value: str) -> memoryview:
+    """
+    :param value: the file path or - for stdin
+    :return: the read-only view of the file content, memory-mapped for the regular
+        files, read into memory for stdin, pipes and the like
+    """
+    file_ = _open(value, "rb")
+    _input_read.set(True)
+    fd = file_.fileno()
+    if not stat.S_ISREG(os.fstat(fd).st_mode) or not os.fstat(fd).st_size:
+        return memoryview(file_.read())
+    import mmap
+
+    view = memoryview(mmap.mmap(fd, 0, access=mmap.ACCESS_READ))
+    _keep(view)
+    return view
+
+
+def _detect_separator(read: Callable[[int], bytes]) -> Tuple[bytes, bytes]:
+    """
+    :return: NUL if it comes first, otherwise newline; and what has been read
+    """
+    buffer = b""
+    while True:
+        chunk = read(CHUNK_SIZE)
+        buffer += chunk
+        nul, newline = buffer.find(b"\0"), buffer.find(b"\n")
+        if nul >= 0 and (newline < 0 or nul < newline):
+            return b"\0", buffer
+        if newline >= 0 or not chunk:
+            return b"\n", buffer
+
+
+def _split_values(buffer: bytes, separator: bytes) -> Tuple[List[bytes], bytes]:
+    """
+    :return: the complete values and the incomplete rest
+    """
+    *values, rest = buffer.split(separator)
+    if separator == b"\n":  # skip the empty lines, take care of CRLF
+        values = [value.rstrip(b"\r") for value in values if value.rstrip(b"\r")]
+    return values, rest
+
+
+def read_args(file_: BinaryIO) -> Iterator[str]:
+    """
+    Read the values lazily, as they arrive to pipes and stdin
+    :param file_: the file opened for reading bytes
+    :return: the values one per line, or NUL-separated like `find -print0` output,
+        decoded the same way as the command line arguments
+    """
+    _input_read.set(True)
+    read = getattr(file_, "read1", file_.read)
+    separator, buffer = _detect_separator(read)
+    while True:
+        values, buffer = _split_values(buffer, separator)
+        yield from map(os.fsdecode, values)
+        chunk = read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+    if separator == b"\n":
+        buffer = buffer.rstrip(b"\r")
+    if buffer:
+        yield os.fsdecode(buffer)
+
+
+def expand_response_files(values: List[str]) -> List[str]:
+    """
+    Replace every @file value by the values read from the file, @- reads stdin,
+    @@value stands for the literal @value
+    :param values: the command line values
+    :return: the values with the files expanded, as is if there are none
+    :raises ArgumentTypeError: if a file cannot be opened
+    """
+    if not any(value.startswith(RESPONSE_FILE_PREFIX) for value in values):
+        return values
+    expanded: List[str] = []
+    for value in values:
+        if value.startswith(RESPONSE_FILE_PREFIX * 2):
+            expanded.append(value[1:])
+        elif value.startswith(RESPONSE_FILE_PREFIX) and len(value) > 1:
+            expanded.extend(read_args(open_binary(value[1:])))
+        else:
+            expanded.append(value)
+    return expanded
+
+
+_FILE_TYPES: Final[Dict[Any, Callable[[str], Any]]] = {
+    BinaryIO: open_binary,
+    IO[bytes]: open_binary,
+    TextIO: open_text,
+    IO[str]: open_text,
+    memoryview: map_file,
+}
+
+
+def get_file_type(type_: Any) -> Optional[Callable[[str], Any]]:
+    """
+    :param type_: the parameter annotation
+    :return: the argument type for the file types, None for anything else
+    """
+    try:
+        if type_ in _FILE_TYPES:
+            return _FILE_TYPES[type_]
+    except TypeError:  # unhashable
+        return None
+    # the module annotated with a pathlib class has imported pathlib already
+    pathlib = sys.modules.get("pathlib")
+    if pathlib and isinstance(type_, type) and issubclass(type_, pathlib.PurePath):
+        return type_
+    return None
@@ -0,0 +1,466 @@
+"""
+Persistent on-disk index of the feature tree
+"""
+
+import json
+import os
+import zlib
+from pkgutil import iter_modules
+from time import monotonic, time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Final,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypedDict,
+)
+
+from ._locator import FeatureLocator
+from ._profile import span
+
+INDEX_FORMAT: Final[int] = 1
+
+# The modules found absent in the process, with the stat keys of their package
+# directories; the persistent index keeps them across the processes as well
+_absent: Dict[str, Dict[str, List[int]]] = {}
+
+# The directory listings from the feature locator are trusted for this many seconds
+LOCATED_TTL: Final[float] = 300.0
+
+Fingerprint = Dict[str, Tuple[int, int]]
+
+
+class ModuleInfo(TypedDict):
+    """Everything needed for building help and routing without importing a module"""
+
+    kind: str  # "package", "feature" (module as feature) or "command"
+    help: str
+    doc: Optional[str]
+    all: Optional[List[str]]
+    version: Optional[str]
+    commands: Dict[str, str]
+    params: Dict[str, List[Tuple[str, str, Optional[str]]]]
+
+
+class CommandDocs(TypedDict):
+    """Parsed command docstring"""
+
+    description: str
+    param_docs: Dict[str, str]
+
+
+def _stat_key(path_: str) -> Optional[List[int]]:
+    try:
+        stat_ = os.stat(path_)
+    except OSError:
+        return None
+    return [stat_.st_mtime_ns, stat_.st_size]
+
+
+def _find_module_file(path_: str, name: str, ispkg: bool) -> Optional[str]:
+    file_ = (
+        os.path.join(path_, name, "__init__.py")
+        if ispkg
+        else os.path.join(path_, f"{name}.py")
+    )
+    return file_ if os.path.isfile(file_) else None
+
+
+def _scan_dir(path_: str) -> List[Tuple[str, bool, Optional[str]]]:
+    return [
+        (info.name, info.ispkg, _find_module_file(path_, info.name, info.ispkg))
+        for info in iter_modules([path_])
+    ]
+
+
+class _Scan:
+    """
+    Listing of one directory running in a daemon thread, so that a hanging mount
+    does not keep the CLI from exiting. The thread only reads what it is given,
+    the index is updated by the main thread.
+    """
+
+    def __init__(self, path_: str, cached: Optional[Any], slots: Any) -> None:
+        import threading
+
+        self.path = path_
+        self.key: Optional[List[int]] = None
+        self.modules: List[Tuple[str, bool, Optional[str]]] = []
+        self._cached = cached
+        self._slots = slots
+        self._done = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self) -> None:
+        with self._slots:
+            try:
+                self.key = _stat_key(self.path)
+                if self.key is None:
+                    return
+                if self._cached and self._cached["stat"] == self.key:
+                    self.modules = [tuple(m) for m in self._cached["modules"]]
+                else:
+                    self.modules = _scan_dir(self.path)
+            finally:
+                self._done.set()
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        """
+        :param timeout: seconds to wait for, None for as long as it takes
+        :return: whether the listing is complete
+        """
+        return self._done.wait(timeout)
+
+
+def get_cache_file(
+    cache_dir: str, search_path: List[str], root_packages: Any, kind: str
+) -> str:
+    """
+    :param cache_dir: the cache directory
+    :param search_path: the list of paths to look for features
+    :param root_packages: the list of root package names
+    :param kind: the cache file name prefix and extension, e.g. "index.json"
+    :return: the cache file path, distinct for every CLI
+    """
+    data = json.dumps([search_path, root_packages]).encode()
+    key = f"{zlib.crc32(data):08x}{zlib.adler32(data):08x}"
+    prefix, _, ext = kind.partition(".")
+    return os.path.join(cache_dir, f"{prefix}-{key}.{ext}")
+
+
+def get_fingerprint(search_path: List[str]) -> Fingerprint:
+    """
+    Stat all the directories and Python files in the search path
+    :param search_path: the list of paths to look for features
+    :return: the mtime and size of every directory and Python file
+    """
+    fingerprint: Fingerprint = {}
+    for root in search_path:
+        for dir_, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d != "__pycache__"]
+            for name in [".", *(f for f in files if f.endswith(".py"))]:
+                file_ = os.path.join(dir_, name)
+                try:
+                    stat_ = os.stat(file_)
+                except OSError:
+                    continue
+                fingerprint[file_] = (stat_.st_mtime_ns, stat_.st_size)
+    return fingerprint
+
+
+class _FeatureIndex:
+    """
+    Cache of directory listings and module metadata.
+    Directory listings are invalidated by the directory mtime,
+    module metadata by the module file mtime and size.
+    Without a file the index keeps nothing and every lookup misses.
+    With more than one scan worker the directories of a search path level
+    are listed concurrently, see iter_modules. With a feature locator they are
+    listed by it instead, all at once, and kept for LOCATED_TTL.
+    """
+
+    def __init__(
+        self,
+        file_: Optional[str],
+        scan_workers: int = 1,
+        scan_timeout: Optional[float] = None,
+        locator: Optional[FeatureLocator] = None,
+    ) -> None:
+        self._file = file_
+        self._dirs: Dict[str, Any] = {}
+        self._located: Dict[str, Any] = {}
+        self._absent: Dict[str, Dict[str, List[int]]] = {}
+        self._modules: Dict[str, Any] = {}
+        self._commands: Dict[str, Any] = {}
+        self._dirty = False
+        self._scan_workers = scan_workers
+        self._scan_timeout = scan_timeout
+        self._scans: Dict[str, _Scan] = {}  # started, not stored yet
+        self._slots: Any = None
+        self._locator = locator
+        if file_:
+            self._load(file_)
+
+    @classmethod
+    def open(
+        cls,
+        cache_dir: Optional[str],
+        search_path: List[str],
+        root_packages: List[str],
+        scan_workers: int = 1,
+        scan_timeout: Optional[float] = None,
+        locator: Optional[FeatureLocator] = None,
+    ) -> "_FeatureIndex":
+        return cls(
+            (
+                get_cache_file(cache_dir, search_path, root_packages, "index.json")
+                if cache_dir
+                else None
+            ),
+            scan_workers,
+            scan_timeout,
+            locator,
+        )
+
+    @property
+    def persistent(self) -> bool:
+        return self._file is not None
+
+    def _load(self, file_: str) -> None:
+        try:
+            with open(file_, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("format") == INDEX_FORMAT:
+            self._dirs = data.get("dirs", {})
+            self._modules = data.get("modules", {})
+            self._commands = data.get("commands", {})
+            self._located = data.get("located", {})
+            self._absent = data.get("absent", {})
+
+    def save(self) -> None:
+        """
+        Atomically write the index if anything has changed; failures are ignored,
+        the index is just a cache.
+        The listings completed after their timeout are stored as well.
+        """
+        for path_, scan in list(self._scans.items()):
+            if scan.wait(0):
+                self._store_scan(scan)
+        if not (self._file and self._dirty):
+            return
+        from tempfile import NamedTemporaryFile  # only needed for writing
+
+        dir_ = os.path.dirname(self._file)
+        try:
+            os.makedirs(dir_, exist_ok=True)
+            with NamedTemporaryFile("w", dir=dir_, delete=False) as f:
+                json.dump(
+                    {
+                        "format": INDEX_FORMAT,
+                        "dirs": self._dirs,
+                        "modules": self._modules,
+                        "commands": self._commands,
+                        "located": self._located,
+                        "absent": self._absent,
+                    },
+                    f,
+                )
+            os.replace(f.name, self._file)
+            self._dirty = False
+        except (OSError, TypeError, ValueError):
+            pass
+
+    def _store(
+        self, path_: str, key: List[int], modules: List[Tuple[str, bool, Optional[str]]]
+    ) -> None:
+        entry = self._dirs.get(path_)
+        if self._file and not (entry and entry["stat"] == key):
+            self._dirs[path_] = {"stat": key, "modules": modules}
+            self._dirty = True
+
+    def _list_dir(self, path_: str) -> List[Tuple[str, bool, Optional[str]]]:
+        key = _stat_key(path_)
+        if key is None:
+            return []
+        entry = self._dirs.get(path_)
+        if entry and entry["stat"] == key:
+            return [tuple(module) for module in entry["modules"]]  # type: ignore
+        with span(f"scan {path_}"):
+            modules = _scan_dir(path_)
+        self._store(path_, key, modules)
+        return modules
+
+    def _store_scan(self, scan: _Scan) -> List[Tuple[str, bool, Optional[str]]]:
+        self._scans.pop(scan.path, None)
+        if scan.key is not None:
+            self._store(scan.path, scan.key, scan.modules)
+        return scan.modules
+
+    def _start_scans(self, paths_: List[str]) -> List[_Scan]:
+        if self._slots is None:
+            import threading
+
+            self._slots = threading.BoundedSemaphore(self._scan_workers)
+        for path_ in paths_:
+            if path_ not in self._scans:
+                self._scans[path_] = _Scan(path_, self._dirs.get(path_), self._slots)
+        return [self._scans[path_] for path_ in paths_]
+
+    def _wait_scan(
+        self, scan: _Scan, deadline: Optional[float]
+    ) -> List[Tuple[str, bool, Optional[str]]]:
+        """
+        :return: the directory listing; the cached one, even if outdated,
+            if the scan is not complete by the deadline
+        """
+        with span(f"scan {scan.path}"):
+            timeout = None if deadline is None else max(deadline - monotonic(), 0)
+            entry = self._dirs.get(scan.path)
+            if scan.wait(timeout if entry else None):
+                return self._store_scan(scan)
+        return [tuple(module) for module in entry["modules"]]  # type: ignore
+
+    def _locate(self, paths_: List[str]) -> List[List[Tuple[str, bool, Optional[str]]]]:
+        """
+        :return: the listings of the directories by the feature locator,
+            the ones not known yet are requested at once
+        """
+        now = time()
+        missing = [
+            path_
+            for path_ in dict.fromkeys(paths_)
+            if not (path_ in self._located and self._located[path_]["expires"] > now)
+        ]
+        if missing:
+            with span(f"locate {len(missing)} directories"):
+                located = self._locator.locate(missing)  # type: ignore
+            for path_ in missing:
+                modules = [list(module) for module in located.get(path_, ())]
+                self._located[path_] = {
+                    "expires": now + LOCATED_TTL,
+                    "modules": modules,
+                }
+            if self._file:
+                self._dirty = True
+        return [
+            [tuple(module) for module in self._located[path_]["modules"]]  # type: ignore
+            for path_ in paths_
+        ]
+
+    def _list_dirs(
+        self, paths_: List[str]
+    ) -> Iterator[List[Tuple[str, bool, Optional[str]]]]:
+        """
+        :return: the listings of the directories in the same order
+        """
+        if self._locator is not None:
+            yield from self._locate(paths_)
+            return
+        if self._scan_workers <= 1 or len(paths_) <= 1:
+            yield from map(self._list_dir, paths_)
+            return
+        scans = self._start_scans(paths_)
+        deadline = (
+            None if self._scan_timeout is None else monotonic() + self._scan_timeout
+        )
+        for scan in scans:
+            yield self._wait_scan(scan, deadline)
+
+    def iter_modules(self, paths_: List[str]) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Same as pkgutil.iter_modules, but cached per directory.
+        With more than one scan worker all the directories are listed concurrently,
+        the ones not listed within the scan timeout come from the index.
+        :param paths_: the list of directories to scan
+        :return: unique module names with their file paths (first path wins)
+        """
+        yielded = set()
+        for modules in self._list_dirs(paths_):
+            for name, _, file_ in modules:
+                if name not in yielded:
+                    yielded.add(name)
+                    yield name, file_
+
+    def locate(self, name: str, paths_: List[str]) -> Optional[List[str]]:
+        """
+        :param name: module name
+        :param paths_: the list of directories to scan
+        :return: the directories holding the module according to the feature locator,
+            None without one
+        """
+        if self._locator is None:
+            return None
+        return [
+            path_
+            for path_, modules in zip(paths_, self._locate(paths_))
+            if any(module[0] == name for module in modules)
+        ]
+
+    def lookup(self, file_: Optional[str]) -> Optional[ModuleInfo]:
+        """
+        Get the module metadata if it is still valid
+        :param file_: module file path
+        :return: the cached metadata or None
+        """
+        if not (self._file and file_):
+            return None
+        entry = self._modules.get(file_)
+        if entry and entry["stat"] == _stat_key(file_):
+            return entry["info"]
+        return None
+
+    def record(self, file_: Optional[str], describe: Callable[[], ModuleInfo]) -> None:
+        """
+        Store the module metadata
+        :param file_: module file path
+        :param describe: produces the metadata, called only if the index is persistent
+        """
+        if not (self._file and file_):
+            return
+        key = _stat_key(file_)
+        if key is not None:
+            self._modules[file_] = {"stat": key, "info": describe()}
+            self._dirty = True
+
+    def is_absent(self, name: str) -> bool:
+        """
+        :param name: the full module name
+        :return: whether the module has been found absent,
+            and its package directories have not changed since
+        """
+        dirs = _absent.get(name) or self._absent.get(name)
+        return bool(dirs) and all(
+            _stat_key(dir_) == key for dir_, key in dirs.items()  # type: ignore
+        )
+
+    def record_absent(self, name: str, dirs: List[str]) -> None:
+        """
+        Remember the module is absent until any of its package directories changes
+        :param name: the full module name
+        :param dirs: the package directories, nothing is kept if any of them
+            is not on the local disk
+        """
+        keys = {dir_: _stat_key(dir_) for dir_ in dirs}
+        if not keys or None in keys.values():
+            return
+        _absent[name] = keys  # type: ignore
+        if self._file:
+            self._absent[name] = keys  # type: ignore
+            self._dirty = True
+
+    def lookup_command(self, key: str, file_: str) -> Optional[CommandDocs]:
+        """
+        Get the parsed command docstring if it is still valid
+        :param key: the function code location, see record_command
+        :param file_: the file the function is defined in
+        :return: the cached docstring or None
+        """
+        if not self._file:
+            return None
+        entry = self._commands.get(key)
+        if entry and entry["stat"] == _stat_key(file_):
+            return entry["docs"]
+        return None
+
+    def record_command(
+        self, key: str, file_: str, describe: Callable[[], CommandDocs]
+    ) -> None:
+        """
+        Store the parsed command docstring
+        :param key: the function code location - file name, first line number and name,
+            the qualified name and the docstring checksum of the command
+        :param file_: the file the function is defined in
+        :param describe: produces the docstring, called only if the index is persistent
+        """
+        if not self._file:
+            return
+        stat_ = _stat_key(file_)
+        if stat_ is not None:
+            self._commands[key] = {"stat": stat_, "docs": describe()}
+            self._dirty = True
@@ -0,0 +1,76 @@
+"""
+Opt-in lazy imports of the feature modules: the modules under the search path
+are executed on the first access to their attributes, so that a feature package
+importing all its modules executes only the ones the selected command uses
+"""
+
+import os
+import sys
+from importlib.machinery import ModuleSpec, PathFinder
+from importlib.util import LazyLoader, _LazyModule  # type: ignore
+from types import ModuleType
+from typing import Any, List, Optional, Sequence
+
+
+class _LazyFinder:
+    """
+    Finds the modules the same way the path finder it goes before does,
+    the Python modules under the search path get the lazy loader
+    """
+
+    def __init__(self, search_path: List[str]) -> None:
+        self._search_path = tuple(
+            os.path.join(os.path.abspath(p), "") for p in search_path
+        )
+
+    def find_spec(
+        self,
+        name: str,
+        path: Optional[Sequence[str]] = None,
+        target: Optional[ModuleType] = None,
+    ) -> Optional[ModuleSpec]:
+        spec = PathFinder.find_spec(name, path, target)
+        origin = spec.origin if spec is not None else None
+        if (
+            origin
+            and origin.endswith(".py")
+            and os.path.abspath(origin).startswith(self._search_path)
+        ):
+            spec.loader = LazyLoader(spec.loader)  # type: ignore
+        return spec
+
+
+def install(search_path: List[str]) -> None:
+    """
+    Import the modules under the search path lazily from now on
+    :param search_path: the list of paths to look for features
+    """
+    if any(isinstance(finder, _LazyFinder) for finder in sys.meta_path):
+        return
+    position = next(
+        (i for i, finder in enumerate(sys.meta_path) if finder is PathFinder),
+        len(sys.meta_path),
+    )
+    sys.meta_path.insert(position, _LazyFinder(search_path))
+
+
+def get_unloaded_origin(obj: Any) -> Optional[str]:
+    """
+    :param obj: any object, e.g. a package attribute
+    :return: the file of the module imported lazily and not executed yet,
+        None for anything else
+    """
+    if type(obj) is not _LazyModule:
+        return None
+    # any attribute access would execute the module
+    return object.__getattribute__(obj, "__spec__").origin
+
+
+def load(module: ModuleType) -> ModuleType:
+    """
+    :param module: the imported module
+    :return: the module, executed if it has been imported lazily
+    """
+    if type(module) is _LazyModule:
+        module.__dict__  # the first attribute access executes it
+    return module
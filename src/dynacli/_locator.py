@@ -0,0 +1,69 @@
+"""
+Feature locators: list the feature directories of a remote storage in batches,
+the whole next level of the feature tree at once instead of a round trip
+for every module the search path might hold
+"""
+
+import sys
+from importlib import import_module
+from typing import (
+    Any,
+    Dict,
+    Final,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+    Union,
+    runtime_checkable,
+)
+
+# The module name, whether it is a package, and the file path if it is on the local disk
+ModuleEntry = Tuple[str, bool, Optional[str]]
+
+# The attribute the importers on sys.meta_path set to True to be used as the locator
+LOCATOR_MARKER: Final[str] = "dynacli_feature_locator"
+
+
+@runtime_checkable
+class FeatureLocator(Protocol):
+    """
+    Implemented by the importers of the remote storages, or separately of them;
+    the importers opt in by setting the dynacli_feature_locator attribute to True
+    """
+
+    def locate(self, paths_: List[str]) -> Dict[str, List[ModuleEntry]]:
+        """
+        List the directories in one request
+        :param paths_: the directories of one feature tree level,
+            the search path directories joined with the root package names
+        :return: the modules of every directory, the directories missing
+            from the result hold none
+        """
+        ...
+
+
+def _is_marked_locator(finder: Any) -> bool:
+    """
+    Any finder might have the locate attribute, only the ones opting in are used
+    """
+    return getattr(finder, LOCATOR_MARKER, False) is True and callable(
+        getattr(finder, "locate", None)
+    )
+
+
+def get_locator(locator: Union[None, str, FeatureLocator]) -> Optional[FeatureLocator]:
+    """
+    :param locator: the locator, "<module>:<function>" returning it, or None
+        for the first importer on sys.meta_path implementing FeatureLocator
+        and having the dynacli_feature_locator attribute set to True
+    :return: the feature locator, None for listing the directories locally
+    """
+    if not locator:
+        return next(filter(_is_marked_locator, sys.meta_path), None)
+    if not isinstance(locator, str):
+        return locator
+    module, sep, factory = locator.partition(":")
+    if not sep:
+        raise ValueError(f"Unsupported feature locator {locator}")
+    return getattr(import_module(module), factory)()
@@ -0,0 +1,462 @@
+"""
+Frozen CLI manifest - the complete command tree discovered once at build time
+"""
+
+import marshal
+import os
+import types
+from argparse import ArgumentParser, _SubParsersAction
+from collections import abc
+from contextlib import redirect_stderr, redirect_stdout
+from enum import Enum, EnumMeta
+from functools import reduce
+from importlib import import_module
+from inspect import Parameter
+from io import StringIO
+from operator import or_
+from pprint import pformat
+from typing import (
+    IO,
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Final,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+    get_args,
+    get_origin,
+)
+
+from ._files import get_file_type
+from .dynacli import (
+    _PARAM_KIND_MAP,
+    _ArgParsingContext,
+    _discover,
+    _get_cli_name,
+    _get_command_meta,
+)
+
+MANIFEST_FORMAT: Final[int] = 2
+
+_BUILTIN_TYPES: Final[Dict[str, Any]] = {
+    type_.__name__: type_ for type_ in (int, str, float, bool)
+}
+
+# The file types by their names, Path is resolved on demand not to import pathlib
+_FILE_TYPES: Final[Dict[str, Any]] = {
+    "BinaryIO": BinaryIO,
+    "TextIO": TextIO,
+    "memoryview": memoryview,
+}
+
+# The generic types by their names, the arguments are type specs as well;
+# the typing and the builtin forms are kept apart as they are named differently
+# in the error messages
+_GENERIC_TYPES: Final[Dict[str, Any]] = {
+    "List": List,
+    "Set": Set,
+    "FrozenSet": FrozenSet,
+    "Tuple": Tuple,
+    "Iterator": Iterator,
+    "Iterable": Iterable,
+    "Union": Union,
+    "list": list,
+    "set": set,
+    "frozenset": frozenset,
+    "tuple": tuple,
+    "abc.Iterator": abc.Iterator,
+    "abc.Iterable": abc.Iterable,
+}
+
+_TYPING_NAMES: Final[Dict[Any, str]] = {
+    list: "List",
+    set: "Set",
+    frozenset: "FrozenSet",
+    tuple: "Tuple",
+    abc.Iterator: "Iterator",
+    abc.Iterable: "Iterable",
+    Union: "Union",
+}
+
+_ALIAS_NAMES: Final[Dict[Any, str]] = {
+    list: "list",
+    set: "set",
+    frozenset: "frozenset",
+    tuple: "tuple",
+    abc.Iterator: "abc.Iterator",
+    abc.Iterable: "abc.Iterable",
+}
+
+Manifest = Dict[str, Any]
+Node = Dict[str, Any]
+# "int", ("file", name), ("enum", name, members), ("literal", values),
+# ("generic", name, [type spec, ...]) or ("class", module, qualified name)
+TypeSpec = Union[str, Tuple[str, Any], Tuple[str, str, Any]]
+ParamSpec = Tuple[str, str, TypeSpec, bool]
+
+
+def _get_file_type_spec(type_: Any) -> Optional[TypeSpec]:
+    if type_ in (BinaryIO, IO[bytes]):
+        return "file", "BinaryIO"
+    if type_ in (TextIO, IO[str]):
+        return "file", "TextIO"
+    if type_ is memoryview:
+        return "file", "memoryview"
+    if getattr(type_, "__module__", None) == "pathlib" and type_.__name__ == "Path":
+        return "file", "Path"
+    return None
+
+
+def _get_enum_type_spec(type_: Any) -> Optional[TypeSpec]:
+    members = list(type_.__members__)
+    try:
+        Enum(type_.__name__, members)  # type: ignore
+    except (TypeError, ValueError):
+        return None
+    return "enum", type_.__name__, members
+
+
+def _get_generic_name(type_: Any) -> Optional[str]:
+    if isinstance(type_, getattr(types, "UnionType", ())):  # X | Y, Python 3.10+
+        return "|"
+    if isinstance(type_, getattr(types, "GenericAlias", ())):  # list[X], Python 3.9+
+        return _ALIAS_NAMES.get(get_origin(type_))
+    return _TYPING_NAMES.get(get_origin(type_))
+
+
+def _get_generic_type_spec(type_: Any) -> Optional[TypeSpec]:
+    name = _get_generic_name(type_)
+    if name is None:
+        return None
+    args = [
+        "..." if arg is Ellipsis else _get_type_spec(arg) for arg in get_args(type_)
+    ]
+    if None in args:
+        return None
+    return "generic", name, args
+
+
+def _resolve_generic_type_spec(name: str, args: List[TypeSpec]) -> Any:
+    args_ = tuple(Ellipsis if arg == "..." else _resolve_type_spec(arg) for arg in args)
+    if name == "|":
+        return reduce(or_, args_)
+    return _GENERIC_TYPES[name][args_] if args_ else _GENERIC_TYPES[name]
+
+
+def _import_object(module: str, qualname: str) -> Any:
+    object_ = import_module(module)
+    for name in qualname.split("."):
+        object_ = getattr(object_, name)
+    return object_
+
+
+def _get_class_type_spec(type_: Any) -> Optional[TypeSpec]:
+    """
+    The rest of the types, e.g. datetime, dataclasses, the ones having a registered
+    converter, are imported by their qualified names when the command runs
+    """
+    module = getattr(type_, "__module__", None)
+    qualname = getattr(type_, "__qualname__", None)
+    if not (isinstance(module, str) and isinstance(qualname, str)):
+        return None
+    try:
+        if _import_object(module, qualname) is not type_:
+            return None
+    except (ImportError, AttributeError):  # e.g. a class defined in a function
+        return None
+    return "class", module, qualname
+
+
+def _get_type_spec(type_: Any) -> Optional[TypeSpec]:
+    if type_ in (int, str, float, bool):
+        return type_.__name__
+    if type_ is type(None):
+        return "None"
+    if get_file_type(type_) is not None:
+        return _get_file_type_spec(type_)
+    if isinstance(type_, EnumMeta) and issubclass(type_, Enum):
+        return _get_enum_type_spec(type_)
+    if get_origin(type_) is Literal:
+        return "literal", list(get_args(type_))
+    if get_origin(type_) is not None:
+        return _get_generic_type_spec(type_)
+    return _get_class_type_spec(type_)
+
+
+def _resolve_type_spec(spec: TypeSpec) -> Any:
+    if isinstance(spec, str):
+        return type(None) if spec == "None" else _BUILTIN_TYPES[spec]
+    if spec[0] == "file":
+        if spec[1] == "Path":
+            from pathlib import Path
+
+            return Path
+        return _FILE_TYPES[spec[1]]
+    if spec[0] == "literal":
+        return Literal[tuple(spec[1])]  # type: ignore
+    if spec[0] == "generic":
+        _, name, args = spec  # type: ignore
+        args_ = tuple(
+            Ellipsis if arg == "..." else _resolve_type_spec(arg) for arg in args
+        )
+        return _GENERIC_TYPES[name][args_] if args_ else _GENERIC_TYPES[name]
+    if spec[0] == "class":
+        _, module, qualname = spec  # type: ignore
+        return _import_object(module, qualname)
+    _, name, members = spec  # type: ignore
+    return Enum(name, members)  # type: ignore
+
+
+def _get_param_specs(command: Callable) -> Optional[List[ParamSpec]]:
+    """
+    Convert the function signature to the manifest form
+    :param command: the function object
+    :return: the list of (name, kind, type, has default) or None if it cannot be frozen
+    """
+    specs = []
+    for param in _get_command_meta(command).parameters:
+        type_spec = _get_type_spec(param.annotation)
+        if type_spec is None or param.kind.name not in _PARAM_KIND_MAP:
+            return None
+        specs.append(
+            (
+                param.name,
+                param.kind.name,
+                type_spec,
+                param.default is not Parameter.empty,
+            )
+        )
+    return specs
+
+
+class _RecordingContext(_ArgParsingContext):
+    """Argument parsing context remembering what stands behind every parser"""
+
+    def __init__(self, *args: Any) -> None:
+        super().__init__(*args)
+        self.records: Dict[int, Node] = {}
+        self.pending: Optional[Node] = None
+
+    def add_feature_parser(self, name: str, module: Any) -> ArgumentParser:
+        parser = super().add_feature_parser(name, module)
+        self.records[id(parser)] = {
+            "kind": "feature",
+            "version": module.__dict__.get("__version__"),
+        }
+        return parser
+
+    def add_command_parser(self, name: str, module: Any) -> ArgumentParser:
+        command = module.__dict__[name]
+        self.pending = {
+            "kind": "command",
+            "module": module.__name__,
+            "function": name,
+            "version": module.__dict__.get("__version__"),
+        }
+        parser = super().add_command_parser(name, module)
+        self.pending = None
+        self.records[id(parser)] = {
+            "kind": "command",
+            "module": module.__name__,
+            "function": name,
+            "description": parser.description,
+            "param_docs": _get_command_meta(command).param_docs,
+            "params": _get_param_specs(command),
+            "version": module.__dict__.get("__version__"),
+        }
+        return parser
+
+
+def _get_subparsers(parser: ArgumentParser) -> Optional[_SubParsersAction]:
+    return next(
+        (action for action in parser._actions if isinstance(action, _SubParsersAction)),
+        None,
+    )
+
+
+class _ManifestBuilder:
+    """Walks the whole feature tree by running the state machine for every path"""
+
+    def __init__(
+        self, search_path: List[str], root_packages: Optional[List[str]]
+    ) -> None:
+        self._search_path = search_path
+        self._root_packages = root_packages
+
+    def _run(self, path_: List[str]) -> Tuple[_RecordingContext, Optional[Node]]:
+        """
+        Run the state machine for the path
+        :param path_: the list of feature and command names
+        :return: the context and the node if the run has failed
+        """
+        args = ["dynacli", *path_]
+        context = _RecordingContext(self._root_packages, self._search_path, args)
+        try:
+            with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+                _discover(iter(args), context)
+        except (Exception, SystemExit):
+            # e.g. unsupported argument type, will be reported by the dynamic discovery
+            return context, context.pending or {"kind": "error"}
+        return context, None
+
+    @staticmethod
+    def _find_parser(
+        context: _ArgParsingContext, path_: List[str]
+    ) -> Optional[ArgumentParser]:
+        parser: Optional[ArgumentParser] = context._root_parser
+        for name in path_:
+            subparsers = _get_subparsers(parser) if parser else None
+            if subparsers is None:
+                return None
+            parser = subparsers._name_parser_map.get(name)
+        return parser
+
+    def walk(self, path_: List[str], help_: Optional[str]) -> Node:
+        context, failed = self._run(path_)
+        if failed is not None:
+            return {**failed, "help": help_, "params": None}
+        parser = self._find_parser(context, path_)
+        if parser is None:
+            return {"kind": "error", "help": help_}
+        record = context.records.get(id(parser), {"kind": "feature"})
+        if record["kind"] == "command":
+            return {**record, "help": help_}
+        subparsers = _get_subparsers(parser)
+        helps = {
+            action.dest: action.help
+            for action in (subparsers._choices_actions if subparsers else [])
+        }
+        return {
+            **record,
+            "help": help_,
+            "children": {
+                name: self.walk([*path_, name], helps.get(name))
+                for name in (subparsers._name_parser_map if subparsers else {})
+            },
+        }
+
+
+def build_manifest(
+    search_path: List[str], root_packages: Optional[List[str]]
+) -> Manifest:
+    """
+    Discover the complete command tree
+    :param search_path: the list of paths to look for features
+    :param root_packages: (optional) the list of root package names
+    :return: the manifest
+    """
+    return {
+        "format": MANIFEST_FORMAT,
+        "search_path": search_path,
+        "root_packages": root_packages,
+        "tree": _ManifestBuilder(search_path, root_packages).walk([], None),
+    }
+
+
+def write_manifest(manifest: Manifest, file_: str) -> None:
+    """
+    Save the manifest as Python module if the file name ends with .py,
+    and as marshal blob otherwise
+    :param manifest: the manifest
+    :param file_: the manifest file path
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(file_)), exist_ok=True)
+    if file_.endswith(".py"):
+        with open(file_, "w") as f:
+            f.write('"""\nFrozen DynaCLI manifest, generated - do not edit\n"""\n\n')
+            f.write(f"MANIFEST = {pformat(manifest, width=88, sort_dicts=False)}\n")
+    else:
+        with open(file_, "wb") as f:
+            marshal.dump(manifest, f)
+
+
+def load_manifest(file_: str) -> Optional[Manifest]:
+    """
+    Load the manifest written by write_manifest
+    :param file_: the manifest file path
+    :return: the manifest or None if it is missing or has an unknown format
+    """
+    try:
+        if file_.endswith(".py"):
+            namespace: Dict[str, Any] = {}
+            with open(file_) as f:
+                exec(compile(f.read(), file_, "exec"), namespace)
+            manifest = namespace.get("MANIFEST")
+        else:
+            with open(file_, "rb") as f:
+                manifest = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError, SyntaxError):
+        return None
+    if isinstance(manifest, dict) and manifest.get("format") == MANIFEST_FORMAT:
+        return manifest
+    return None
+
+
+def _load_command(node: Node) -> Callable[[], Callable]:
+    def _loader() -> Callable:
+        return import_module(node["module"]).__dict__[node["function"]]
+
+    return _loader
+
+
+def _add_command(context: _ArgParsingContext, name: str, node: Node) -> None:
+    # only the presence of the default matters, the function default fills it in
+    parameters = [
+        Parameter(
+            name_,
+            getattr(Parameter, kind),
+            annotation=_resolve_type_spec(type_),
+            default=None if has_default else Parameter.empty,
+        )
+        for name_, kind, type_, has_default in node["params"]
+    ]
+    context.add_command_entry(
+        name,
+        node["description"],
+        node["param_docs"],
+        parameters,
+        node["version"],
+        _load_command(node),
+    )
+
+
+def _add_children(context: _ArgParsingContext, node: Node) -> None:
+    for name, child in node["children"].items():
+        context._current_subparsers.add_lazy_parser(name, child["help"])
+
+
+def run_manifest(manifest: Manifest, context: _ArgParsingContext) -> bool:
+    """
+    Build the parsers for the command line from the manifest instead of discovering
+    :param manifest: the manifest
+    :param context: the argument parsing context
+    :return: False if the command line requires the dynamic discovery
+    """
+    iter_ = iter(context._args)
+    context.set_root_parser(next(iter_))
+    node = manifest["tree"]
+    for arg in iter_:
+        name = _get_cli_name(arg)
+        child = node["children"].get(name)
+        if child is None:
+            break
+        if child["kind"] == "error":
+            return False
+        if child["kind"] == "command":
+            if child["params"] is None:
+                return False
+            _add_command(context, name, child)
+            return True
+        context.add_feature_entry(name, child["help"], child["version"])
+        node = child
+    _add_children(context, node)
+    return True
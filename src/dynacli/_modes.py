@@ -0,0 +1,481 @@
+"""
+Session modes running many command lines in one process: shell, batch and map
+"""
+
+import json
+import os
+import pickle
+import shlex
+import sys
+import threading
+from argparse import REMAINDER, ArgumentParser, ArgumentTypeError, Namespace
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import contextmanager, nullcontext, redirect_stderr, redirect_stdout
+from functools import partial
+from glob import glob
+from io import StringIO
+from multiprocessing import get_context
+from typing import (
+    IO,
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from ._session import Outcome, Session, shell
+from .dynacli import ContextFactory
+
+
+class BatchLine(NamedTuple):
+    number: int
+    args: List[str]
+    error: Optional[str]
+
+
+class BatchSummary(NamedTuple):
+    status: int
+    total: int
+    failed: int
+
+
+def _positive_int(value: str) -> int:
+    if not value.isdigit() or int(value) < 1:
+        raise ArgumentTypeError(f"expected a positive number, got '{value}'")
+    return int(value)
+
+
+def _make_parser(prog: str) -> ArgumentParser:
+    parser = ArgumentParser(
+        prog=prog,
+        description="Run many command lines discovering every command path once",
+    )
+    modes = parser.add_mutually_exclusive_group(required=True)
+    modes.add_argument(
+        "--shell", action="store_true", help="run the command lines typed in stdin"
+    )
+    modes.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="run the command lines from the file, - for stdin",
+    )
+    modes.add_argument(
+        "--map",
+        metavar="SOURCE",
+        help="run the command once for every line of the file (- for stdin), "
+        "or for every file matching the glob pattern",
+    )
+    parser.add_argument(
+        "--continue-on-error",
+        action="store_true",
+        help="run the next batch lines after a failed one",
+    )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="print a JSON line with the status, result and output of every batch line",
+    )
+    parser.add_argument(
+        "--parallel",
+        metavar="N",
+        type=_positive_int,
+        help="run up to N batch lines at once",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=("thread", "process"),
+        default="thread",
+        help="run the parallel batch lines in threads or in forked processes",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="report the parallel batch lines as they complete, not in the batch order",
+    )
+    parser.add_argument(
+        "command",
+        nargs=REMAINDER,
+        help="the command to run with the --map arguments appended",
+    )
+    return parser
+
+
+def _open_batch(file_: str) -> IO[str]:
+    return open(0, closefd=False) if file_ == "-" else open(file_)
+
+
+def read_batch(lines: IO[str]) -> Iterator[BatchLine]:
+    """
+    Split the batch lines into arguments, skipping empty and comment lines
+    :param lines: the batch file
+    :return: the arguments of every line, or the error if a line cannot be split
+    """
+    for number, line in enumerate(lines, 1):
+        try:
+            args = shlex.split(line, comments=True)
+        except ValueError as err:
+            yield BatchLine(number, [], str(err))
+            continue
+        if args:
+            yield BatchLine(number, args, None)
+
+
+def _run_captured(session: Session, args: List[str]) -> Tuple[Outcome, str, str]:
+    stdout, stderr = StringIO(), StringIO()
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        outcome = session.run(args)
+    return outcome, stdout.getvalue(), stderr.getvalue()
+
+
+def _get_error_outcome(error: str) -> Tuple[Outcome, str, str]:
+    return Outcome(2, None), "", f"error: {error}\n"
+
+
+def _make_record(
+    line: BatchLine, outcome: Outcome, stdout: str, stderr: str
+) -> Dict[str, Any]:
+    return {
+        "line": line.number,
+        "args": line.args,
+        "status": outcome.status,
+        "result": outcome.result,
+        "stdout": stdout,
+        "stderr": stderr,
+    }
+
+
+def _report(
+    prog: str,
+    line: BatchLine,
+    outcome: Outcome,
+    output: Optional[Tuple[str, str]],
+    jsonl: bool,
+) -> int:
+    """
+    Print the batch line output or its JSON record
+    :param prog: the CLI name
+    :param line: the batch line
+    :param outcome: the exit status and the command result
+    :param output: the captured stdout and stderr, None if printed already
+    :param jsonl: print the JSON record instead of the output
+    :return: the line exit status
+    """
+    stdout, stderr = output or ("", "")
+    if jsonl:
+        print(
+            json.dumps(_make_record(line, outcome, stdout, stderr), default=str),
+            flush=True,
+        )
+        return outcome.status
+    sys.stdout.write(stdout)
+    sys.stdout.flush()
+    sys.stderr.write(stderr)
+    if outcome.status:
+        print(
+            f"{prog}: line {line.number}: exit status {outcome.status}",
+            file=sys.stderr,
+        )
+    return outcome.status
+
+
+def _run_line(session: Session, line: BatchLine, jsonl: bool) -> int:
+    """
+    :return: the line exit status
+    """
+    if line.error is not None:
+        outcome, *output = _get_error_outcome(line.error)
+    elif jsonl:
+        outcome, *output = _run_captured(session, line.args)
+    else:
+        outcome, output = session.run(line.args), None  # type: ignore
+    prog = os.path.basename(session.prog)
+    return _report(prog, line, outcome, output, jsonl)  # type: ignore
+
+
+def _is_glob_pattern(source: str) -> bool:
+    return any(char in source for char in "*?[") and not os.path.exists(source)
+
+
+def _glob_lines(pattern: str) -> Iterator[BatchLine]:
+    for number, file_ in enumerate(sorted(glob(pattern, recursive=True)), 1):
+        yield BatchLine(number, [file_], None)
+
+
+def map_lines(command: List[str], lines: Iterable[BatchLine]) -> Iterator[BatchLine]:
+    """
+    :param command: the command line prefix, the features and the command
+    :param lines: the argument tuples
+    :return: the batch lines running the command with every argument tuple
+    """
+    for line in lines:
+        yield line._replace(args=[*command, *line.args])
+
+
+def run_batch(
+    session: Session, lines: Iterable[BatchLine], continue_on_error: bool, jsonl: bool
+) -> BatchSummary:
+    """
+    Run the command lines one by one
+    :param session: the session to run the commands in
+    :param lines: the batch lines
+    :param continue_on_error: do not stop on the first failed line
+    :param jsonl: print a JSON line for every batch line instead of its output
+    :return: the exit status of the first failed line, 0 if all succeeded,
+        and the numbers of the lines run and failed
+    """
+    status = total = failed = 0
+    for line in lines:
+        line_status = _run_line(session, line, jsonl)
+        total += 1
+        failed += bool(line_status)
+        status = status or line_status
+        if line_status and not continue_on_error:
+            break
+    return BatchSummary(status, total, failed)
+
+
+class _ThreadLocalStream:
+    """Writes to the stream set for the current thread, or to the default one"""
+
+    def __init__(self, default: IO[str]) -> None:
+        self.default = default
+        self._local = threading.local()
+
+    def set(self, stream: Optional[IO[str]]) -> None:
+        self._local.stream = stream
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(getattr(self._local, "stream", None) or self.default, name)
+
+
+@contextmanager
+def _thread_local_stdio() -> Iterator[Tuple[_ThreadLocalStream, _ThreadLocalStream]]:
+    stdout = _ThreadLocalStream(sys.stdout)
+    stderr = _ThreadLocalStream(sys.stderr)
+    sys.stdout, sys.stderr = stdout, stderr  # type: ignore
+    try:
+        yield stdout, stderr
+    finally:
+        sys.stdout, sys.stderr = stdout.default, stderr.default
+
+
+def _run_in_thread(
+    session: Session,
+    stdio: Tuple[_ThreadLocalStream, _ThreadLocalStream],
+    args: List[str],
+) -> Tuple[Outcome, str, str]:
+    stdout, stderr = StringIO(), StringIO()
+    stdio[0].set(stdout)
+    stdio[1].set(stderr)
+    try:
+        outcome = session.run(args)
+    finally:
+        stdio[0].set(None)
+        stdio[1].set(None)
+    return outcome, stdout.getvalue(), stderr.getvalue()
+
+
+# The session of the forked worker processes, set before the pool is created
+_worker_session: Optional[Session] = None
+
+
+def _run_in_process(args: List[str]) -> Tuple[Outcome, str, str]:
+    outcome, stdout, stderr = _run_captured(_worker_session, args)  # type: ignore
+    try:
+        pickle.dumps(outcome.result)
+    except Exception:  # the result has to come back to the parent process
+        outcome = Outcome(outcome.status, repr(outcome.result))
+    return outcome, stdout, stderr
+
+
+class _ParallelBatch:
+    """
+    Runs the batch lines in the pool, keeping a bounded number of them in flight,
+    and reports them in the batch order or as soon as they complete
+    """
+
+    def __init__(
+        self, session: Session, executor: Executor, submit: Callable, options: Namespace
+    ) -> None:
+        self._prog = os.path.basename(session.prog)
+        self._executor = executor
+        self._submit = submit
+        self._options = options
+        self._window = options.parallel * 4
+        self._pending: Dict[Future, BatchLine] = {}
+        self.status = self.total = self.failed = 0
+
+    def _submit_line(self, line: BatchLine) -> None:
+        future = (
+            self._executor.submit(_get_error_outcome, line.error)
+            if line.error is not None
+            else self._submit(line.args)
+        )
+        self._pending[future] = line
+
+    def _pop_done(self) -> List[Tuple[BatchLine, Future]]:
+        if not self._options.stream:
+            first = next(iter(self._pending))
+            wait([first])
+            return [(self._pending.pop(first), first)]
+        done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+        return [(self._pending.pop(future), future) for future in done]
+
+    def _report_done(self) -> bool:
+        """
+        :return: False if the batch has to stop
+        """
+        for line, future in self._pop_done():
+            outcome, *output = future.result()
+            line_status = _report(
+                self._prog, line, outcome, output, self._options.jsonl  # type: ignore
+            )
+            self.total += 1
+            self.failed += bool(line_status)
+            self.status = self.status or line_status
+            if line_status and not self._options.continue_on_error:
+                return False
+        return True
+
+    def _run(self, lines: Iterable[BatchLine]) -> None:
+        for line in lines:
+            self._submit_line(line)
+            if len(self._pending) >= self._window and not self._report_done():
+                return
+        while self._pending:
+            if not self._report_done():
+                return
+
+    def run(self, lines: Iterable[BatchLine]) -> BatchSummary:
+        try:
+            self._run(lines)
+            return BatchSummary(self.status, self.total, self.failed)
+        finally:
+            for future in self._pending:
+                future.cancel()
+
+
+def _make_executor(
+    session: Session, options: Namespace
+) -> Tuple[Executor, Callable, ContextManager[Any]]:
+    """
+    :return: the executor, the function submitting the command line to it,
+        and the context to run the batch in
+    """
+    global _worker_session
+
+    if options.executor == "process":
+        _worker_session = session
+        executor: Executor = ProcessPoolExecutor(
+            options.parallel, mp_context=get_context("fork")
+        )
+        return executor, partial(executor.submit, _run_in_process), nullcontext()
+    executor = ThreadPoolExecutor(options.parallel)
+    stdio = _thread_local_stdio()
+    submit = partial(executor.submit, _run_in_thread, session)
+    return executor, submit, stdio
+
+
+def run_parallel(
+    session: Session, lines: Iterable[BatchLine], options: Namespace
+) -> BatchSummary:
+    """
+    Run the command lines concurrently
+    :param session: the session to run the commands in, shared by threads
+        and inherited by forked processes
+    :param lines: the batch lines
+    :param options: the session options
+    :return: the same as run_batch
+    """
+    executor, submit, context = _make_executor(session, options)
+    with context as stdio, executor:
+        if stdio is not None:
+            submit = partial(submit, stdio)
+        return _ParallelBatch(session, executor, submit, options).run(lines)
+
+
+def _check_options(parser: ArgumentParser, options: Namespace) -> None:
+    if options.shell and (options.continue_on_error or options.jsonl):
+        parser.error("--continue-on-error and --jsonl are batch options")
+    if options.shell and options.parallel:
+        parser.error("--parallel is a batch option")
+    if not options.parallel and (options.executor != "thread" or options.stream):
+        parser.error("--executor and --stream need --parallel")
+    if options.executor == "process" and not hasattr(os, "fork"):
+        parser.error("the process executor needs fork")
+    if options.map and not options.command:
+        parser.error("--map needs the command to run")
+    if not options.map and options.command:
+        parser.error(f"unrecognized arguments: {' '.join(options.command)}")
+
+
+@contextmanager
+def _open_lines(
+    parser: ArgumentParser, options: Namespace
+) -> Iterator[Iterator[BatchLine]]:
+    """
+    :return: the batch lines, or the --map command lines
+    """
+    source = options.batch or options.map
+    if options.map and _is_glob_pattern(source):
+        yield map_lines(options.command, _glob_lines(source))
+        return
+    try:
+        file_ = _open_batch(source)
+    except OSError as err:
+        parser.error(f"can't open '{source}': {err.strerror}")
+    with file_:
+        lines = read_batch(file_)
+        yield map_lines(options.command, lines) if options.map else lines
+
+
+def run_session(
+    argv: List[str],
+    search_path: List[str],
+    root_packages: Optional[List[str]],
+    make_context: ContextFactory,
+) -> int:
+    """
+    Parse the session options and run the session
+    :param argv: the complete command line
+    :param search_path: the list of paths to look for features
+    :param root_packages: (optional) the list of root package names
+    :param make_context: makes the context for the command line arguments
+    :return: the exit status
+    """
+    prog, *args = argv
+    parser = _make_parser(os.path.basename(prog))
+    options = parser.parse_args(args)
+    _check_options(parser, options)
+    if options.shell:
+        shell(Session(prog, search_path, root_packages, make_context))
+        return 0
+    with _open_lines(parser, options) as lines:
+        session = Session(prog, search_path, root_packages, make_context)
+        if options.map:  # resolved once, before the worker processes are forked
+            session.prepare(options.command)
+        if options.parallel:
+            summary = run_parallel(session, lines, options)
+        else:
+            summary = run_batch(
+                session, lines, options.continue_on_error, options.jsonl
+            )
+    if options.map and summary.failed:
+        print(
+            f"{parser.prog}: {summary.failed} of {summary.total} runs failed",
+            file=sys.stderr,
+        )
+    return summary.status
@@ -0,0 +1,241 @@
+"""
+Printing the command results: the returned values through the pluggable encoders,
+and the items of iterator and generator results as they are produced
+"""
+
+import json
+import os
+import sys
+from datetime import date, time
+from enum import Enum
+from functools import lru_cache, partial
+from itertools import zip_longest
+from typing import IO, Any, Callable, Dict, Final, Iterator, List, Optional
+
+Encoder = Callable[[Any], str]
+
+STREAM_FORMATS: Final[Dict[str, str]] = {
+    "lines": "every item on its own line",
+    "jsonl": "every item as a JSON line",
+    "csv": "every item as a CSV row, the first dict item keys as the header",
+}
+DEFAULT_STREAM_FORMAT: Final[str] = "lines"
+
+# At most this many items are kept in the stdout buffer when it is not a terminal
+FLUSH_EVERY: Final[int] = 1024
+
+
+def _is_dataclass_instance(value: Any) -> bool:
+    return hasattr(type(value), "__dataclass_fields__")
+
+
+def _default(value: Any) -> Any:
+    """
+    The JSON representation of what the JSON encoders do not support themselves
+    """
+    if _is_dataclass_instance(value):
+        from dataclasses import asdict
+
+        return asdict(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def to_plain(value: Any) -> Any:
+    """
+    :return: the value made of dicts, lists, strings, numbers, booleans and None only
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {to_plain(key): to_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    return to_plain(_default(value))
+
+
+@lru_cache(maxsize=None)
+def _make_json_encoder(indent: bool) -> Encoder:
+    """
+    :param indent: pretty print, otherwise one line
+    :return: orjson encoder if it is installed, the standard json otherwise
+    """
+    try:
+        import orjson  # type: ignore
+    except ImportError:
+        return partial(json.dumps, default=_default, indent=2 if indent else None)
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return lambda value: orjson.dumps(value, default=_default, option=option).decode()
+
+
+def _to_json(item: Any) -> str:
+    return _make_json_encoder(False)(item)
+
+
+def _to_pretty_json(value: Any) -> str:
+    return _make_json_encoder(True)(value)
+
+
+def _to_yaml(value: Any) -> str:
+    try:
+        import yaml  # type: ignore
+    except ImportError:
+        raise ImportError("YAML output requires PyYAML, pip install PyYAML") from None
+    return yaml.safe_dump(to_plain(value), sort_keys=False, allow_unicode=True)
+
+
+def _get_rows(value: Any) -> List[List[Any]]:
+    """
+    :return: the header and the rows for the list of dicts, the key-value rows
+        for a dict, and one column rows for anything else
+    """
+    if isinstance(value, dict):
+        return [[key, item] for key, item in value.items()]
+    if not isinstance(value, list):
+        return [[value]]
+    if value and all(isinstance(item, dict) for item in value):
+        header = list(dict.fromkeys(key for item in value for key in item))
+        return [header, *([item.get(key, "") for key in header] for item in value)]
+    return [item if isinstance(item, list) else [item] for item in value]
+
+
+def _is_record(value: Any) -> bool:
+    return isinstance(value, dict) or _is_dataclass_instance(value)
+
+
+def _to_table(value: Any) -> str:
+    rows = [[str(cell) for cell in row] for row in _get_rows(to_plain(value))]
+    widths = [max(map(len, column)) for column in zip_longest(*rows, fillvalue="")]
+    lines = [
+        "  ".join(cell.ljust(w) for cell, w in zip(row, widths)).rstrip()
+        for row in rows
+    ]
+    if isinstance(value, list) and value and all(map(_is_record, value)):
+        lines.insert(1, "  ".join("-" * w for w in widths))
+    return "\n".join(lines)
+
+
+ENCODERS: Dict[str, Encoder] = {
+    "json": _to_pretty_json,
+    "yaml": _to_yaml,
+    "table": _to_table,
+}
+
+# The items of iterator results are printed in this stream format for the output format
+_STREAM_FORMATS_BY_OUTPUT: Final[Dict[str, str]] = {"json": "jsonl", "table": "csv"}
+
+
+def register_encoder(name: str, encode: Encoder) -> None:
+    """
+    Add a new output format or replace the encoder of an existing one;
+    register it before main() is called to have it among the --output choices
+    :param name: the output format name
+    :param encode: returns the text for the value returned by a command
+    """
+    ENCODERS[name] = encode
+
+
+def get_stream_format(output: Optional[str], default: Optional[str]) -> Optional[str]:
+    """
+    :param output: the output format
+    :param default: the configured stream format
+    :return: the stream format for the iterator results
+    """
+    return _STREAM_FORMATS_BY_OUTPUT.get(output or "", default)
+
+
+def write_result(result: Any, output: str) -> None:
+    """
+    Print the value returned by the command, if there is any
+    :param result: the command result
+    :param output: one of ENCODERS
+    """
+    if result is None:
+        return
+    try:
+        encode = ENCODERS[output]
+    except KeyError:
+        raise ValueError(
+            f"Unsupported output format {output}, choose from {', '.join(ENCODERS)}"
+        ) from None
+    text = encode(result)
+    sys.stdout.write(text if text.endswith("\n") else f"{text}\n")
+
+
+class _CsvRow:
+    """Turns the items into CSV rows, dicts by the keys of the first one"""
+
+    def __init__(self, file_: IO[str]) -> None:
+        import csv
+
+        self._writer = csv.writer(file_, lineterminator="\n")
+        self._header: Optional[List[str]] = None
+
+    def __call__(self, item: Any) -> None:
+        if isinstance(item, dict):
+            if self._header is None:
+                self._header = list(item)
+                self._writer.writerow(self._header)
+            self._writer.writerow([item.get(key) for key in self._header])
+        elif isinstance(item, (list, tuple)):
+            self._writer.writerow(item)
+        else:
+            self._writer.writerow([item])
+
+
+def make_writer(format_: Optional[str], file_: IO[str]) -> Callable[[Any], None]:
+    """
+    :param format_: one of STREAM_FORMATS, "lines" if not specified
+    :param file_: the stream to write to
+    :return: the function writing one item
+    """
+    format_ = format_ or DEFAULT_STREAM_FORMAT
+    if format_ == "lines":
+        return lambda item: file_.write(f"{item}\n")
+    if format_ == "jsonl":
+        return lambda item: file_.write(f"{_to_json(item)}\n")
+    if format_ == "csv":
+        return _CsvRow(file_)
+    raise ValueError(
+        f"Unsupported stream format {format_}, choose from {', '.join(STREAM_FORMATS)}"
+    )
+
+
+def _silence_stdout() -> None:
+    """
+    The reader has gone (e.g. `| head`), make the interpreter shutdown flush
+    to nowhere instead of raising BrokenPipeError again
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.close(devnull)
+
+
+def stream(items: Iterator[Any], format_: Optional[str]) -> None:
+    """
+    Write the items to stdout one by one, never holding more than FLUSH_EVERY of them
+    :param items: the iterator returned by the command
+    :param format_: one of STREAM_FORMATS, "lines" if not specified
+    """
+    file_ = sys.stdout
+    write = make_writer(format_, file_)
+    flush_every = 1 if file_.isatty() else FLUSH_EVERY
+    try:
+        for n, item in enumerate(items, 1):
+            write(item)
+            if n % flush_every == 0:
+                file_.flush()
+        file_.flush()
+    except BrokenPipeError:
+        close = getattr(items, "close", None)
+        if close is not None:
+            close()
+        _silence_stdout()
+        sys.exit(1)
@@ -0,0 +1,124 @@
+"""
+Opt-in startup profiling with per-phase timing breakdown
+"""
+
+import json
+import sys
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import Any, ContextManager, Dict, Final, Iterator, List, Optional
+
+_STDERR_TARGETS: Final[set] = {"1", "true", "yes", "on", "stderr", "-"}
+
+
+class _Span:
+    """Timing of all the calls with the same name under the same parent"""
+
+    __slots__ = ("name", "total", "count", "children")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.total = 0.0
+        self.count = 0
+        self.children: Dict[str, "_Span"] = {}
+
+    @property
+    def self_time(self) -> float:
+        return self.total - sum(child.total for child in self.children.values())
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "total": self.total,
+            "self": self.self_time,
+            "count": self.count,
+            "children": [child.as_dict() for child in self.children.values()],
+        }
+
+
+class Profiler:
+    """Collects the tree of timings"""
+
+    def __init__(self, target: str) -> None:
+        self._target = target
+        self._root = _Span("")
+        self._stack: List[_Span] = [self._root]
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        parent = self._stack[-1]
+        span_ = parent.children.get(name) or parent.children.setdefault(
+            name, _Span(name)
+        )
+        self._stack.append(span_)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            span_.total += perf_counter() - start
+            span_.count += 1
+            self._stack.pop()
+
+    def _format(self, span_: _Span, depth: int, lines: List[str]) -> None:
+        lines.append(
+            f"{span_.total * 1000:10.3f} {span_.self_time * 1000:10.3f} "
+            f"{span_.count:>6}  {'  ' * depth}{span_.name}"
+        )
+        for child in span_.children.values():
+            self._format(child, depth + 1, lines)
+
+    def report(self) -> str:
+        """
+        :return: the tree-shaped timing report
+        """
+        lines = [f"{'total ms':>10} {'self ms':>10} {'calls':>6}  name"]
+        for span_ in self._root.children.values():
+            self._format(span_, 0, lines)
+        return "\n".join(lines) + "\n"
+
+    def emit(self) -> None:
+        """
+        Write the report to stderr or to the target file;
+        the file gets JSON if its name ends with .json
+        """
+        if self._target.lower() in _STDERR_TARGETS:
+            sys.stderr.write(self.report())
+            return
+        with open(self._target, "w") as f:
+            if self._target.endswith(".json"):
+                json.dump(self._root.as_dict()["children"], f, indent=2)
+            else:
+                f.write(self.report())
+
+
+_NULL_SPAN: Final[ContextManager[None]] = nullcontext()
+_current: Optional[Profiler] = None
+
+
+def span(name: str) -> ContextManager[None]:
+    """
+    Time the block under the given name if profiling is enabled
+    :param name: the span name, calls with the same name under the same parent are summed up
+    :return: context manager
+    """
+    return _current.span(name) if _current is not None else _NULL_SPAN
+
+
+@contextmanager
+def profiling(target: Optional[str]) -> Iterator[None]:
+    """
+    Enable profiling for the block and emit the report on exit
+    :param target: "stderr" (or "1") for printing the report, a file path for saving it,
+        None for disabling profiling
+    """
+    global _current
+    if not target:
+        yield
+        return
+    _current = Profiler(target)
+    try:
+        with _current.span("main"):
+            yield
+    finally:
+        profiler, _current = _current, None
+        profiler.emit()
@@ -0,0 +1,314 @@
+"""
+Resident server keeping the feature modules imported, and the thin client for it.
+
+The client passes its stdin, stdout and stderr file descriptors over the Unix socket
+together with argv, cwd and environment, so the command output goes straight to
+the client terminal. Every request is served by a forked child of the warm server.
+"""
+
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import traceback
+from array import array
+from importlib import invalidate_caches
+from time import monotonic
+from typing import Any, Callable, Dict, Final, List, Optional, Tuple
+
+from ._index import Fingerprint, get_fingerprint
+from .dynacli import _get_exit_status
+
+# Seconds between the checks of the search path for changes
+CHECK_INTERVAL: Final[float] = 2.0
+
+_HEADER: Final[struct.Struct] = struct.Struct("!I")
+_STATUS: Final[struct.Struct] = struct.Struct("!i")
+_STDIO: Final[Tuple[int, int, int]] = (0, 1, 2)
+# struct ucred: pid, uid, gid
+_PEERCRED: Final[struct.Struct] = struct.Struct("3i")
+
+
+def _recv_exactly(conn: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return data
+
+
+def _send_request(conn: socket.socket, request: Dict[str, Any]) -> None:
+    body = json.dumps(request).encode()
+    conn.sendmsg(
+        [_HEADER.pack(len(body)), body],
+        [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array("i", _STDIO))],
+    )
+
+
+def _recv_request(conn: socket.socket) -> Tuple[Dict[str, Any], List[int]]:
+    fds = array("i")
+    data, ancdata, _, _ = conn.recvmsg(
+        _HEADER.size, socket.CMSG_LEN(len(_STDIO) * fds.itemsize)
+    )
+    for level, type_, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+            fds.frombytes(cmsg_data[: len(cmsg_data) - len(cmsg_data) % fds.itemsize])
+    data += _recv_exactly(conn, _HEADER.size - len(data))
+    (size,) = _HEADER.unpack(data)
+    return json.loads(_recv_exactly(conn, size)), list(fds)
+
+
+def _is_serving(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        try:
+            conn.connect(socket_path)
+            return True
+        except OSError:
+            return False
+
+
+def _get_peer_uid(conn: socket.socket) -> Optional[int]:
+    """
+    :return: the user id of the process listening on the other end, None if the OS
+        does not tell
+    """
+    option = getattr(socket, "SO_PEERCRED", None)
+    if option is None:  # e.g. macOS
+        return None
+    _, uid, _ = _PEERCRED.unpack(
+        conn.getsockopt(socket.SOL_SOCKET, option, _PEERCRED.size)
+    )
+    return uid
+
+
+def _is_trusted(conn: socket.socket, socket_path: str) -> bool:
+    """
+    The server gets the environment and the terminal of the client,
+    so it has to run as the same user
+    :param conn: the connection to the server
+    :param socket_path: the server Unix socket
+    """
+    uid = _get_peer_uid(conn)
+    if uid is not None:
+        return uid == os.getuid()
+    # the socket made by another user, or by anybody in a shared directory
+    stat_ = os.stat(socket_path)
+    return stat_.st_uid == os.getuid() and not stat_.st_mode & 0o077
+
+
+def forward(socket_path: str) -> Optional[int]:
+    """
+    Run the command line in the server
+    :param socket_path: the server Unix socket
+    :return: the command exit code or None if the server is not running,
+        or is not run by the current user
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(socket_path)
+        if not _is_trusted(conn, socket_path):
+            print(
+                f"{os.path.basename(sys.argv[0])}: {socket_path} is served by "
+                "another user, running the command locally",
+                file=sys.stderr,
+            )
+            conn.close()
+            return None
+        _send_request(
+            conn,
+            {
+                "cli": os.path.realpath(sys.argv[0]),
+                "argv": sys.argv,
+                "cwd": os.getcwd(),
+                "env": dict(os.environ),
+            },
+        )
+    except OSError:
+        conn.close()
+        return None
+    with conn:
+        try:
+            (pid,) = _STATUS.unpack(_recv_exactly(conn, _STATUS.size))
+        except ConnectionError:
+            return 1
+        if pid < 0:  # the server runs another CLI
+            return None
+        while True:
+            try:
+                (status,) = _STATUS.unpack(_recv_exactly(conn, _STATUS.size))
+                return status
+            except KeyboardInterrupt:
+                os.kill(pid, signal.SIGINT)
+            except ConnectionError:
+                return 1
+
+
+def _reopen_stdio() -> None:
+    """
+    The standard streams were created for the server descriptors,
+    recreate them with the buffering suitable for the client ones
+    """
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", buffering=1 if os.isatty(1) else -1, closefd=False)
+    sys.stderr = open(2, "w", buffering=1, closefd=False)
+
+
+def _run_request(
+    conn: socket.socket, cli: str, run: Callable[[], None]
+) -> Optional[int]:
+    """
+    Run the command line received from the client
+    :param conn: the client connection
+    :param cli: the CLI script path of the server
+    :param run: runs the CLI for the current sys.argv
+    :return: the exit code or None if the request is rejected
+    """
+    request, fds = _recv_request(conn)
+    if request["cli"] != cli or len(fds) != len(_STDIO):
+        conn.sendall(_STATUS.pack(-1))
+        return None
+    for fd, target in zip(fds, _STDIO):
+        os.dup2(fd, target)
+        os.close(fd)
+    _reopen_stdio()
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    sys.argv = request["argv"]
+    conn.sendall(_STATUS.pack(os.getpid()))
+    try:
+        run()
+        return 0
+    except SystemExit as err:
+        return _get_exit_status(err.code)
+    except KeyboardInterrupt:
+        return 128 + signal.SIGINT
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+
+def _terminate(*_: Any) -> None:
+    sys.exit(0)
+
+
+class _Server:
+    """Forks a child of the warm process for every request"""
+
+    def __init__(
+        self,
+        socket_path: str,
+        search_path: List[str],
+        warm_up: Callable[[], None],
+        run: Callable[[], None],
+    ) -> None:
+        self._socket_path = socket_path
+        self._search_path = [os.path.realpath(p) for p in search_path]
+        self._warm_up = warm_up
+        self._run = run
+        self._fingerprint: Fingerprint = {}
+        self._checked = 0.0
+        self._cli = os.path.realpath(sys.argv[0])
+
+    def _is_from_search_path(self, module: Any) -> bool:
+        file_ = getattr(module, "__file__", None)
+        if not file_:
+            return False
+        file_ = os.path.realpath(file_)
+        return any(file_.startswith(os.path.join(p, "")) for p in self._search_path)
+
+    def _load(self) -> None:
+        """
+        Forget the feature modules imported so far and import them again
+        """
+        for name, module in list(sys.modules.items()):
+            if self._is_from_search_path(module):
+                del sys.modules[name]
+        invalidate_caches()
+        self._fingerprint = get_fingerprint(self._search_path)
+        self._checked = monotonic()
+        self._warm_up()
+
+    def _reload_if_changed(self) -> None:
+        # walking the search path for every request would cost as much
+        # as the imports the server saves on a network file system
+        if monotonic() - self._checked < CHECK_INTERVAL:
+            return
+        if get_fingerprint(self._search_path) != self._fingerprint:
+            print("Search path has changed, reloading", file=sys.stderr)
+            self._load()
+        else:
+            self._checked = monotonic()
+
+    def _serve_child(self, listener: socket.socket, conn: socket.socket) -> None:
+        status = 1
+        try:
+            listener.close()
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            result = _run_request(conn, self._cli, self._run)
+            if result is not None:
+                status = result
+                conn.sendall(_STATUS.pack(status))
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(status)
+
+    def _bind(self) -> socket.socket:
+        if os.path.exists(self._socket_path):
+            if _is_serving(self._socket_path):
+                raise OSError(f"{self._socket_path} is already served")
+            os.remove(self._socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            listener.bind(self._socket_path)
+        finally:
+            os.umask(old_umask)
+        listener.listen()
+        return listener
+
+    def serve_forever(self) -> None:
+        self._load()
+        listener = self._bind()
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # children are never waited for
+        signal.signal(signal.SIGTERM, _terminate)
+        print(f"DynaCLI server is listening on {self._socket_path}", file=sys.stderr)
+        try:
+            while True:
+                conn, _ = listener.accept()
+                with conn:
+                    self._reload_if_changed()
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    if os.fork() == 0:
+                        self._serve_child(listener, conn)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            listener.close()
+            os.remove(self._socket_path)
+
+
+def serve(
+    socket_path: str,
+    search_path: List[str],
+    warm_up: Callable[[], None],
+    run: Callable[[], None],
+) -> None:
+    """
+    Serve the command lines sent by forward until interrupted
+    :param socket_path: the Unix socket to listen on
+    :param search_path: the list of paths to watch for changes
+    :param warm_up: imports the feature modules
+    :param run: runs the CLI for the current sys.argv
+    """
+    _Server(socket_path, search_path, warm_up, run).serve_forever()
@@ -0,0 +1,265 @@
+"""
+Many command lines run over one discovered command tree - the interactive shell
+"""
+
+import os
+import shlex
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from typing import Any, Final, List, NamedTuple, Optional, Tuple
+
+from ._manifest import Manifest, Node, build_manifest
+from .dynacli import (
+    ContextFactory,
+    _ArgParsingContext,
+    _discover,
+    _get_cli_name,
+    _get_exit_status,
+    _strip_help_args,
+)
+
+try:
+    import readline
+except ImportError:  # e.g. Windows
+    readline = None  # type: ignore
+
+PARSER_CACHE_SIZE: Final[int] = 128
+
+_EXIT_COMMANDS: Final[set] = {"exit", "quit"}
+
+
+def _get_command_path(context: _ArgParsingContext) -> Optional[Tuple[str, ...]]:
+    """
+    :return: the CLI names of the features and the command the context has
+        the parser for, None if it has none
+    """
+    parser = context._command_parser
+    return tuple(parser.prog.split()[1:]) if parser is not None else None
+
+
+class Outcome(NamedTuple):
+    status: int
+    result: Any
+
+
+class Session:
+    """
+    Keeps the feature modules imported and the parsers of the recently used
+    commands built. The parsers depend on the command path only, and are built
+    by discovering the path once, when a command line first takes it. The contexts
+    can be shared by threads, the parsers are only read while parsing.
+    The complete command tree is discovered only for the shell completion.
+    """
+
+    def __init__(
+        self,
+        prog: str,
+        search_path: List[str],
+        root_packages: Optional[List[str]],
+        make_context: ContextFactory,
+        cache_size: int = PARSER_CACHE_SIZE,
+    ) -> None:
+        self.prog = prog
+        self._search_path = search_path
+        self._root_packages = root_packages
+        self._make_context = make_context
+        self._manifest: Optional[Manifest] = None
+        self._cache_size = cache_size
+        self._contexts: "OrderedDict[Tuple[str, ...], _ArgParsingContext]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def manifest(self) -> Manifest:
+        """The complete command tree, discovered on the first access"""
+        if self._manifest is None:
+            self._manifest = build_manifest(self._search_path, self._root_packages)
+        return self._manifest
+
+    def resolve(self, args: List[str]) -> Tuple[List[str], Node]:
+        """
+        Find the longest known feature and command path of the command line
+        :param args: the command line arguments without the CLI name
+        :return: the path of CLI names and the tree node it leads to
+        """
+        node = self.manifest["tree"]
+        path_: List[str] = []
+        for arg in args:
+            child = node.get("children", {}).get(_get_cli_name(arg))
+            if child is None:
+                break
+            path_.append(_get_cli_name(arg))
+            node = child
+            if child["kind"] != "feature":
+                break
+        return path_, node
+
+    def is_known(self, name: str) -> bool:
+        """
+        :param name: the first argument of the command line
+        :return: whether it is a feature or a command, without discovering the others
+        """
+        if self._find_path([_get_cli_name(name)]) is not None:
+            return True
+        context = self._make_context([self.prog, name])
+        try:
+            context.import_module(name.replace("-", "_"))
+        except ImportError:
+            return False
+        return True
+
+    def _find_path(self, names: List[str]) -> Optional[Tuple[str, ...]]:
+        """
+        :param names: the CLI names of the command line arguments
+        :return: the longest command path of the built contexts the names start with
+        """
+        return max(
+            (key for key in self._contexts if tuple(names[: len(key)]) == key),
+            key=len,
+            default=None,
+        )
+
+    def _build(self, args: List[str]) -> _ArgParsingContext:
+        context = self._make_context([self.prog, *_strip_help_args(args)])
+        _discover(iter(context._args), context)
+        return context
+
+    def get_context(self, args: List[str]) -> _ArgParsingContext:
+        """
+        Get the context with the parsers for the command line, building it if needed
+        :param args: the command line arguments without the CLI name
+        :return: the context ready for the execution
+        """
+        names = [_get_cli_name(arg) for arg in _strip_help_args(args)]
+        with self._lock:
+            key = self._find_path(names)
+            if key is not None:
+                self._contexts.move_to_end(key)
+                return self._contexts[key]
+            context = self._build(args)
+            key = _get_command_path(context)
+            if key is not None:  # the features help and the errors are not kept
+                self._contexts[key] = context
+                if len(self._contexts) > self._cache_size:
+                    self._contexts.popitem(last=False)
+            return context
+
+    def prepare(self, args: List[str]) -> None:
+        """
+        Build the context for the command line ahead of running it,
+        the errors are reported when it runs
+        :param args: the command line arguments without the CLI name
+        """
+        with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+            try:
+                self.get_context(args)
+            except (Exception, SystemExit):
+                pass
+
+    def run(self, args: List[str]) -> Outcome:
+        """
+        Run the command line, the same way main() would
+        :param args: the command line arguments without the CLI name
+        :return: the exit code and the command result
+        """
+        try:
+            return Outcome(0, self.get_context(args).execute(args))
+        except SystemExit as err:
+            return Outcome(_get_exit_status(err.code), None)
+        except KeyboardInterrupt:
+            print(file=sys.stderr)
+            return Outcome(130, None)
+        except Exception:
+            traceback.print_exc()
+            return Outcome(1, None)
+        finally:
+            sys.stdout.flush()
+
+    def complete(self, args: List[str], text: str) -> List[str]:
+        """
+        :param args: the complete command line arguments before the one being typed
+        :param text: the beginning of the argument being typed
+        :return: the matching features and commands
+        """
+        path_, node = self.resolve(args)
+        if len(path_) != len(args):
+            return []
+        return sorted(
+            name
+            for name, child in node.get("children", {}).items()
+            if name.startswith(text) and child["help"] is not None
+        )
+
+
+class _Completer:
+    """readline completer over the session command tree"""
+
+    def __init__(self, session: Session) -> None:
+        self._session = session
+        self._matches: List[str] = []
+
+    def __call__(self, text: str, state: int) -> Optional[str]:
+        if state == 0:
+            line = readline.get_line_buffer()[: readline.get_begidx()]
+            try:
+                args = shlex.split(line)
+            except ValueError:
+                args = line.split()
+            self._matches = [f"{m} " for m in self._session.complete(args, text)]
+        return self._matches[state] if state < len(self._matches) else None
+
+
+def _enable_completion(session: Session) -> None:
+    if readline is None:
+        return
+    readline.set_completer(_Completer(session))
+    readline.set_completer_delims(" \t\n")
+    if "libedit" in (readline.__doc__ or ""):  # macOS
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+
+
+def _read_line(prompt: str) -> Optional[List[str]]:
+    """
+    :return: the arguments of the next command line, None at the end of the input
+    """
+    while True:
+        try:
+            line = input(prompt)
+        except EOFError:
+            return None
+        except KeyboardInterrupt:
+            print()
+            continue
+        try:
+            return shlex.split(line)
+        except ValueError as err:
+            print(f"error: {err}", file=sys.stderr)
+
+
+def shell(session: Session) -> None:
+    """
+    Read the command lines from stdin and run them until EOF or exit/quit
+    :param session: the session to run the commands in
+    """
+    interactive = sys.stdin.isatty()
+    prompt = f"{os.path.basename(session.prog)}> " if interactive else ""
+    if interactive:
+        _enable_completion(session)
+    while True:
+        args = _read_line(prompt)
+        if args is None:
+            if interactive:
+                print()
+            return
+        if not args:
+            continue
+        if args[0] in _EXIT_COMMANDS and not session.is_known(args[0]):
+            return
+        session.run(args)
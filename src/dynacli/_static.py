@@ -0,0 +1,329 @@
+"""
+Static module inspection - reading docstrings and signatures without importing
+"""
+
+import ast
+import sys
+from importlib.util import decode_source
+from typing import Dict, Final, List, Optional, Set, Tuple, TypedDict, Union
+
+ParamSpec = Tuple[str, str, Optional[str]]
+
+_ENUM_BASES: Final[Set[str]] = {"Enum", "IntEnum", "StrEnum", "Flag", "IntFlag"}
+
+_FunctionDef = Union[ast.FunctionDef, ast.AsyncFunctionDef]
+
+
+class StaticCommand(TypedDict):
+    """Top level function found in the module source"""
+
+    doc: Optional[str]
+    params: List[ParamSpec]
+
+
+class StaticModule(TypedDict):
+    """Module properties found in the module source"""
+
+    doc: Optional[str]
+    all: Optional[List[str]]
+    version: Optional[str]
+    commands: Dict[str, StaticCommand]
+    bound: Set[str]
+    star_import: bool
+    enums: Dict[str, List[str]]
+
+
+class _Unresolved(Exception):
+    """The module property could not be determined statically"""
+
+
+def _runtime_doc(doc: Optional[str]) -> Optional[str]:
+    """
+    Starting from Python 3.13 the compiler strips docstrings indentation,
+    so __doc__ at runtime differs from the string literal in the source
+    :param doc: docstring as it is written in the source
+    :return: docstring as it would be seen in __doc__
+    """
+    if doc is None or sys.version_info < (3, 13):
+        return doc
+    first, *lines = doc.expandtabs().split("\n")
+    margin = min(
+        (len(line) - len(line.lstrip(" ")) for line in lines if line.strip()),
+        default=0,
+    )
+    return "\n".join([first.lstrip(" "), *(line[margin:] for line in lines)])
+
+
+def _get_literal(node: ast.expr) -> object:
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise _Unresolved
+
+
+def _get_all_literal(node: ast.expr) -> List[str]:
+    value = _get_literal(node)
+    if not (
+        isinstance(value, (list, tuple)) and all(isinstance(v, str) for v in value)
+    ):
+        raise _Unresolved
+    return list(value)
+
+
+def _get_version_literal(node: ast.expr) -> str:
+    value = _get_literal(node)
+    if not isinstance(value, str):
+        raise _Unresolved
+    return value
+
+
+def _get_segment(lines: List[str], node: ast.expr) -> str:
+    """
+    Same as ast.get_source_segment, but for the source split into lines once,
+    instead of splitting it for every annotation
+    :param lines: the source lines, the newlines are translated by decode_source
+    :param node: the expression node
+    :return: the source of the expression
+    """
+    first, last = node.lineno - 1, node.end_lineno - 1  # type: ignore
+    if first == last:
+        return lines[first].encode()[node.col_offset : node.end_col_offset].decode()
+    return "\n".join(
+        [
+            lines[first].encode()[node.col_offset :].decode(),
+            *lines[first + 1 : last],
+            lines[last].encode()[: node.end_col_offset].decode(),
+        ]
+    )
+
+
+def _get_params(lines: List[str], node: _FunctionDef) -> List[ParamSpec]:
+    args = node.args
+
+    def _param(arg: ast.arg, kind: str) -> ParamSpec:
+        annotation = _get_segment(lines, arg.annotation) if arg.annotation else None
+        return arg.arg, kind, annotation
+
+    return [
+        *(_param(arg, "POSITIONAL_ONLY") for arg in args.posonlyargs),
+        *(_param(arg, "POSITIONAL_OR_KEYWORD") for arg in args.args),
+        *([_param(args.vararg, "VAR_POSITIONAL")] if args.vararg else []),
+        *(_param(arg, "KEYWORD_ONLY") for arg in args.kwonlyargs),
+        *([_param(args.kwarg, "VAR_KEYWORD")] if args.kwarg else []),
+    ]
+
+
+def _get_name(node: ast.expr) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _get_enum_members(node: ast.ClassDef) -> Optional[List[str]]:
+    """
+    :return: the member names of the Enum class, None if it is not one
+    """
+    if not any(_get_name(base) in _ENUM_BASES for base in node.bases):
+        return None
+    return [
+        target.id
+        for statement in node.body
+        if isinstance(statement, ast.Assign)
+        for target in statement.targets
+        if isinstance(target, ast.Name) and not target.id.startswith("_")
+    ]
+
+
+def _get_functional_enum_members(node: ast.expr) -> Optional[List[str]]:
+    """
+    :return: the member names of Enum("Name", "A B") or Enum("Name", ["A", "B"]),
+        None if it is not one
+    """
+    if not (
+        isinstance(node, ast.Call)
+        and _get_name(node.func) in _ENUM_BASES
+        and len(node.args) == 2
+    ):
+        return None
+    try:
+        members = ast.literal_eval(node.args[1])
+    except ValueError:
+        return None
+    if isinstance(members, str):
+        return members.replace(",", " ").split()
+    if isinstance(members, (list, tuple)) and all(isinstance(m, str) for m in members):
+        return list(members)
+    return None
+
+
+def _get_slice(node: ast.Subscript) -> ast.expr:
+    if sys.version_info < (3, 9):
+        return node.slice.value  # type: ignore
+    return node.slice
+
+
+def _get_annotation_choices(node: ast.expr, enums: Dict[str, List[str]]) -> List[str]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return get_choices(node.value, enums)  # the string annotation
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):  # X | None
+        args = [node.left, node.right]
+    elif isinstance(node, ast.Subscript):
+        name, slice_ = _get_name(node.value), _get_slice(node)
+        elements = slice_.elts if isinstance(slice_, ast.Tuple) else [slice_]
+        if name == "Literal":
+            try:
+                return [str(ast.literal_eval(element)) for element in elements]
+            except ValueError:
+                return []
+        if name not in ("Optional", "Union"):
+            return []
+        args = elements
+    else:
+        return list(enums.get(_get_name(node) or "", []))
+    args = [
+        arg for arg in args if not (isinstance(arg, ast.Constant) and arg.value is None)
+    ]
+    return _get_annotation_choices(args[0], enums) if len(args) == 1 else []
+
+
+def get_choices(annotation: Optional[str], enums: Dict[str, List[str]]) -> List[str]:
+    """
+    The argument choices seen in the annotation source, the same as the imported
+    annotation gives: the members of the Enums defined in the module,
+    the Literal values, and the same for Optional of them
+    :param annotation: the annotation source
+    :param enums: the Enum member names by the Enum names, see StaticModule
+    :return: the choices, empty if there are none or they cannot be seen statically
+    """
+    if annotation is None:
+        return []
+    try:
+        node = ast.parse(annotation, mode="eval").body
+    except SyntaxError:
+        return []
+    return _get_annotation_choices(node, enums)
+
+
+def _get_target_names(target: ast.expr) -> List[str]:
+    return [
+        node.id
+        for node in ast.walk(target)
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)
+    ]
+
+
+def _get_nested_names(statement: ast.stmt) -> List[str]:
+    """
+    All the names which may be bound by a compound statement (if, try, with etc.)
+    """
+    names: List[str] = []
+    for node in ast.walk(statement):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.append(node.name)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.append(node.id)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.extend(
+                (alias.asname or alias.name).partition(".")[0] for alias in node.names
+            )
+    return names
+
+
+class _ModuleScanner:
+    def __init__(self, source: str, tree: ast.Module) -> None:
+        self._lines = source.split("\n")
+        self.module = StaticModule(
+            doc=_runtime_doc(ast.get_docstring(tree, clean=False)),
+            all=None,
+            version=None,
+            commands={},
+            bound=set(),
+            star_import=False,
+            enums={},
+        )
+        for statement in tree.body:
+            self._scan(statement)
+
+    def _bind(self, name: str) -> None:
+        if name == "__all__" or name == "__version__":
+            raise _Unresolved
+        self.module["commands"].pop(name, None)
+        self.module["enums"].pop(name, None)
+        self.module["bound"].add(name)
+
+    def _bind_class(self, node: ast.ClassDef) -> None:
+        self._bind(node.name)
+        members = _get_enum_members(node)
+        if members is not None:
+            self.module["enums"][node.name] = members
+
+    def _bind_function(self, node: _FunctionDef) -> None:
+        if node.decorator_list:
+            self._bind(node.name)
+            return
+        self.module["bound"].discard(node.name)
+        self.module["commands"][node.name] = StaticCommand(
+            doc=_runtime_doc(ast.get_docstring(node, clean=False)),
+            params=_get_params(self._lines, node),
+        )
+
+    def _assign(self, target: ast.expr, value: Optional[ast.expr]) -> None:
+        if isinstance(target, ast.Name) and value is not None:
+            if target.id == "__all__":
+                self.module["all"] = _get_all_literal(value)
+                return
+            if target.id == "__version__":
+                self.module["version"] = _get_version_literal(value)
+                return
+        for name in _get_target_names(target):
+            self._bind(name)
+
+    def _assign_enum(self, targets: List[ast.expr], value: ast.expr) -> None:
+        members = _get_functional_enum_members(value)
+        if (
+            members is not None
+            and len(targets) == 1
+            and isinstance(targets[0], ast.Name)
+        ):
+            self.module["enums"][targets[0].id] = members
+
+    def _import(self, node: Union[ast.Import, ast.ImportFrom]) -> None:
+        for alias in node.names:
+            if alias.name == "*":
+                self.module["star_import"] = True
+            else:
+                self._bind((alias.asname or alias.name).partition(".")[0])
+
+    def _scan(self, statement: ast.stmt) -> None:
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            self._bind_function(statement)
+        elif isinstance(statement, ast.ClassDef):
+            self._bind_class(statement)
+        elif isinstance(statement, ast.Assign):
+            for target in statement.targets:
+                self._assign(target, statement.value)
+            self._assign_enum(statement.targets, statement.value)
+        elif isinstance(statement, ast.AnnAssign):
+            self._assign(statement.target, statement.value)
+        elif isinstance(statement, (ast.Import, ast.ImportFrom)):
+            self._import(statement)
+        elif not isinstance(statement, ast.Expr):
+            for name in _get_nested_names(statement):
+                self._bind(name)
+
+
+def scan_module_source(file_: str) -> Optional[StaticModule]:
+    """
+    Parse the module source and collect its docstring, __all__, __version__,
+    the top level functions and Enums without executing anything
+    :param file_: module file path
+    :return: module properties or None if they could not be determined statically
+    """
+    try:
+        with open(file_, "rb") as f:
+            source = decode_source(f.read())
+        return _ModuleScanner(source, ast.parse(source, file_)).module
+    except (OSError, SyntaxError, ValueError, _Unresolved):
+        return None
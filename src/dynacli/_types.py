@@ -0,0 +1,273 @@
+"""
+Argument types: the annotation of every command parameter is compiled once into
+the function converting the command line string, and the choices if there are any
+"""
+
+import json
+import types
+from argparse import ArgumentTypeError
+from collections import abc
+from enum import Enum
+from functools import lru_cache
+from inspect import formatannotation
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Final,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
+
+from ._files import get_file_type, open_binary, read_args
+
+Converter = Callable[[str], Any]
+ArgType = Tuple[Converter, Optional[Sequence[Any]]]
+
+# The separator of the items of list, set and tuple arguments
+ITEM_SEPARATOR: Final[str] = ","
+
+_converters: Dict[Any, Converter] = {}
+
+
+class InvalidItemError(ArgumentTypeError):
+    """An item of the iterator argument, read while the command runs, is invalid"""
+
+
+def _named(converter: Converter, annotation: Any) -> Converter:
+    """
+    argparse reports the invalid values by the type function name,
+    name it after the annotation
+    """
+
+    def _convert(value: str) -> Any:
+        return converter(value)
+
+    _convert.__name__ = (
+        annotation.__qualname__
+        if isinstance(annotation, type)
+        else formatannotation(annotation)
+    )
+    return _convert
+
+
+def _get_qualified_name(type_: type) -> str:
+    return f"{type_.__module__}.{type_.__qualname__}"
+
+
+def _make_decimal(value: str) -> Any:
+    from decimal import Decimal, InvalidOperation
+
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(value) from None
+
+
+# The standard types by their qualified names, not to import the modules in advance
+_STANDARD_CONVERTERS: Final[Dict[str, Callable[[type], Converter]]] = {
+    "datetime.datetime": lambda type_: type_.fromisoformat,  # type: ignore
+    "datetime.date": lambda type_: type_.fromisoformat,  # type: ignore
+    "datetime.time": lambda type_: type_.fromisoformat,  # type: ignore
+    "decimal.Decimal": lambda _: _make_decimal,
+    "uuid.UUID": lambda type_: type_,
+}
+
+
+def _validate_choice(converter: Converter, choices: Sequence[Any]) -> Converter:
+    def _convert(value: str) -> Any:
+        converted = converter(value)
+        if converted not in choices:
+            raise ValueError(value)
+        return converted
+
+    return _convert
+
+
+def _get_item_converter(annotation: Any) -> Converter:
+    converter, choices = get_arg_type(annotation)
+    return _validate_choice(converter, choices) if choices else converter
+
+
+def _split(value: str) -> List[str]:
+    return value.split(ITEM_SEPARATOR) if value else []
+
+
+def _make_collection(annotation: Any, factory: Callable) -> ArgType:
+    args = get_args(annotation)
+    convert = _get_item_converter(args[0] if args else str)
+    return lambda value: factory(map(convert, _split(value))), None
+
+
+def _make_tuple(annotation: Any) -> ArgType:
+    args = get_args(annotation)
+    if not args or args[1:] == (...,):
+        return _make_collection(annotation, tuple)
+    converters = [_get_item_converter(arg) for arg in args]
+
+    def _convert(value: str) -> Tuple[Any, ...]:
+        items = _split(value)
+        if len(items) != len(converters):
+            raise ValueError(value)
+        return tuple(convert(item) for convert, item in zip(converters, items))
+
+    return _convert, None
+
+
+def _make_iterator(annotation: Any) -> ArgType:
+    """
+    The iterator is given as the file of the values, one per line or NUL-separated,
+    or - for stdin; they are read and converted lazily, as the command iterates
+    """
+    args = get_args(annotation)
+    item_type = args[0] if args else str
+    convert = _get_item_converter(item_type)
+
+    def _iterate(file_: BinaryIO) -> Iterator[Any]:
+        for value in read_args(file_):
+            try:
+                yield convert(value)
+            except (TypeError, ValueError):
+                name = formatannotation(item_type)
+                raise InvalidItemError(f"invalid {name} value: {value!r}") from None
+
+    def _convert(value: str) -> Iterator[Any]:
+        return _iterate(open_binary(value))
+
+    return _convert, None
+
+
+def _make_union(annotation: Any) -> ArgType:
+    args = [arg for arg in get_args(annotation) if arg is not type(None)]
+    if len(args) == 1:  # Optional[X]
+        return get_arg_type(args[0])
+    converters = [_get_item_converter(arg) for arg in args]
+
+    def _convert(value: str) -> Any:
+        for convert in converters:
+            try:
+                return convert(value)
+            except (TypeError, ValueError):
+                pass
+        raise ValueError(value)
+
+    return _convert, None
+
+
+def _make_literal(annotation: Any) -> ArgType:
+    values = get_args(annotation)
+    by_text = {str(value): value for value in values}
+    return lambda value: by_text.get(value, value), list(values)
+
+
+def _make_dataclass(type_: type) -> ArgType:
+    """
+    The dataclass is given as a JSON object, the string fields of it are converted
+    by the field annotations
+    """
+    try:
+        fields = get_type_hints(type_)
+    except (NameError, TypeError):  # unresolvable string annotations
+        fields = {}
+
+    def _convert(value: str) -> Any:
+        data = json.loads(value)
+        if not isinstance(data, dict):
+            raise ValueError(value)
+        for name, item in data.items():
+            if isinstance(item, str) and fields.get(name, str) not in (str, Any):
+                data[name] = _get_item_converter(fields[name])(item)
+        return type_(**data)
+
+    return _convert, None
+
+
+_GENERIC_FACTORIES: Final[Dict[Any, Callable[[Any], ArgType]]] = {
+    list: lambda annotation: _make_collection(annotation, list),
+    set: lambda annotation: _make_collection(annotation, set),
+    frozenset: lambda annotation: _make_collection(annotation, frozenset),
+    tuple: _make_tuple,
+    abc.Iterator: _make_iterator,
+    abc.Iterable: _make_iterator,
+    Union: _make_union,
+    getattr(types, "UnionType", Union): _make_union,  # X | Y, Python 3.10+
+    Literal: _make_literal,
+}
+
+
+def _find_registered(annotation: Any) -> Optional[Converter]:
+    for type_ in getattr(annotation, "__mro__", (annotation,)):
+        try:
+            converter = _converters.get(type_)
+        except TypeError:  # unhashable
+            return None
+        if converter is not None:
+            return converter
+    return None
+
+
+def _compile(annotation: Any) -> ArgType:
+    converter = _find_registered(annotation)
+    if converter is not None:
+        return converter, None
+    if annotation in {int, str, float, bool}:
+        return annotation, None
+    file_type = get_file_type(annotation)
+    if file_type is not None:
+        return file_type, None
+    factory = _GENERIC_FACTORIES.get(get_origin(annotation) or annotation)
+    if factory is not None:
+        return factory(annotation)
+    if isinstance(annotation, type):
+        if issubclass(annotation, Enum):
+            return str, annotation.__members__  # type: ignore
+        if hasattr(annotation, "__dataclass_fields__"):
+            return _make_dataclass(annotation)
+        standard = _STANDARD_CONVERTERS.get(_get_qualified_name(annotation))
+        if standard is not None:
+            return standard(annotation), None
+    raise ValueError(f"Unsupported argument type {annotation}")
+
+
+def _compile_named(annotation: Any) -> ArgType:
+    converter, choices = _compile(annotation)
+    if isinstance(converter, type):  # int, Path etc. are named already
+        return converter, choices
+    return _named(converter, annotation), choices
+
+
+_compile_cached = lru_cache(maxsize=None)(_compile_named)
+
+
+def get_arg_type(annotation: Any) -> ArgType:
+    """
+    :param annotation: the command parameter annotation
+    :return: the function converting the command line string to the value of the
+        annotated type, and the valid values if they are limited
+    :raises ValueError: if the annotation is not supported
+    """
+    try:
+        return _compile_cached(annotation)
+    except TypeError:  # unhashable annotation, compile it every time
+        return _compile_named(annotation)
+
+
+def register_converter(type_: Any, converter: Converter) -> None:
+    """
+    Convert the command arguments annotated with the type, or with its subclasses,
+    by the function; it takes precedence over the built-in conversions
+    :param type_: the annotation, e.g. a class or a typing.NewType
+    :param converter: gets the command line string, returns the value or raises
+        ValueError, TypeError or argparse.ArgumentTypeError if it is invalid
+    """
+    _converters[type_] = converter
+    _compile_cached.cache_clear()
@@ -0,0 +1,29 @@
+import os
+import sys
+
+from dynacli._manifest import build_manifest, write_manifest
+
+
+def compile(output: str, *search_path: str, **kwargs: str) -> None:
+    """
+    Compile the frozen manifest of the CLI command tree
+
+    Args:
+        output (str): the manifest file path, Python module if it ends with .py
+        *search_path (str): the list of paths to look for features
+        **kwargs (str): root_packages=<comma separated root package names>
+
+    Return: None
+    """
+    _search_path = [os.path.abspath(path_) for path_ in search_path or ["."]]
+    _root_packages = kwargs.get("root_packages")
+    sys.path.extend(_search_path)
+    try:
+        manifest = build_manifest(
+            _search_path, _root_packages.split(",") if _root_packages else None
+        )
+        write_manifest(manifest, output)
+    except Exception as err:
+        print("Failed to compile the CLI manifest with ", str(err))
+    else:
+        print(f"Successfully compiled the CLI manifest {os.path.abspath(output)}")
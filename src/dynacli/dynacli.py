@@ -1,32 +1,72 @@
+import os
 import re
 import sys
-from argparse import Action, ArgumentError, ArgumentParser
-from enum import Enum, EnumMeta
+import zlib
+from abc import ABC, abstractmethod
+from argparse import (
+    Action,
+    ArgumentError,
+    ArgumentParser,
+    ArgumentTypeError,
+    Namespace,
+    _AppendAction,
+    _SubParsersAction,
+)
+from collections import abc
+from enum import EnumMeta
 from functools import partial
 from importlib import import_module
-from inspect import Parameter, signature
-from itertools import product
+from inspect import (
+    Parameter,
+    formatannotation,
+    isasyncgen,
+    isawaitable,
+    signature,
+    unwrap,
+)
+from itertools import product, repeat
 from os import path
-from pkgutil import iter_modules
-from types import MappingProxyType, ModuleType
+from types import CodeType, MappingProxyType, ModuleType
 from typing import (
     Any,
     AnyStr,
     Callable,
     Dict,
     Final,
+    Iterable,
     Iterator,
     List,
     Match,
     Optional,
     Pattern,
+    Sequence,
+    Set,
     Tuple,
     Type,
     TypedDict,
     Union,
 )
 
+from ._files import (
+    closing_opened_files,
+    expand_response_files,
+    has_read_input,
+    open_binary,
+    read_args,
+)
+from ._index import CommandDocs, ModuleInfo, _FeatureIndex
+from ._lazy import get_unloaded_origin, load
+from ._locator import FeatureLocator, get_locator
+from ._output import ENCODERS, get_stream_format, write_result
+from ._profile import profiling, span
+from ._static import ParamSpec, StaticModule, scan_module_source
+from ._types import InvalidItemError, get_arg_type
+
 ARG_PATTERN: Final[Pattern[str]] = re.compile(r"\s*(.+)\s+\(.+\):\s+(.+)$")
+_HELP_ARGS: Final[Set[str]] = {"-h", "--help", "-v", "--version"}
+_OUTPUT_OPTION: Final[str] = "--output"
+_OUTPUT_PREFIX: Final[str] = f"{_OUTPUT_OPTION}="
+_ARGS_FROM_OPTION: Final[str] = "--args-from"
 
 
 try:
@@ -35,12 +75,174 @@ except TypeError:  # Python 3.8 failing here for some unknown reason
     ChoicesType = Optional[MappingProxyType]
 
 
-class _KwargsAction(Action):
+def _invalid_choice(
+    action: Action, value: Any, choices: Iterable[Any]
+) -> ArgumentError:
+    msg = "invalid choice: %(value)r (choose from %(choices)s)"
+    return ArgumentError(
+        action, msg % {"value": value, "choices": ", ".join(map(repr, choices))}
+    )
+
+
+def _convert_value(action: Action, convert: Callable, value: str) -> Any:
+    """
+    Convert the value, reporting the invalid one the way argparse does
+    """
+    try:
+        return convert(value)
+    except ArgumentTypeError as err:
+        raise ArgumentError(action, str(err)) from None
+    except (TypeError, ValueError):
+        name = getattr(convert, "__name__", repr(convert))
+        raise ArgumentError(action, f"invalid {name} value: {value!r}") from None
+
+
+class _VarAction(Action, ABC):
+    """
+    Base of the *args and **kwargs parsing actions: argparse passes all the values
+    as they are, they are converted and checked against the choices at once
+    instead of argparse doing it value by value; @file values are replaced by
+    the values read from the file
+    """
+
+    def __init__(self, option_strings, dest, type=None, choices=None, **kwargs):  # type: ignore
+        super().__init__(option_strings, dest, **kwargs)
+        self._convert = type or str
+        self._choices = choices
+        self._valid = frozenset(choices) if choices else None
+
+    def __call__(self, parser, namespace, values, option_string=None):  # type: ignore
+        try:
+            values = expand_response_files(values)
+        except ArgumentTypeError as err:
+            raise ArgumentError(self, str(err)) from None
+        self.add_values(namespace, values)
+
+    @abstractmethod
+    def add_values(self, namespace: Namespace, values: Sequence[str]) -> None:
+        """
+        :param namespace: the parsed arguments
+        :param values: the command line values, without @file ones
+        :raises ArgumentError: if any value is invalid
+        """
+
+    def convert(self, values: Sequence[str]) -> List[Any]:
+        """
+        :param values: the command line values
+        :return: the converted values
+        :raises ArgumentError: if any value is invalid
+        """
+        if self._convert is str:
+            converted = list(values)
+        else:
+            try:
+                converted = list(map(self._convert, values))
+            except (ArgumentTypeError, TypeError, ValueError):
+                converted = [_convert_value(self, self._convert, v) for v in values]
+        if self._valid is not None and not self._valid.issuperset(converted):
+            invalid = next(v for v in converted if v not in self._valid)
+            raise _invalid_choice(self, invalid, self._choices)
+        return converted
+
+
+class _KwargsAction(_VarAction):
     """**kwargs argument parsing action"""
 
+    def add_values(self, namespace: Namespace, values: Sequence[str]) -> None:
+        kwargs = getattr(namespace, self.dest, None)
+        if kwargs is None:
+            kwargs = {}
+            setattr(namespace, self.dest, kwargs)
+        names, raw_values = [], []
+        for value in values:
+            name, _, raw_value = value.partition("=")
+            names.append(name)
+            raw_values.append(raw_value)
+        names_ = map(str.replace, names, repeat("-"), repeat("_"))
+        kwargs.update(zip(names_, self.convert(raw_values)))
+
+
+class _VarArgsAction(_VarAction):
+    """
+    *args argument parsing action; argparse gives it all the remaining values,
+    the trailing <name>=<value> ones are handed over to **kwargs if it follows
+    """
+
+    kwargs_action: Optional[_KwargsAction] = None
+
+    def add_values(self, namespace: Namespace, values: Sequence[str]) -> None:
+        n_kwargs = _calc_n_kwargs(values) if self.kwargs_action else 0
+        if n_kwargs:
+            self.kwargs_action.add_values(namespace, values[-n_kwargs:])  # type: ignore
+            values = values[:-n_kwargs]
+        pos_args = getattr(namespace, self.dest, None) or []
+        pos_args.extend(self.convert(values))
+        setattr(namespace, self.dest, pos_args)
+
+
+class _OptionalArgAction(_AppendAction):
+    """
+    Positional argument with a default: argparse calls the action with None
+    when the value is missing, it is left out so that the function default applies
+    """
+
     def __call__(self, parser, namespace, values, option_string=None):  # type: ignore
-        dict_ = dict(values)
-        setattr(namespace, self.dest, dict_)
+        if values is not None:
+            super().__call__(parser, namespace, values, option_string)
+
+
+class _LazySubParsersAction(_SubParsersAction):
+    """
+    Subparsers action which can register features and commands by name and help only;
+    the actual parser is built on demand when it is selected while parsing
+    """
+
+    def add_parser(self, name, **kwargs):  # type: ignore
+        with span(f"add_parser {name}"):
+            return super().add_parser(name, **kwargs)
+
+    def add_lazy_parser(self, name: str, help_: Optional[str]) -> None:
+        with span(f"add_lazy_parser {name}"):
+            if name in self._name_parser_map:
+                raise ArgumentError(self, f"conflicting subparser: {name}")
+            if help_ is not None:
+                self._choices_actions.append(self._ChoicesPseudoAction(name, (), help_))
+            self._name_parser_map[name] = None
+
+    def __call__(self, parser, namespace, values, option_string=None):  # type: ignore
+        name = values[0]
+        if name in self._name_parser_map and self._name_parser_map[name] is None:
+            self._name_parser_map[name] = self._parser_class(
+                prog=f"{self._prog_prefix} {name}"
+            )
+        super().__call__(parser, namespace, values, option_string)
+
+
+class _DiscoveryNeeded(Exception):
+    """The command line needs the complete parsers for the error message"""
+
+
+class _DirectParser(ArgumentParser):
+    """
+    The command parser built without the parsers of the features leading to it;
+    the errors are reported by the complete parsers, see route_directly,
+    unless the command line has read stdin, which cannot be read again
+    """
+
+    def error(self, message):  # type: ignore
+        if has_read_input():
+            super().error(message)
+        raise _DiscoveryNeeded(message)
+
+
+class _DirectSubParsers:
+    """Stands for the subparsers of the features leading to the command"""
+
+    def __init__(self, prog_prefix: str) -> None:
+        self._prog_prefix = prog_prefix
+
+    def add_parser(self, name: str, **kwargs: Any) -> ArgumentParser:
+        return _DirectParser(prog=f"{self._prog_prefix} {name}", **kwargs)
 
 
 class ArgProps(TypedDict):
@@ -54,34 +256,34 @@ class ArgProps(TypedDict):
 
 
 def _choices_patch():
-    # This is a monkey patch for showing proper error message for nargs="*" + choices
-    # The main goal to support Enum type support with *args and **kwargs
+    # This is a monkey patch for showing the same error message for the invalid choices
+    # of the regular arguments as for *args and **kwargs ones, see _VarAction
     def _check_value(self, action, value):
         # converted value must be one of the choices (if specified)
-        value = value[-1] if isinstance(value, tuple) else value
         if action.choices is not None and value not in action.choices:
-            choices = (
-                [choice for choice in action.choices if choice]
-                if isinstance(action.choices, list)
-                else action.choices
-            )
-            args = {
-                "value": value,
-                "choices": ", ".join(map(repr, choices)),
-            }
-            msg = "invalid choice: %(value)r (choose from %(choices)s)"
-            raise ArgumentError(action, msg % args)
+            raise _invalid_choice(action, value, action.choices)
 
     return _check_value
 
 
+def _make_feature_help(doc: Optional[str]) -> str:
+    return doc or "[ERROR] Missing the module docstring"
+
+
 def _get_feature_help(module: object) -> str:
     """
     Get the docstring of the imported module
     :param module: the imported module object
     :return: The docstring as string
     """
-    return module.__doc__ or "[ERROR] Missing the module docstring"
+    return _make_feature_help(module.__doc__)
+
+
+def _split_command_doc(doc: Optional[str]) -> Tuple[str, Optional[str]]:
+    if not doc:
+        return "[ERROR] Missing command docstring", None
+    description, _, spec = doc.partition("Args:")
+    return description, spec
 
 
 def _parse_command_doc(command: Callable) -> Tuple[str, Optional[str]]:
@@ -90,15 +292,123 @@ def _parse_command_doc(command: Callable) -> Tuple[str, Optional[str]]:
     :param command: the actual function object
     :return: the description and spec from docstring
     """
-    if not command.__doc__:
-        return "[ERROR] Missing command docstring", None
-    description, _, spec = command.__doc__.partition("Args:")
-    return description, spec
+    return _split_command_doc(command.__doc__)
+
+
+class _CommandMeta:
+    """
+    Parsed docstring and signature of a command function,
+    every part is computed on the first access only
+    """
+
+    __slots__ = ("command", "description", "_spec", "_param_docs", "_parameters")
+
+    def __init__(
+        self,
+        command: Callable,
+        description: str,
+        spec: Optional[str],
+        param_docs: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.command = command
+        self.description = description
+        self._spec = spec
+        self._param_docs = param_docs
+        self._parameters: Optional[List[Parameter]] = None
+
+    @property
+    def param_docs(self) -> Dict[str, str]:
+        if self._param_docs is None:
+            self._param_docs = _convert_docstring_to_param_docs(
+                _get_args_from_spec(self._spec)
+            )
+        return self._param_docs
+
+    @property
+    def parameters(self) -> List[Parameter]:
+        if self._parameters is None:
+            with span("signature"):
+                self._parameters = list(signature(self.command).parameters.values())
+        return self._parameters
+
+
+def _get_code(command: Callable) -> Optional[CodeType]:
+    try:
+        code = getattr(unwrap(command), "__code__", None)
+    except Exception:  # e.g. __wrapped__ cycle or a misbehaving __getattr__
+        return None
+    return code if isinstance(code, CodeType) else None
+
+
+def _get_code_key(code: CodeType, command: Callable) -> str:
+    # the decorators not using functools.wraps share the wrapper code
+    # between the commands, and may copy the docstrings to the wrappers
+    doc = (command.__doc__ or "").encode(errors="surrogatepass")
+    return (
+        f"{code.co_filename}:{code.co_firstlineno}:{code.co_name}:"
+        f"{getattr(command, '__qualname__', '')}:{zlib.crc32(doc):08x}"
+    )
+
+
+class _CommandMetaCache:
+    """
+    Command metadata shared between the help building and the execution,
+    keyed by the function code object. The docstring part may be persisted
+    in the feature index, keyed by the code location, the function name and docstring,
+    and validated by the file stat.
+    """
+
+    def __init__(self) -> None:
+        self._metas: Dict[CodeType, _CommandMeta] = {}
+        self.index: Optional[_FeatureIndex] = None
+
+    def clear(self) -> None:
+        self._metas.clear()
+
+    def get(self, command: Callable) -> _CommandMeta:
+        """
+        :param command: the function object
+        :return: the command metadata
+        """
+        code = _get_code(command)
+        if code is None:
+            return self._make(command, None)
+        meta = self._metas.get(code)
+        # decorated commands may share the wrapper code, so check the function itself
+        if meta is None or meta.command is not command:
+            meta = self._metas[code] = self._make(command, code)
+        return meta
+
+    def _make(self, command: Callable, code: Optional[CodeType]) -> _CommandMeta:
+        index = self.index if code is not None else None
+        if index is not None:
+            key = _get_code_key(code, command)
+            docs = index.lookup_command(key, code.co_filename)
+            if docs is not None:
+                return _CommandMeta(
+                    command, docs["description"], None, docs["param_docs"]
+                )
+        meta = _CommandMeta(command, *_parse_command_doc(command))
+        if index is not None:
+            index.record_command(
+                key,
+                code.co_filename,
+                lambda: CommandDocs(
+                    description=meta.description, param_docs=meta.param_docs
+                ),
+            )
+        return meta
+
+
+_command_metas: Final[_CommandMetaCache] = _CommandMetaCache()
+
+
+def _get_command_meta(command: Callable) -> _CommandMeta:
+    return _command_metas.get(command)
 
 
 def _get_command_description(command: Callable) -> str:
-    description, _ = _parse_command_doc(command)
-    return description
+    return _get_command_meta(command).description
 
 
 def _get_command_help(name: str, module: object) -> str:
@@ -160,123 +470,268 @@ def _get_module_help(name: str, module: ModuleType) -> str:
     )
 
 
-def _execute_command(args: Dict[str, Any], func_: Callable) -> None:
+def _get_module_kind(name: str, module: ModuleType) -> str:
+    if _is_package(module):
+        return "package"
+    return "feature" if _is_feature_module(name, module) else "command"
+
+
+def _get_param_specs(command: Callable) -> Optional[List[ParamSpec]]:
+    try:
+        parameters = _get_command_meta(command).parameters
+    except (TypeError, ValueError):
+        return None
+    return [
+        (
+            param.name,
+            param.kind.name,
+            (
+                formatannotation(param.annotation)
+                if param.annotation is not Parameter.empty
+                else None
+            ),
+        )
+        for param in parameters
+    ]
+
+
+def _describe_module(name: str, module: ModuleType) -> ModuleInfo:
+    """
+    Collect the module metadata to be stored in the feature index
+    :param name: module name
+    :param module: the imported module object
+    :return: the module metadata
+    """
+    all_ = module.__dict__.get("__all__")
+    commands = {
+        name_: command
+        for name_, command in module.__dict__.items()
+        if _is_public(name_) and _is_callable(command)
+    }
+    params = {name_: _get_param_specs(command) for name_, command in commands.items()}
+    return ModuleInfo(
+        kind=_get_module_kind(name, module),
+        help=_get_module_help(name, module),
+        doc=module.__doc__,
+        all=list(all_) if all_ is not None else None,
+        version=_get_version(module),
+        commands={
+            name_: _get_command_description(command)
+            for name_, command in commands.items()
+        },
+        params={name_: spec for name_, spec in params.items() if spec is not None},
+    )
+
+
+def _get_source_kind(name: str, file_: str, module: StaticModule) -> Optional[str]:
+    if path.basename(file_) == "__init__.py":
+        return "package"
+    if name in module["commands"]:
+        return "command"
+    if name in module["bound"] or module["star_import"]:
+        return None  # the name might be defined in a way we cannot see statically
+    return "feature"
+
+
+def _describe_source(name: str, file_: str) -> Optional[ModuleInfo]:
+    """
+    Collect the module metadata by parsing the module source instead of importing it
+    :param name: module name
+    :param file_: module file path
+    :return: the module metadata or None if it requires import
+    """
+    with span(f"parse source {file_}"):
+        module = scan_module_source(file_)
+    return None if module is None else _describe_static(name, file_, module)
+
+
+def _describe_static(
+    name: str, file_: str, module: StaticModule
+) -> Optional[ModuleInfo]:
+    """
+    Same as _describe_source for the module source parsed already
+    :param name: module name
+    :param file_: module file path
+    :param module: module properties found in the source
+    :return: the module metadata or None if it requires import
+    """
+    kind = _get_source_kind(name, file_, module)
+    if kind is None:
+        return None
+    commands = {
+        name_: command
+        for name_, command in module["commands"].items()
+        if _is_public(name_)
+    }
+    descriptions = {
+        name_: _split_command_doc(command["doc"])[0]
+        for name_, command in module["commands"].items()
+    }
+    return ModuleInfo(
+        kind=kind,
+        help=(
+            descriptions[name]
+            if kind == "command"
+            else _make_feature_help(module["doc"])
+        ),
+        doc=module["doc"],
+        all=module["all"],
+        version=module["version"],
+        commands={name_: descriptions[name_] for name_ in commands},
+        params={name_: command["params"] for name_, command in commands.items()},
+    )
+
+
+def _execute_command(
+    args: Dict[str, Any],
+    func_: Callable,
+    event_loop: Optional[str] = None,
+    stream_format: Optional[str] = None,
+) -> Any:
     """
     Here we are running actual function with positional arguments.
     If the function signature has **kwargs we will get keyword arguments
     and pass to the function accordingly.
+    Coroutine functions are run on the event loop, the items of the returned
+    iterators, generators and async generators are streamed to stdout.
     :param args: argument dictionary from argparse
     :param func_: function object to be called
-    :return:
+    :param event_loop: (optional) the event loop name for the async commands
+    :param stream_format: (optional) the format of the streamed items, "lines" by default
+    :return: the command result, None if it was streamed
     """
-    pos_values_ = args.get("pos_args", [])
+    pos_values_ = args.get("pos_args") or []
     kwargs_ = args.get("kwargs")
-    func_(*pos_values_, **kwargs_) if kwargs_ else func_(*pos_values_)
+    result = func_(*pos_values_, **kwargs_) if kwargs_ else func_(*pos_values_)
+    if isawaitable(result) or isasyncgen(result):
+        from ._async import run_async
+
+        return run_async(result, event_loop, stream_format)
+    if isinstance(result, abc.Iterator):
+        from ._output import stream
+
+        stream(result, stream_format)
+        return None
+    return result
 
 
 def _process_type(type_: type) -> Tuple[Union[type, Callable], ChoicesType]:
     """
-    Function for processing int, str, float, bool and Enum type.
-    Currently, we are supporting only these types.
+    Function for processing the argument types, see _types.get_arg_type:
+    int, str, float, bool, Enum, the file types, Optional, Union, Literal,
+    list, set, tuple, datetime, Decimal, dataclasses and the registered ones.
     :param type_: the type name.
     :return: return the tuple of the types.
     """
     try:
-        if type_ in {int, str, float, bool}:
-            return type_, None
-        elif issubclass(type_, Enum):
-            return str, getattr(type_, "__members__", {})
-    except TypeError:  # Python quirks with Optional etc.gg
+        return get_arg_type(type_)  # type: ignore
+    except TypeError:  # unhashable annotations etc.
         pass
     raise ValueError(f"Unsupported argument type {type_}")
 
 
-def _calc_n_kwargs(args: List[str]) -> Union[str, int]:
+def _calc_n_kwargs(args: Sequence[str]) -> int:
     """
-    Here we try to calculate the nargs for **kwargs arguments.
+    Here we try to calculate the number of **kwargs arguments.
     Basically we are starting from the end until not encountering
     the "=" sign in the provided argument.
     Example: <CLI> <feature> <command> [arguments: pos[bst labs] *args[lib1 lib2] **kwargs[name1=lib1 name2=lib2]]
-    :param args: the list of arguments from the argparse
-    :return: nargs for argparse add_argument()
+    :param args: *args and **kwargs values from the argparse
+    :return: the number of **kwargs values at the end
     """
     n_kwargs = 0
-    for n_kwargs in range(0, -len(args), -1):
-        if "=" not in args[n_kwargs - 1]:
+    for arg in reversed(args):
+        if "=" not in arg:
             break
-    return -n_kwargs or "*"
+        n_kwargs += 1
+    return n_kwargs
 
 
-def _get_kwargs_arg_props(
-    param_type: type, args: List[str], nargs: Union[str, int, None]
-) -> ArgProps:
+def _get_var_arg_props(param_type: type, action: Type[Action], dest: str) -> ArgProps:
     """
-    The function for calculating the nargs of argparse.add_argument();
-    We will use it for understanding the count of the CLI arguments,
-    and getting them as keyword arguments(**kwargs).
-    :param param_type: the argument type
-    :param args: list of the arguments from CLI
-    :param nargs: the previous nargs to check if **kwargs was preceded by *args or not
+    Function for processing *args and **kwargs: argparse collects all of them as
+    they are, the action converts them at once; the *args action gets the **kwargs
+    values as well and hands them over, see _VarArgsAction
+    :param param_type: Parameter type
+    :param action: for add_argument()
+    :param dest: for add_argument()
     :return:
     """
-    # If previous nargs is None it means there is no *args at function signature,
-    # and we can return "*" for nargs;
-    # of the **kwargs. example: def func_(a: int, b: str, **kwargs: str)
-    _, choices = _process_type(param_type)
-    nargs = _calc_n_kwargs(args) if nargs == "*" else "*"
-
-    def _process_value(value: str) -> Tuple[str, Union[str, type]]:
-        name, _, val = value.partition("=")
-        name = name.replace("-", "_")
-        return (name, val) if choices else (name, param_type(val))
-
-    final_choices = [*choices, []] if choices else None
-
+    arg_type, choices = _process_type(param_type)
     return ArgProps(
-        type=_process_value,
-        choices=final_choices,
-        nargs=nargs,
-        action=_KwargsAction,
-        dest="kwargs",
+        type=arg_type,
+        choices=list(choices) if choices else None,
+        nargs="*",
+        action=action,
+        dest=dest,
     )
 
 
-def _get_regular_arg_props(
-    param_type: type,
-    _1: List[str],
-    _2: Optional[Union[str, int]],
-    nargs: Optional[str],
-    action: str,
-    dest: str,
-) -> ArgProps:
+def _get_regular_arg_props(param_type: type) -> ArgProps:
     """
-    Function for processing regular arguments(positional and *args)
+    Function for processing regular positional arguments
     :param param_type: Parameter type
-    :param _1: the list of arguments from argparse (ignored)
-    :param _2: previous nargs (ignored)
-    :param nargs: new nargs
-    :param action: for add_argument()
-    :param dest: for add_argument()
     :return:
     """
     arg_type, choices = _process_type(param_type)
-    final_choices = [*choices, []] if choices else None
     return ArgProps(
-        type=arg_type, choices=final_choices, nargs=nargs, action=action, dest=dest
+        type=arg_type,
+        choices=list(choices) if choices else None,
+        nargs=None,
+        action="append",
+        dest="pos_args",
     )
 
 
-_PARAM_KIND_MAP: Final[Dict[str, Callable]] = {
+_PARAM_KIND_MAP: Final[Dict[str, Callable[[type], ArgProps]]] = {
     "VAR_POSITIONAL": partial(
-        _get_regular_arg_props, nargs="*", action="extend", dest="pos_args"
-    ),
-    "VAR_KEYWORD": _get_kwargs_arg_props,
-    "POSITIONAL_OR_KEYWORD": partial(
-        _get_regular_arg_props, nargs=None, action="append", dest="pos_args"
+        _get_var_arg_props, action=_VarArgsAction, dest="pos_args"
     ),
+    "VAR_KEYWORD": partial(_get_var_arg_props, action=_KwargsAction, dest="kwargs"),
+    "POSITIONAL_OR_KEYWORD": _get_regular_arg_props,
 }
 
 
+def _get_var_action(parser: ArgumentParser) -> Tuple[int, Optional[_VarAction]]:
+    """
+    :param parser: the command parser
+    :return: the number of the regular positional arguments, and the action taking
+        the *args and **kwargs values if the command has any
+    """
+    positionals = [action for action in parser._actions if not action.option_strings]
+    for i, action in enumerate(positionals):
+        if isinstance(action, _VarAction):
+            return i, action
+    return len(positionals), None
+
+
+def _split_var_values(
+    argv: List[str], root_parser: ArgumentParser, parser: ArgumentParser
+) -> Optional[Tuple[List[str], List[str], _VarAction]]:
+    """
+    Find the *args and **kwargs values of the command at the end of the command line,
+    so that they can be converted at once instead of argparse taking them one by one
+    :param argv: the command line arguments
+    :param root_parser: the CLI parser
+    :param parser: the command parser
+    :return: the command line up to the values, the values and the action taking them;
+        None if the command has no *args and **kwargs, or there are options among the
+        arguments, which only argparse knows how to deal with
+    """
+    n_fixed, action = _get_var_action(parser)
+    if action is None:
+        return None
+    path_ = parser.prog[len(root_parser.prog) :].split()
+    n_head = len(path_) + n_fixed
+    if (
+        len(argv) <= n_head
+        or argv[: len(path_)] != path_
+        or any(arg.startswith("-") for arg in argv)
+    ):
+        return None
+    return argv[:n_head], argv[n_head:], action
+
+
 def _make_arg_help(
     arg_name: str, param_docs: Optional[Dict[str, str]], choices: Optional[List[str]]
 ):
@@ -305,9 +760,8 @@ def _add_command_arg(
     arg_name: str,
     param: Parameter,
     param_docs: Optional[Dict[str, str]],
-    args: List[str],
-    nargs: Union[str, int, None],
-) -> Union[str, int, None]:
+    previous: Optional[Action],
+) -> Action:
     """
     Here we are converting function arguments from the signature to CLI argument.
     I.E each function argument is a separate CLI argument.
@@ -318,24 +772,22 @@ def _add_command_arg(
     :param arg_name: actual argument name from the function signature
     :param param: actual Parameter from the function signature
     :param param_docs: the dict of argument_name: help message parsed from the docstring
-    :param args: list of command line arguments
-    :param nargs: previous nargs for checking *args, **kwargs order
-    :return:
+    :param previous: the previous argument action for checking *args, **kwargs order
+    :return: the argument action
     """
-    arg_props = _PARAM_KIND_MAP[param.kind.name](param.annotation, args, nargs)
-    choices = (
-        arg_props["choices"][:-1]
-        if type(arg_props["choices"]) is list
-        else arg_props["choices"]
-    )
-    arg_help = _make_arg_help(arg_name, param_docs, choices)
+    arg_props = _PARAM_KIND_MAP[param.kind.name](param.annotation)
+    if param.default is not Parameter.empty:
+        arg_props.update(nargs="?", action=_OptionalArgAction)
+    arg_help = _make_arg_help(arg_name, param_docs, arg_props["choices"])
     arg_metavar = _make_arg_metavar(arg_name, arg_props["dest"])
-    parser.add_argument(
+    action = parser.add_argument(
         **arg_props,
         help=arg_help,
         metavar=arg_metavar,
     )
-    return arg_props["nargs"]
+    if isinstance(action, _KwargsAction) and isinstance(previous, _VarArgsAction):
+        previous.kwargs_action = action
+    return action
 
 
 def _convert_docstring_to_param_docs(params: Optional[List[str]]) -> Dict[str, str]:
@@ -346,7 +798,8 @@ def _convert_docstring_to_param_docs(params: Optional[List[str]]) -> Dict[str, s
     """
     param_docs: Dict[str, str] = {}
     if params is not None and [""] != params:
-        _build_param_docs(params, param_docs)
+        with span("parse docstring"):
+            _build_param_docs(params, param_docs)
     return param_docs
 
 
@@ -381,7 +834,10 @@ def _add_version(parser: ArgumentParser, module: ModuleType) -> None:
     :param module: actual imported module
     :return:
     """
-    version_ = _get_version(module)
+    _add_version_string(parser, _get_version(module))
+
+
+def _add_version_string(parser: ArgumentParser, version_: Optional[str]) -> None:
     if version_:
         parser.add_argument(
             "-v", "--version", action="version", version="%(prog)s - v" + version_
@@ -411,6 +867,16 @@ def _get_version(module: ModuleType) -> Optional[str]:
     return module.__dict__.get("__version__")
 
 
+def _get_package_dirs(package: str) -> List[str]:
+    """
+    :param package: the root package name with the trailing dot, empty for none
+    :return: the directories the package modules are looked up in,
+        none for the top level modules
+    """
+    module = sys.modules.get(package[:-1]) if package else None
+    return list(getattr(module, "__path__", ()))
+
+
 def _get_root_description() -> Tuple[Optional[str], ModuleType]:
     main_module = sys.modules["__main__"]
     return main_module.__doc__, main_module
@@ -422,6 +888,14 @@ class _ArgParsingContext:
         root_packages: Optional[List[str]],
         search_path: List[str],
         args: List[str],
+        cache_dir: Optional[str] = None,
+        static_help: bool = False,
+        event_loop: Optional[str] = None,
+        stream_format: Optional[str] = None,
+        output: Optional[str] = None,
+        scan_workers: int = 1,
+        scan_timeout: Optional[float] = None,
+        locator: Optional[FeatureLocator] = None,
     ) -> None:
         self._root_packages = (
             [r if r.endswith(".") else f"{r}." for r in root_packages]
@@ -432,10 +906,27 @@ class _ArgParsingContext:
         self._search_path = [p if p.endswith("/") else f"{p}/" for p in search_path]
         self._args = args
         self._root_parser: ArgumentParser = None  # type: ignore
-        self._current_subparsers: ArgumentParser._Subparsers = []  # type: ignore
+        self._current_subparsers: _LazySubParsersAction = None  # type: ignore
         self._current_package: ModuleType = None  # type: ignore
         self._current_command = None
+        self._command_parser: Optional[ArgumentParser] = None
+        self._command_loader: Optional[Callable[[], Callable]] = None
         self._known_names: set[str] = set()
+        self._n_routed = 0  # the command path arguments, see route_directly
+        self._index = _FeatureIndex.open(
+            cache_dir,
+            self._search_path,
+            self._root_packages,
+            scan_workers,
+            scan_timeout,
+            locator,
+        )
+        if self._index.persistent:
+            _command_metas.index = self._index
+        self._static_help = static_help
+        self._event_loop = event_loop
+        self._stream_format = stream_format
+        self._output = output
 
     def set_root_parser(self, arg: str) -> None:
         description, main_module = _get_root_description()
@@ -444,16 +935,43 @@ class _ArgParsingContext:
             prog=path.basename(arg),
             description=description,
         )
-        self._current_subparsers = self._root_parser.add_subparsers()
+        self._current_subparsers = self._root_parser.add_subparsers(
+            action=_LazySubParsersAction
+        )
         _add_version(self._root_parser, main_module)
+        self._root_parser.add_argument(
+            _OUTPUT_OPTION,
+            choices=list(ENCODERS),
+            help="print the value returned by the command in this format",
+        )
 
     def _set_known_names(self):
         for name, module in self._current_package.__dict__.items():
-            if _is_public(name) and (
-                _is_callable(module) or _is_module_shortcut(name, self._current_package)
+            if not _is_public(name):
+                continue
+            origin = get_unloaded_origin(module)
+            if (
+                self._is_unloaded_shortcut(name, origin)
+                if origin
+                else (
+                    _is_callable(module)
+                    or _is_module_shortcut(name, self._current_package)
+                )
             ):
                 self._known_names.add(name)
 
+    def _is_unloaded_shortcut(self, name: str, file_: str) -> bool:
+        """
+        Same as _is_module_shortcut for the module imported lazily,
+        without executing it unless only that tells
+        :param name: the package attribute name
+        :param file_: module file path
+        """
+        info = self._index.lookup(file_) or _describe_source(name, file_)
+        if info is None:
+            return _is_module_shortcut(name, self._current_package)
+        return info["kind"] == "feature"
+
     def _add_known_functions(self):
         for name in self._known_names:
             module = self._current_package.__dict__[name]
@@ -480,6 +998,12 @@ class _ArgParsingContext:
             ):
                 self.add_feature_parser(name, module)
 
+    def _get_current_paths(self) -> List[str]:
+        return [
+            (path_ + root_.replace(".", "/"))[:-1]
+            for root_, path_ in product(self._root_packages, self._search_path)
+        ]
+
     def build_all_features_help(self) -> None:
         """
         Here we are iterating through the search path and registering all features.
@@ -487,12 +1011,7 @@ class _ArgParsingContext:
         :return:
         """
 
-        self._add_parsers(
-            [
-                (path_ + root_.replace(".", "/"))[:-1]
-                for root_, path_ in product(self._root_packages, self._search_path)
-            ]
-        )
+        self._add_parsers(self._get_current_paths())
 
     def build_feature_help(self) -> None:
         self._set_known_names()
@@ -508,44 +1027,224 @@ class _ArgParsingContext:
         :param module: actual imported module
         :return:
         """
+        # the module files are needed only for looking up the index or the sources,
+        # listing the directories once for all the names
+        files = (
+            dict(self._index.iter_modules(self._get_current_paths()))
+            if self._index.persistent or self._static_help
+            else {}
+        )
         for name_ in _get_all__(module):
             if _is_public(name_):
-                self._add_parser(name_)
+                self._add_parser(name_, files.get(name_))
 
-    def execute(self) -> None:
+    def execute(self, argv: Optional[List[str]] = None) -> Any:
         """
         This is for actual execution of our CLI command - for Python this is an actual function call
-        :return:
+        :param argv: (optional) the command line arguments, sys.argv[1:] if not specified
+        :return: the command result
+        """
+        with closing_opened_files():
+            argv = sys.argv[1:] if argv is None else argv
+            with span("parse_args"):
+                args = self._parse_args(argv[self._n_routed :])
+            output = args.pop("output", None) or self._output
+            if not args and not (self._current_command or self._command_loader):
+                self._root_parser.print_usage()
+                sys.exit(1)
+            if self._current_command is None:
+                self._current_command = self._command_loader()  # type: ignore
+            with span(f"command {self._current_command.__name__}"):
+                try:
+                    result = _execute_command(
+                        args,
+                        self._current_command,
+                        self._event_loop,
+                        get_stream_format(output, self._stream_format),
+                    )
+                except InvalidItemError as err:
+                    # the command has run, the direct parser must not hand it over
+                    ArgumentParser.error(self._command_parser, str(err))
+        if output:
+            write_result(result, output)
+        return result
+
+    def _parse_args(self, argv: List[str]) -> Dict[str, Any]:
+        """
+        Parse the command line, the *args and **kwargs values are taken by
+        the command argument action at once, see _split_var_values
+        :param argv: the command line arguments
+        :return: the parsed arguments
+        """
+        parser = self._command_parser
+        split = _split_var_values(argv, self._root_parser, parser) if parser else None
+        if split is None:
+            namespace = self._root_parser.parse_args(argv)
+        else:
+            head, values, action = split
+            namespace = self._root_parser.parse_args(head)
+            try:
+                action(parser, namespace, values)
+            except ArgumentError as err:
+                parser.error(str(err))  # type: ignore
+        args = vars(namespace)
+        source = args.pop("args_from", None)
+        if source is not None:
+            self._add_var_values_from(source, namespace)
+        return args
+
+    def _add_var_values_from(self, source: str, namespace: Namespace) -> None:
+        """
+        Add the *args and **kwargs values read from the file or stdin
+        :param source: the file path or - for stdin
+        :param namespace: the parsed arguments
+        """
+        parser: ArgumentParser = self._command_parser  # type: ignore
+        _, action = _get_var_action(parser)
+        try:
+            values = list(read_args(open_binary(source)))
+        except ArgumentTypeError as err:
+            parser.error(f"argument {_ARGS_FROM_OPTION}: {err}")
+        try:
+            action.add_values(namespace, values)  # type: ignore
+        except ArgumentError as err:
+            parser.error(str(err))
+
+    def save_index(self) -> None:
+        with span("save index"):
+            self._index.save()
+
+    def _locate_packages(self, name: str) -> List[str]:
         """
-        args = vars(self._root_parser.parse_args())
-        if not args and not self._current_command:
-            self._root_parser.print_usage()
-            sys.exit(1)
-        _execute_command(args, self._current_command)
+        :param name: module name
+        :return: the root packages to import the module from, with a feature locator
+            only the ones it is found in, without a round trip for each of the others
+        """
+        paths_ = self._get_current_paths()
+        located = self._index.locate(name, paths_)
+        if located is None:
+            return self._root_packages
+        n_paths = len(self._search_path)
+        return [
+            root_
+            for i, root_ in enumerate(self._root_packages)
+            if any(
+                path_ in located for path_ in paths_[i * n_paths : (i + 1) * n_paths]
+            )
+        ]
 
     def import_module(self, name) -> ModuleType:
         err_msg = None
-        for package in self._root_packages:
-            full_name = package + name
-            try:
-                return import_module(full_name)
-            except ImportError as err:
-                if f"No module named '{full_name}'" != err.msg:
+        with span(f"import {name}"):
+            for package in self._locate_packages(name):
+                full_name = package + name
+                if self._index.is_absent(full_name):
+                    continue
+                try:
+                    return load(import_module(full_name))
+                except ModuleNotFoundError as err:
+                    if err.name != full_name:
+                        err_msg = err.msg
+                        break
+                    self._index.record_absent(full_name, _get_package_dirs(package))
+                except ImportError as err:
                     err_msg = err.msg
                     break
-            except Exception as err:
-                err_msg = str(err)
-                break
+                except Exception as err:
+                    err_msg = str(err)
+                    break
 
         raise ImportError(f"{name} - {err_msg}")
 
-    def add_feature_parser(self, name: str, module: ModuleType) -> None:
+    def _resolve_command(
+        self, names: List[str]
+    ) -> Optional[Tuple[int, str, ModuleType]]:
+        """
+        Follow the command path the same way the state machine does,
+        importing only the modules on the way
+        :param names: the Python names of the command line arguments
+        :return: how many names the command path takes, the command name and
+            the module it is in; None if the path does not lead to a command,
+            or only the state machine knows where it leads
+        """
+        module: Optional[ModuleType] = None
+        for i, name in enumerate(names, 1):
+            if module is not None:
+                if _is_package_command(name, module):
+                    return i, name, module
+                if not _is_package(module) or _is_module_shortcut(name, module):
+                    return None
+            try:
+                module = self.import_module(name)
+            except ImportError:
+                return None
+            if "__all__" in module.__dict__:
+                return None
+            if _is_package(module):
+                self._root_packages = [f"{module.__name__}."]
+            elif not _is_feature_module(name, module):
+                return (
+                    (i, name, module) if _is_callable(module.__dict__[name]) else None
+                )
+        return None
+
+    def route_directly(self) -> bool:
+        """
+        Resolve the command line straight to the command and build its parser only,
+        without the parsers of the features leading to it
+        :return: False if the command line needs the state machine for the help,
+            or the error message
+        """
+        prog, *args = self._args
+        if any(arg in _HELP_ARGS for arg in sys.argv):
+            return False
+        names: List[str] = []
+        for arg in args:
+            if arg.startswith("-") or arg != _get_cli_name(arg):
+                break
+            names.append(arg.replace("-", "_"))
+        if sys.argv[1 : len(names) + 1] != args[: len(names)]:
+            return False  # the options before the command
+        root_packages = self._root_packages
+        with span("route directly"):
+            command = self._resolve_command(names)
+            if command is None:
+                self._root_packages = root_packages
+                return False
+            n_routed, name, module = command
+            setattr(ArgumentParser, "_check_value", _choices_patch())
+            self._current_subparsers = _DirectSubParsers(  # type: ignore
+                " ".join([path.basename(prog), *args[: n_routed - 1]])
+            )
+            try:
+                self._root_parser = self.add_command_parser(name, module)
+            except _DiscoveryNeeded:  # e.g. unsupported argument type
+                self._root_packages = root_packages
+                self._command_parser = self._current_command = None
+                return False
+        self._n_routed = n_routed
+        return True
+
+    def add_feature_parser(self, name: str, module: ModuleType) -> ArgumentParser:
         self._root_packages = [f"{module.__name__}."]
-        parser = self._current_subparsers.add_parser(
-            _get_cli_name(name), help=_get_feature_help(module)
+        return self.add_feature_entry(
+            _get_cli_name(name), _get_feature_help(module), _get_version(module)
         )
-        self._current_subparsers = parser.add_subparsers()
-        _add_version(parser, module)
+
+    def add_feature_entry(
+        self, name: str, help_: str, version_: Optional[str]
+    ) -> ArgumentParser:
+        """
+        Register the feature parser and make its subparsers current
+        :param name: feature CLI name
+        :param help_: feature help message
+        :param version_: (optional) feature version
+        :return: parser object
+        """
+        parser = self._current_subparsers.add_parser(name, help=help_)
+        self._current_subparsers = parser.add_subparsers(action=_LazySubParsersAction)
+        _add_version_string(parser, version_)
+        return parser
 
     def add_feature(self, name: str, module: ModuleType) -> None:
         self.add_feature_parser(_get_cli_name(name), module)
@@ -553,15 +1252,41 @@ class _ArgParsingContext:
         # f_name = module.__file__ or ""
         # self._search_path = [p for p in self._search_path if f_name.startswith(p)]
 
-    def add_command_parser(self, name: str, module: ModuleType) -> None:
+    def add_command_parser(self, name: str, module: ModuleType) -> ArgumentParser:
         command = module.__dict__[name]
-        description, spec = _parse_command_doc(command)
-        arg_docs = _convert_docstring_to_param_docs(_get_args_from_spec(spec))
+        meta = _get_command_meta(command)
         parser = self._build_command_executor(
-            command, _get_cli_name(name), description, arg_docs
+            command, _get_cli_name(name), meta.description, meta.param_docs
         )
         _add_version(parser, module)
-        return None
+        return parser
+
+    def add_command_entry(
+        self,
+        name: str,
+        description: str,
+        param_docs: Optional[Dict[str, str]],
+        parameters: List[Parameter],
+        version_: Optional[str],
+        loader: Callable[[], Callable],
+    ) -> ArgumentParser:
+        """
+        Register the command parser without having the function object at hand;
+        the function will be loaded right before the execution
+        :param name: command CLI name
+        :param description: help description of the command
+        :param param_docs: arguments dictionary with help messages
+        :param parameters: the function signature parameters
+        :param version_: (optional) command version
+        :param loader: returns the function object
+        :return: parser object
+        """
+        parser = self._current_subparsers.add_parser(name, description=description)
+        self._command_parser = parser
+        self._command_loader = loader
+        self._add_command_args(parser, parameters, param_docs)
+        _add_version_string(parser, version_)
+        return parser
 
     def build_module_feature_help(self, module: ModuleType) -> None:
         """
@@ -572,8 +1297,8 @@ class _ArgParsingContext:
         """
         for name, command in module.__dict__.items():
             if _is_public(name) and _is_callable(command):
-                self._current_subparsers.add_parser(
-                    name, help=_get_command_description(command)
+                self._current_subparsers.add_lazy_parser(
+                    name, _get_command_description(command)
                 )
 
     def build_module_feature_help_with_all_(self, module: ModuleType) -> None:
@@ -583,24 +1308,37 @@ class _ArgParsingContext:
         :return:
         """
         for name_ in _get_all__(module):
-            self._current_subparsers.add_parser(
-                name_, help=_get_command_description(command=module.__dict__[name_])
+            self._current_subparsers.add_lazy_parser(
+                name_, _get_command_description(command=module.__dict__[name_])
             )
 
     def _add_parsers(self, paths_: List[str]) -> None:
-        for module_info in sorted(iter_modules(paths_), key=lambda m: m.name):
-            name = module_info.name
+        for name, file_ in sorted(self._index.iter_modules(paths_)):
             if _is_public(name) and name not in self._known_names:
-                self._add_parser(name)
+                self._add_parser(name, file_)
 
-    def _add_parser(self, name: str) -> None:
+    def _add_parser(self, name: str, file_: Optional[str] = None) -> None:
+        """
+        Register the feature or command help, taking it from the index if possible
+        :param name: module name
+        :param file_: (optional) module file path for looking up the index
+        :return:
+        """
+        info = self._index.lookup(file_)
+        if info is None and self._static_help and file_:
+            info = _describe_source(name, file_)
+            self._index.record(file_, lambda: info)  # type: ignore
+        if info is not None:
+            self._current_subparsers.add_lazy_parser(_get_cli_name(name), info["help"])
+            return
         try:
             module = self.import_module(name)
             help_ = _get_module_help(name, module)
+            self._index.record(file_, partial(_describe_module, name, module))
         except ImportError as err:
             help_ = f"[ERROR] failed to import {err.msg}"
         finally:
-            self._current_subparsers.add_parser(_get_cli_name(name), help=help_)
+            self._current_subparsers.add_lazy_parser(_get_cli_name(name), help_)
 
     def _build_command_executor(
         self,
@@ -620,17 +1358,30 @@ class _ArgParsingContext:
         :return: parser object
         """
         parser = self._current_subparsers.add_parser(name, description=description)
-        sig_ = signature(command)
+        self._command_parser = parser
+        parameters = _get_command_meta(command).parameters
         self._current_command = command
-        nargs = None
+        self._add_command_args(parser, parameters, param_docs)
+        return parser
+
+    def _add_command_args(
+        self,
+        parser: ArgumentParser,
+        parameters: Iterable[Parameter],
+        param_docs: Optional[Dict[str, str]],
+    ) -> None:
+        action = None
         try:
-            for arg_name, param in sig_.parameters.items():
-                nargs = _add_command_arg(
-                    parser, arg_name, param, param_docs, self._args, nargs
-                )
+            for param in parameters:
+                action = _add_command_arg(parser, param.name, param, param_docs, action)
         except ValueError as err:
             parser.error(str(err))
-        return parser
+        if isinstance(action, _VarAction):
+            parser.add_argument(
+                _ARGS_FROM_OPTION,
+                metavar="FILE",
+                help="read more values from the file, - for stdin",
+            )
 
 
 # ArgParsing State Machine controlling gradual progress;
@@ -751,6 +1502,54 @@ def _choose_state(
         return None
 
 
+def _discover(iter_: Iterator[str], context: _ArgParsingContext) -> None:
+    """
+    Run the state machine from the CLI name to the command or the features help
+    :param iter_: iterator over the command line arguments
+    :param context: the argument parsing context
+    """
+    current_state: _ArgParsingState = _initial_state
+    while current_state is not None:
+        with span(f"state {current_state.__name__}"):
+            current_state = current_state(iter_, context)
+
+
+def _build_from_manifest(file_: str, context: _ArgParsingContext) -> bool:
+    """
+    Build the parsers from the frozen manifest instead of discovering features
+    :param file_: the manifest file path
+    :param context: the argument parsing context
+    :return: False if the manifest is missing or the command line requires discovery
+    """
+    from ._manifest import load_manifest, run_manifest
+
+    with span("load manifest"):
+        manifest = load_manifest(file_)
+    with span("build from manifest"):
+        return manifest is not None and run_manifest(manifest, context)
+
+
+_SESSION_OPTIONS: Final[Set[str]] = {
+    "--shell",
+    "--batch",
+    "--map",
+    "--continue-on-error",
+    "--jsonl",
+    "--parallel",
+    "--executor",
+    "--stream",
+}
+
+
+def _get_env_flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in {"1", "true", "yes", "on"}
+
+
+def _get_env_number(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
 def _initial_state(
     iter_: Iterator[str], context: _ArgParsingContext
 ) -> _ArgParsingState:
@@ -758,23 +1557,264 @@ def _initial_state(
     return _waiting_for_first_feature_or_command
 
 
+ContextFactory = Callable[[List[str]], _ArgParsingContext]
+
+
+def _get_context_factory(
+    search_path: List[str],
+    root_packages: Optional[List[str]],
+    cache_dir: Optional[str],
+    static_help: Optional[bool],
+    event_loop: Optional[str],
+    stream_format: Optional[str],
+    output: Optional[str],
+    scan_workers: Optional[int],
+    scan_timeout: Optional[float],
+    locator: Union[None, str, FeatureLocator],
+) -> ContextFactory:
+    """
+    Resolve the context options, falling back to the environment variables
+    :return: function making the context for the command line arguments
+    """
+    return partial(
+        _ArgParsingContext,
+        root_packages,
+        search_path,
+        cache_dir=cache_dir or os.environ.get("DYNACLI_CACHE_DIR"),
+        static_help=(
+            _get_env_flag("DYNACLI_STATIC_HELP") if static_help is None else static_help
+        ),
+        event_loop=event_loop or os.environ.get("DYNACLI_EVENT_LOOP"),
+        stream_format=stream_format or os.environ.get("DYNACLI_STREAM_FORMAT"),
+        output=output or os.environ.get("DYNACLI_OUTPUT"),
+        scan_workers=scan_workers or int(os.environ.get("DYNACLI_SCAN_WORKERS") or 1),
+        scan_timeout=(
+            _get_env_number("DYNACLI_SCAN_TIMEOUT")
+            if scan_timeout is None
+            else scan_timeout
+        ),
+        locator=get_locator(locator or os.environ.get("DYNACLI_LOCATOR")),
+    )
+
+
+def _get_exit_status(code: object) -> int:
+    """
+    :param code: the SystemExit code
+    :return: the exit status, the message is printed to stderr
+    """
+    if code is None or isinstance(code, int):
+        return code or 0
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _strip_help_args(argv: List[str]) -> List[str]:
+    """
+    :return: the command line without the help, version and output options,
+        which do not affect the features and the command it leads to
+    """
+    if not any(arg.startswith("-") for arg in argv):
+        return list(argv)
+    stripped = []
+    skip_value = False
+    for arg in argv:
+        if skip_value:
+            skip_value = False
+        elif arg == _OUTPUT_OPTION:
+            skip_value = True
+        elif arg not in _HELP_ARGS and not arg.startswith(_OUTPUT_PREFIX):
+            stripped.append(arg)
+    return stripped
+
+
+def _run(
+    get_context_factory: Callable[[], ContextFactory],
+    profile: Optional[str],
+    manifest: Optional[str],
+) -> None:
+    with profiling(profile or os.environ.get("DYNACLI_PROFILE")):
+        args = _strip_help_args(sys.argv)
+        make_context = partial(get_context_factory(), args)
+        context = make_context()
+        manifest_file = manifest or os.environ.get("DYNACLI_MANIFEST")
+        if not (manifest_file and _build_from_manifest(manifest_file, context)):
+            context = make_context() if manifest_file else context
+            if context.route_directly():
+                context.save_index()
+                try:
+                    context.execute()
+                    return
+                except _DiscoveryNeeded:  # the error message needs all the parsers
+                    context = make_context()
+            _discover(iter(args), context)
+            context.save_index()
+        context.execute()
+
+
+def _warm_up(search_path: List[str], root_packages: Optional[List[str]]) -> None:
+    """
+    Import every feature module by walking the whole command tree
+    """
+    from ._manifest import build_manifest
+
+    _command_metas.clear()
+    build_manifest(search_path, root_packages)
+
+
+def _complete(
+    search_path: List[str],
+    root_packages: Optional[List[str]],
+    cache_dir: Optional[str],
+    manifest: Optional[str],
+) -> None:
+    """
+    `<CLI> --completion bash|zsh|fish` prints the completion script,
+    `<CLI> __complete [--describe] <words>` prints the candidates for the last word
+    """
+    from ._complete import complete, get_default_cache_dir, load_tree, make_script
+
+    prog = path.basename(sys.argv[0])
+    mode, *words = sys.argv[1:]
+    if mode == "--completion":
+        try:
+            print(make_script(words[0] if words else "", prog), end="")
+        except ValueError as err:
+            sys.exit(f"{prog}: {err}")
+        return
+    describe = words[:1] == ["--describe"]
+    tree = load_tree(
+        search_path,
+        root_packages,
+        cache_dir or os.environ.get("DYNACLI_CACHE_DIR") or get_default_cache_dir(),
+        manifest or os.environ.get("DYNACLI_MANIFEST"),
+    )
+    for name, help_ in complete(tree, words[describe:]):
+        print(f"{name}\t{' '.join(help_.split())}" if describe and help_ else name)
+
+
+def _run_session(
+    search_path: List[str],
+    root_packages: Optional[List[str]],
+    make_context: ContextFactory,
+) -> None:
+    from ._modes import run_session
+
+    status = run_session(sys.argv, search_path, root_packages, make_context)
+    if status:
+        sys.exit(status)
+
+
+def _serve_or_forward(
+    socket_path: str,
+    search_path: List[str],
+    root_packages: Optional[List[str]],
+    run: Callable[[], None],
+) -> None:
+    from ._server import forward, serve
+
+    if sys.argv[1:] == ["--serve"]:
+        serve(
+            socket_path, search_path, partial(_warm_up, search_path, root_packages), run
+        )
+        return
+    status = forward(socket_path)
+    if status is None:  # the server is not running
+        run()
+    elif status:
+        sys.exit(status)
+
+
 def main(
     search_path: List[str],
     root_packages: Optional[List[str]] = None,
+    cache_dir: Optional[str] = None,
+    static_help: Optional[bool] = None,
+    profile: Optional[str] = None,
+    manifest: Optional[str] = None,
+    server: Optional[str] = None,
+    event_loop: Optional[str] = None,
+    stream_format: Optional[str] = None,
+    output: Optional[str] = None,
+    scan_workers: Optional[int] = None,
+    scan_timeout: Optional[float] = None,
+    locator: Union[None, str, FeatureLocator] = None,
+    lazy_imports: Optional[bool] = None,
 ) -> None:
     """
     This is the main entrypoint for the CLI.
     :param search_path: the list of paths to look for features
     :param root_packages: (optional) the list of root package names
+    :param cache_dir: (optional) the directory for the persistent feature index,
+        DYNACLI_CACHE_DIR environment variable is used if not specified
+    :param static_help: (optional) build the features help by parsing their source
+        instead of importing them, DYNACLI_STATIC_HELP environment variable
+        is used if not specified
+    :param profile: (optional) "stderr" for printing the startup timing report on exit,
+        or a file path for saving it, DYNACLI_PROFILE environment variable
+        is used if not specified
+    :param manifest: (optional) the frozen manifest file made by `dynacli compile`,
+        DYNACLI_MANIFEST environment variable is used if not specified
+    :param server: (optional) the Unix socket of the resident server: `<CLI> --serve`
+        starts it, other command lines are run by it if it is running,
+        DYNACLI_SERVER environment variable is used if not specified
+    :param event_loop: (optional) the event loop for the async commands: "auto"
+        (uvloop if installed), "asyncio", "uvloop" or "<module>:<factory function>",
+        DYNACLI_EVENT_LOOP environment variable is used if not specified
+    :param stream_format: (optional) how the items of the iterators returned by
+        the commands are printed: "lines" (default), "jsonl" or "csv",
+        DYNACLI_STREAM_FORMAT environment variable is used if not specified
+    :param output: (optional) the default of the `--output` option printing the values
+        returned by the commands: "json", "yaml", "table" or a registered format,
+        DYNACLI_OUTPUT environment variable is used if not specified
+    :param scan_workers: (optional) how many search path directories are listed
+        concurrently, 1 (default) lists them one by one,
+        DYNACLI_SCAN_WORKERS environment variable is used if not specified
+    :param scan_timeout: (optional) seconds to wait for the concurrent directory
+        listings, the slower directories are taken from the feature index,
+        DYNACLI_SCAN_TIMEOUT environment variable is used if not specified
+    :param locator: (optional) the FeatureLocator listing the feature directories
+        in batches, or "<module>:<function>" returning it, DYNACLI_LOCATOR environment
+        variable is used if not specified, then the first importer on sys.meta_path
+        implementing FeatureLocator and having dynacli_feature_locator = True
+    :param lazy_imports: (optional) execute the modules under the search path
+        on the first access to their attributes, so that the feature packages
+        importing their modules execute only the ones the command uses,
+        DYNACLI_LAZY_IMPORTS environment variable is used if not specified
     :return:
+
+    `<CLI> --shell` reads the command lines from stdin and runs them one by one,
+    discovering every command path once, `<CLI> --batch FILE` does the same
+    for the lines of the file, see `<CLI> --shell --help` for all the session options.
     """
-    args = [arg for arg in sys.argv if arg not in {"-h", "--help", "-v", "--version"}]
-    iter_ = iter(args)
-    context = _ArgParsingContext(root_packages, search_path, args)
-    current_state = _initial_state
-    while current_state is not None:
-        current_state = current_state(iter_, context)
-    context.execute()
+    if sys.argv[1:2] in (["__complete"], ["--completion"]):
+        _complete(search_path, root_packages, cache_dir, manifest)
+        return
+    if _get_env_flag("DYNACLI_LAZY_IMPORTS") if lazy_imports is None else lazy_imports:
+        from ._lazy import install
+
+        install(search_path)
+    get_context_factory = partial(
+        _get_context_factory,
+        search_path,
+        root_packages,
+        cache_dir,
+        static_help,
+        event_loop,
+        stream_format,
+        output,
+        scan_workers,
+        scan_timeout,
+        locator,
+    )
+    if sys.argv[1:2] and sys.argv[1].partition("=")[0] in _SESSION_OPTIONS:
+        _run_session(search_path, root_packages, get_context_factory())
+        return
+    run = partial(_run, get_context_factory, profile, manifest)
+    socket_path = server or os.environ.get("DYNACLI_SERVER")
+    if socket_path:
+        _serve_or_forward(socket_path, search_path, root_packages, run)
+    else:
+        run()
 
 
 __all__: Final[List[Callable]] = ["main"]
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+DynaCLI *args and **kwargs parsing benchmark
+
+Runs a command taking *args and **kwargs with growing numbers of values and measures
+the command line parsing. The time per value should stay flat as the number
+of values grows. Every sample runs in a fresh interpreter; the command line is set up
+inside of it, so the OS limit on the arguments size does not apply.
+"""
+
+import json
+import os
+import platform
+import sys
+from argparse import ArgumentParser, Namespace
+from statistics import median
+from subprocess import run
+from tempfile import TemporaryDirectory
+from textwrap import dedent
+from typing import Dict, List
+
+from startup import _get_dynacli_version, _get_env
+
+KINDS = ("args", "kwargs", "both")
+
+_CLI = '''\
+#!/usr/bin/env python3
+"""
+Synthetic DynaCLI benchmark tool
+"""
+
+import os
+import sys
+
+from dynacli import main
+
+cwd = os.path.dirname(os.path.realpath(__file__))
+search_path = [f"{cwd}/storage/"]
+sys.path.extend(search_path)
+
+main(search_path, ["bench"])
+'''
+
+_COMMAND = '''\
+"""
+Collect the values
+"""
+
+
+def collect(name: str, *values: int, **options: int) -> None:
+    """
+    Count the values
+
+    Args:
+        name (str): name
+        *values (int): values
+        **options (int): options
+    """
+    print(name, len(values), len(options))
+'''
+
+# Runs inside the benchmarked interpreter: makes up the command line and times
+# the execution, which is mostly parsing as the command only counts the values
+_CHILD = """
+import json
+import runpy
+import sys
+import time
+
+from dynacli import dynacli
+
+timings = {"execute": 0.0}
+execute = dynacli._ArgParsingContext.execute
+
+
+def _timed_execute(*args, **kwargs):
+    start = time.perf_counter()
+    try:
+        return execute(*args, **kwargs)
+    finally:
+        timings["execute"] += time.perf_counter() - start
+
+
+dynacli._ArgParsingContext.execute = _timed_execute
+
+results_file, cli, kind, size = sys.argv[1:]
+size = int(size)
+values = [str(i) for i in range(size)] if kind != "kwargs" else []
+options = [f"key-{i}={i}" for i in range(size)] if kind != "args" else []
+sys.argv = [cli, "collect", "name", *values, *options]
+start = time.perf_counter()
+try:
+    runpy.run_path(cli, run_name="__main__")
+except SystemExit:
+    pass
+main = time.perf_counter() - start
+with open(results_file, "w") as f:
+    json.dump({"main": main, "execute": timings["execute"]}, f)
+"""
+
+
+def _generate_cli(root: str) -> str:
+    os.makedirs(f"{root}/storage/bench")
+    with open(f"{root}/storage/bench/__init__.py", "w"):
+        pass
+    with open(f"{root}/storage/bench/collect.py", "w") as f:
+        f.write(dedent(_COMMAND))
+    cli = f"{root}/benchcli"
+    with open(cli, "w") as f:
+        f.write(_CLI)
+    return cli
+
+
+def _run_sample(
+    cli: str, kind: str, size: int, results_file: str, env: Dict[str, str]
+) -> Dict[str, float]:
+    run(
+        [sys.executable, "-c", _CHILD, results_file, cli, kind, str(size)],
+        capture_output=True,
+        env=env,
+        check=True,
+    )
+    with open(results_file) as f:
+        return json.load(f)
+
+
+def _run_scenario(
+    cli: str, kind: str, size: int, repeat: int, tmp: str, env: Dict[str, str]
+) -> Dict[str, float]:
+    results_file = f"{tmp}/sample.json"
+    _run_sample(cli, kind, size, results_file, env)  # warm up the bytecode cache
+    samples = [_run_sample(cli, kind, size, results_file, env) for _ in range(repeat)]
+    n_values = size * 2 if kind == "both" else size
+    execute = median(sample["execute"] for sample in samples)
+    return {
+        "values": n_values,
+        "main": median(sample["main"] for sample in samples),
+        "execute": execute,
+        "per_value": execute / n_values,
+    }
+
+
+def _print_report(results: dict) -> None:
+    print(f"dynacli {results['dynacli']}")
+    print(f"{'kind':<8}{'values':>10}{'main':>12}{'execute':>12}{'per value':>12}")
+    for kind, scenarios in results["scenarios"].items():
+        for scenario in scenarios:
+            print(
+                f"{kind:<8}{scenario['values']:>10}"
+                f"{scenario['main'] * 1000:>10.1f}ms"
+                f"{scenario['execute'] * 1000:>10.1f}ms"
+                f"{scenario['per_value'] * 1e6:>10.2f}us"
+            )
+        first, last = scenarios[0], scenarios[-1]
+        print(
+            f"{'  scaling':<8}{last['per_value'] / first['per_value']:>53.2f}x"
+            " per value"
+        )
+
+
+def _parse_args() -> Namespace:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="numbers of values to run with",
+    )
+    parser.add_argument(
+        "--kind", choices=KINDS, nargs="+", default=list(KINDS), help="what to pass"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="samples per scenario")
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument(
+        "--dynacli-path", help="benchmark DynaCLI from this path instead of installed"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    env = _get_env(args.dynacli_path)
+    sizes: List[int] = sorted(args.sizes)
+    with TemporaryDirectory() as tmp:
+        cli = _generate_cli(tmp)
+        results = {
+            "dynacli": _get_dynacli_version(env),
+            "python": platform.python_version(),
+            "scenarios": {
+                kind: [
+                    _run_scenario(cli, kind, size, args.repeat, tmp, env)
+                    for size in sizes
+                ]
+                for kind in args.kind
+            },
+        }
+    _print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+DynaCLI startup benchmark
+
+Generates a synthetic feature tree and measures main() end to end
+for the help, nested help and command execution paths.
+Every sample runs in a fresh interpreter, so module imports are never warm.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from statistics import median
+from subprocess import DEVNULL, PIPE, run
+from tempfile import TemporaryDirectory
+from typing import Dict, List, Optional
+
+from tree import TreeInfo, generate_tree
+
+PHASES = ("wall", "main", "import", "build", "parse")
+
+# Runs inside the benchmarked interpreter: wraps the DynaCLI entry points with timers
+_CHILD = """
+import json
+import runpy
+import sys
+import time
+from argparse import ArgumentParser
+
+start = time.perf_counter()
+from dynacli import dynacli
+dynacli_import = time.perf_counter() - start
+
+timings = {"import": 0.0, "execute": 0.0, "parse": 0.0}
+
+
+def _timed(phase, func):
+    def _wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[phase] += time.perf_counter() - start
+
+    return _wrapper
+
+
+Context = dynacli._ArgParsingContext
+Context.import_module = _timed("import", Context.import_module)
+Context.execute = _timed("execute", Context.execute)
+ArgumentParser.parse_args = _timed("parse", ArgumentParser.parse_args)
+
+results_file, cli, *args = sys.argv[1:]
+sys.argv = [cli, *args]
+start = time.perf_counter()
+try:
+    runpy.run_path(cli, run_name="__main__")
+except SystemExit:
+    pass
+main = time.perf_counter() - start
+with open(results_file, "w") as f:
+    json.dump(
+        {
+            "dynacli_import": dynacli_import,
+            "main": main,
+            "import": timings["import"],
+            "build": main - timings["execute"] - timings["import"],
+            "parse": timings["parse"],
+        },
+        f,
+    )
+"""
+
+
+def _run_sample(
+    tree: TreeInfo, args: List[str], results_file: str, env: Dict[str, str]
+) -> Dict[str, float]:
+    if os.path.exists(results_file):
+        os.remove(results_file)  # not to take the previous sample for this one
+    start = time.perf_counter()
+    result = run(
+        [sys.executable, "-c", _CHILD, results_file, tree["cli"], *args],
+        stdout=DEVNULL,
+        stderr=PIPE,
+        env=env,
+        check=False,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0 or not os.path.exists(results_file):
+        sys.exit(
+            f"{' '.join(args)}: the benchmarked process failed with exit status "
+            f"{result.returncode}\n{result.stderr.decode(errors='replace')}"
+        )
+    with open(results_file) as f:
+        sample = json.load(f)
+    sample["wall"] = wall
+    return sample
+
+
+def _run_scenario(
+    tree: TreeInfo, args: List[str], repeat: int, tmp: str, env: Dict[str, str]
+) -> Dict[str, Dict[str, float]]:
+    results_file = f"{tmp}/sample.json"
+    _run_sample(tree, args, results_file, env)  # warm up the bytecode cache
+    samples = [_run_sample(tree, args, results_file, env) for _ in range(repeat)]
+    return {
+        phase: {
+            "median": median(sample[phase] for sample in samples),
+            "min": min(sample[phase] for sample in samples),
+            "max": max(sample[phase] for sample in samples),
+        }
+        for phase in PHASES
+    }
+
+
+def _get_env(dynacli_path: Optional[str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    if dynacli_path:
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [dynacli_path, env.get("PYTHONPATH")])
+        )
+    return env
+
+
+def _get_dynacli_version(env: Dict[str, str]) -> str:
+    result = run(
+        [sys.executable, "-c", "import dynacli; print(dynacli.__version__)"],
+        capture_output=True,
+        env=env,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
+
+def _print_report(results: dict, baseline: Optional[dict]) -> None:
+    print(f"dynacli {results['dynacli']}, {results['tree']['modules']} modules")
+    print(f"{'scenario':<14}" + "".join(f"{phase:>12}" for phase in PHASES))
+    for scenario, phases in results["scenarios"].items():
+        row = f"{scenario:<14}"
+        for phase in PHASES:
+            value = phases[phase]["median"] * 1000
+            row += f"{value:>10.1f}ms"
+        print(row)
+        if baseline and scenario in baseline["scenarios"]:
+            row = f"{'  vs baseline':<14}"
+            for phase in PHASES:
+                base = baseline["scenarios"][scenario][phase]["median"]
+                ratio = phases[phase]["median"] / base if base else float("nan")
+                row += f"{ratio:>11.2f}x"
+            print(row)
+
+
+def _parse_args() -> Namespace:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=10, help="features per package")
+    parser.add_argument("--depth", type=int, default=2, help="nested feature levels")
+    parser.add_argument("--commands", type=int, default=5, help="commands per package")
+    parser.add_argument(
+        "--import-weight", type=int, default=50, help="helper functions per module"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="samples per scenario")
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    parser.add_argument(
+        "--dynacli-path", help="benchmark DynaCLI from this path instead of installed"
+    )
+    args = parser.parse_args()
+    if args.commands < 1:
+        parser.error("at least one command per package is required")
+    return args
+
+
+def main() -> None:
+    args = _parse_args()
+    env = _get_env(args.dynacli_path)
+    with TemporaryDirectory() as tmp:
+        tree = generate_tree(
+            tmp, args.width, args.depth, args.commands, args.import_weight
+        )
+        results = {
+            "dynacli": _get_dynacli_version(env),
+            "python": platform.python_version(),
+            "timestamp": time.time(),
+            "tree": {
+                "width": args.width,
+                "depth": args.depth,
+                "commands": args.commands,
+                "import_weight": args.import_weight,
+                "modules": tree["modules"],
+            },
+            "scenarios": {
+                scenario: _run_scenario(
+                    tree,
+                    argv,
+                    args.repeat,
+                    tmp,
+                    {**env, **tree["env"].get(scenario, {})},
+                )
+                for scenario, argv in tree["scenarios"].items()
+            },
+        }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
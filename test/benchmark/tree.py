@@ -0,0 +1,130 @@
+"""
+Synthetic feature tree generator for the startup benchmarks
+"""
+
+import os
+from textwrap import dedent
+from typing import Dict, List, TypedDict
+
+ROOT_PACKAGE = "bench"
+
+_CLI = '''\
+#!/usr/bin/env python3
+"""
+Synthetic DynaCLI benchmark tool
+"""
+
+import os
+import sys
+
+from dynacli import main
+
+cwd = os.path.dirname(os.path.realpath(__file__))
+search_path = [f"{cwd}/storage/"]
+sys.path.extend(search_path)
+
+main(search_path, ["bench"])
+'''
+
+
+class TreeInfo(TypedDict):
+    """The generated tree entrypoint, the sample command lines and their environment"""
+
+    cli: str
+    modules: int
+    scenarios: Dict[str, List[str]]
+    env: Dict[str, Dict[str, str]]
+
+
+def _make_weight(import_weight: int) -> str:
+    """
+    Top level code making the module import slower, imitating heavy dependencies
+    """
+    return "".join(
+        f"\n\ndef _helper_{i}(value: int) -> int:\n    return value * {i}\n"
+        for i in range(import_weight)
+    )
+
+
+def _make_command(name: str, import_weight: int) -> str:
+    return dedent(f'''\
+            """
+            Synthetic command module {name}
+            """
+
+
+            def {name}(environment: str, *names: str, **options: str) -> None:
+                """
+                Synthetic command {name}
+
+                Args:
+                    environment (str): environment name
+                    *names (str): the variable length list of names
+                    **options (str): the keyword options
+
+                Return: None
+                """
+            ''') + _make_weight(import_weight)
+
+
+def _make_feature(name: str, import_weight: int) -> str:
+    return f'"""\nSynthetic feature {name}\n"""\n' + _make_weight(import_weight)
+
+
+def _write(file_path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as f:
+        f.write(text)
+
+
+def _generate_package(
+    path_: str, level: int, width: int, depth: int, commands: int, import_weight: int
+) -> int:
+    modules = 0
+    for i in range(commands):
+        name = f"command_{level}_{i}"
+        _write(f"{path_}/{name}.py", _make_command(name, import_weight))
+        modules += 1
+    if level < depth:
+        for i in range(width):
+            name = f"feature_{level}_{i}"
+            _write(f"{path_}/{name}/__init__.py", _make_feature(name, import_weight))
+            modules += 1 + _generate_package(
+                f"{path_}/{name}", level + 1, width, depth, commands, import_weight
+            )
+    return modules
+
+
+def generate_tree(
+    root: str, width: int, depth: int, commands: int, import_weight: int
+) -> TreeInfo:
+    """
+    Generate the synthetic feature tree with its CLI entrypoint
+    :param root: the directory to generate the tree in
+    :param width: number of features in each package
+    :param depth: number of nested feature levels
+    :param commands: number of commands in each package, at least one
+    :param import_weight: number of helper functions in each module
+    :return: the tree entrypoint, the sample command lines and the environment
+        variables of the ones needing any
+    """
+    _write(f"{root}/storage/{ROOT_PACKAGE}/__init__.py", "")
+    modules = _generate_package(
+        f"{root}/storage/{ROOT_PACKAGE}", 0, width, depth, commands, import_weight
+    )
+    cli = f"{root}/benchcli"
+    _write(cli, _CLI)
+    features = [f"feature-{level}-0" for level in range(depth)]
+    command = f"command-{depth}-0"
+    return TreeInfo(
+        cli=cli,
+        modules=modules,
+        scenarios={
+            "help": ["-h"],
+            "nested-help": [*features, "-h"],
+            "execute": [*features, command, "env", "lib1", "lib2", "name=value"],
+            "complete": ["__complete", *features, ""],
+        },
+        # keep the completion cache out of the user cache directory
+        env={"complete": {"DYNACLI_CACHE_DIR": f"{root}/cache"}},
+    )
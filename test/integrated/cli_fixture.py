@@ -0,0 +1,108 @@
+"""
+The temporary CLI the startup and execution features are tested on
+"""
+
+import json
+import os
+import sys
+from glob import glob
+from subprocess import run
+from tempfile import TemporaryDirectory
+from textwrap import dedent
+from unittest import TestCase
+
+CLI = '''
+"""
+Index test CLI
+"""
+import os
+import sys
+
+from dynacli import main
+
+cwd = os.path.dirname(os.path.realpath(__file__))
+search_path = [f"{cwd}/storage/"]
+sys.path.extend(search_path)
+main(search_path, ["cli"])
+'''
+
+MODULES = {
+    "cli/__init__.py": "",
+    "cli/hello.py": '''
+        """
+        Greetings
+        """
+        def hello(name: str) -> None:
+            """
+            Say hello
+
+            Args:
+                name (str): whom to greet
+            """
+            print(f"Hello, {name}")
+        ''',
+    "cli/bye.py": '''
+        def bye(name: str) -> None:
+            """
+            Say bye
+
+            Args:
+                name (str): whom to say bye
+            """
+            print(f"Bye, {name}")
+        ''',
+    "cli/heavy.py": '''
+        """
+        Needs a dependency which is not installed
+        """
+        import not_installed_dependency
+
+
+        def crunch(size: int) -> None:
+            """
+            Crunch the numbers
+
+            Args:
+                size (int): how many numbers
+            """
+        ''',
+}
+
+
+def write(file_path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as f:
+        f.write(dedent(text))
+
+
+class CLITestCase(TestCase):
+    """Runs the CLI written to a temporary directory with the modules above"""
+
+    def setUp(self) -> None:
+        self._tmp = TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self._cli = f"{self._tmp.name}/testcli"
+        self._cache_dir = f"{self._tmp.name}/cache"
+        write(self._cli, CLI)
+        for name, text in MODULES.items():
+            write(f"{self._tmp.name}/storage/{name}", text)
+
+    def _run(self, *args: str, **env: str) -> str:
+        result = run(
+            [sys.executable, self._cli, *args],
+            capture_output=True,
+            env={**os.environ, **env},
+            text=True,
+        )
+        self.assertEqual("", result.stderr)
+        return result.stdout
+
+    def _patch_index(self, module: str, help_: str) -> None:
+        (index_file,) = glob(f"{self._cache_dir}/index-*.json")
+        with open(index_file) as f:
+            index = json.load(f)
+        index["modules"][f"{self._tmp.name}/storage/cli/{module}"]["info"][
+            "help"
+        ] = help_
+        with open(index_file, "w") as f:
+            json.dump(index, f)
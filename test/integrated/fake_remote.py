@@ -0,0 +1,37 @@
+"""
+Fake remote storage for testing the feature locators offline: the local directories
+are listed as if they were remote, every request takes FAKE_REMOTE_LATENCY seconds
+and is logged to FAKE_REMOTE_LOG, one JSON list of the directories per line
+"""
+
+import json
+import os
+import time
+from pkgutil import iter_modules
+from typing import Dict, List, Optional, Tuple
+
+
+class FakeRemote:
+    """FeatureLocator over the local file system with the injected latency"""
+
+    def __init__(self, latency: float = 0.0, log: Optional[str] = None) -> None:
+        self._latency = latency
+        self._log = log
+
+    def locate(self, paths_: List[str]) -> Dict[str, List[Tuple[str, bool, None]]]:
+        time.sleep(self._latency)
+        if self._log:
+            with open(self._log, "a") as f:
+                f.write(f"{json.dumps(paths_)}\n")
+        # remote modules have no local files
+        return {
+            path_: [(info.name, info.ispkg, None) for info in iter_modules([path_])]
+            for path_ in paths_
+        }
+
+
+def make_locator() -> FakeRemote:
+    return FakeRemote(
+        float(os.environ.get("FAKE_REMOTE_LATENCY") or 0),
+        os.environ.get("FAKE_REMOTE_LOG"),
+    )
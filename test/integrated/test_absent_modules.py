@@ -0,0 +1,48 @@
+import json
+import unittest
+from glob import glob
+
+from .cli_fixture import CLI, MODULES, CLITestCase, write
+
+
+class TestAbsentModules(CLITestCase):
+    """Checks the modules missing from the first root package are not imported again"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        write(self._cli, CLI.replace('["cli"]', '["cli", "extra"]'))
+        write(f"{self._tmp.name}/storage/extra/__init__.py", "")
+        write(
+            f"{self._tmp.name}/storage/extra/wave.py",
+            MODULES["cli/bye.py"].replace("bye", "wave").replace("Bye", "Wave"),
+        )
+
+    def _get_absent(self) -> dict:
+        (index_file,) = glob(f"{self._cache_dir}/index-*.json")
+        with open(index_file) as f:
+            return json.load(f)["absent"]
+
+    def test_absent_recorded(self) -> None:
+        for _ in range(2):
+            self.assertEqual(
+                "Wave, world\n",
+                self._run("wave", "world", DYNACLI_CACHE_DIR=self._cache_dir),
+            )
+        self.assertEqual(
+            [f"{self._tmp.name}/storage/cli"], list(self._get_absent()["cli.wave"])
+        )
+
+    def test_invalidated_by_new_module(self) -> None:
+        self._run("wave", "world", DYNACLI_CACHE_DIR=self._cache_dir)
+        write(
+            f"{self._tmp.name}/storage/cli/wave.py",
+            MODULES["cli/bye.py"].replace("bye", "wave"),
+        )
+        self.assertEqual(
+            "Bye, world\n",
+            self._run("wave", "world", DYNACLI_CACHE_DIR=self._cache_dir),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import signal
+import sys
+import unittest
+from subprocess import PIPE, Popen
+
+from .cli_fixture import CLITestCase, write
+
+
+class TestAsync(CLITestCase):
+    """Checks the coroutine and async generator commands"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        write(
+            f"{self._tmp.name}/storage/cli/fetch.py",
+            '''
+            """
+            Async commands
+            """
+            import asyncio
+
+
+            async def hosts(count: int) -> None:
+                """
+                Query the hosts concurrently
+
+                Args:
+                    count (int): number of hosts
+                """
+
+                async def _query(i: int) -> int:
+                    await asyncio.sleep(0.01 * (count - i))
+                    return i
+
+                print(*await asyncio.gather(*(_query(i) for i in range(count))))
+
+
+            async def stream(count: int):
+                """
+                Stream the results as they arrive
+
+                Args:
+                    count (int): number of results
+                """
+                for i in range(count):
+                    await asyncio.sleep(0)
+                    yield f"result {i}"
+
+
+            async def loop() -> None:
+                """
+                Print the event loop class
+                """
+                print(type(asyncio.get_running_loop()).__name__)
+
+
+            class _Later:
+                def __init__(self, value: str) -> None:
+                    self._value = value
+
+                def __await__(self):
+                    yield from asyncio.sleep(0).__await__()
+                    return self._value
+
+
+            def later(value: str) -> _Later:
+                """
+                Return the awaitable which is not a coroutine
+
+                Args:
+                    value (str): the value to return
+                """
+                return _Later(value)
+
+
+            async def hang() -> None:
+                """
+                Wait until cancelled
+                """
+                print("started", flush=True)
+                try:
+                    await asyncio.sleep(60)
+                except asyncio.CancelledError:
+                    print("cancelled", flush=True)
+                    raise
+            ''',
+        )
+
+    def test_coroutine(self) -> None:
+        self.assertEqual("0 1 2\n", self._run("fetch", "hosts", "3"))
+
+    def test_async_generator(self) -> None:
+        self.assertEqual("result 0\nresult 1\n", self._run("fetch", "stream", "2"))
+
+    def test_awaitable(self) -> None:
+        self.assertEqual(
+            '"done"\n', self._run("--output", "json", "fetch", "later", "done")
+        )
+
+    def test_event_loop(self) -> None:
+        self.assertEqual(
+            "_UnixSelectorEventLoop\n",
+            self._run("fetch", "loop", DYNACLI_EVENT_LOOP="asyncio:new_event_loop"),
+        )
+
+    def test_sigint(self) -> None:
+        process = Popen(
+            [sys.executable, self._cli, "fetch", "hang"],
+            stdout=PIPE,
+            stderr=PIPE,
+            text=True,
+        )
+        self.assertEqual("started\n", process.stdout.readline())
+        process.send_signal(signal.SIGINT)
+        stdout, stderr = process.communicate(timeout=10)
+        self.assertEqual("cancelled\n", stdout)
+        self.assertIn("KeyboardInterrupt", stderr)
+        self.assertNotEqual(0, process.returncode)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import os
+import sys
+import unittest
+from subprocess import CompletedProcess, run
+
+from .cli_fixture import CLITestCase, write
+
+
+class TestBatch(CLITestCase):
+    """Checks the command lines run from the batch file"""
+
+    def _batch(self, *options: str, lines: str) -> CompletedProcess:
+        return run(
+            [sys.executable, self._cli, "--batch", "-", *options],
+            input=lines,
+            capture_output=True,
+            text=True,
+        )
+
+    def test_same_output(self) -> None:
+        result = self._batch(lines="hello world\n# comment\n\nbye 'the world'\n")
+        self.assertEqual("Hello, world\nBye, the world\n", result.stdout)
+        self.assertEqual(0, result.returncode)
+
+    def test_only_used_features_imported(self) -> None:
+        write(
+            f"{self._tmp.name}/storage/cli/wave.py",
+            f"""
+            open({self._tmp.name!r} + "/wave-imported", "w").close()
+
+
+            def wave(name: str) -> None:
+                \"\"\"
+                Wave
+
+                Args:
+                    name (str): whom to wave to
+                \"\"\"
+            """,
+        )
+        result = self._batch(lines="hello world\nhello again\n")
+        self.assertEqual("Hello, world\nHello, again\n", result.stdout)
+        self.assertFalse(os.path.exists(f"{self._tmp.name}/wave-imported"))
+
+    def test_stop_on_error(self) -> None:
+        result = self._batch(lines="hello\nhello world\n")
+        self.assertEqual("", result.stdout)
+        self.assertIn("line 1: exit status 2", result.stderr)
+        self.assertEqual(2, result.returncode)
+
+    def test_continue_on_error(self) -> None:
+        result = self._batch("--continue-on-error", lines="hello\nhello world\n")
+        self.assertEqual("Hello, world\n", result.stdout)
+        self.assertEqual(2, result.returncode)
+
+    def test_jsonl(self) -> None:
+        result = self._batch(
+            "--jsonl", "--continue-on-error", lines="hello world\nhello\n"
+        )
+        first, second = map(json.loads, result.stdout.splitlines())
+        self.assertEqual(
+            {"line": 1, "status": 0, "stdout": "Hello, world\n", "stderr": ""},
+            {key: first[key] for key in ("line", "status", "stdout", "stderr")},
+        )
+        self.assertEqual(["hello"], second["args"])
+        self.assertEqual(2, second["status"])
+        self.assertIn("the following arguments are required", second["stderr"])
+
+    def test_parallel_in_batch_order(self) -> None:
+        lines = "".join(f"hello {i}\n" for i in range(20))
+        expected = "".join(f"Hello, {i}\n" for i in range(20))
+        for executor in ("thread", "process"):
+            with self.subTest(executor=executor):
+                result = self._batch(
+                    "--parallel", "4", "--executor", executor, lines=lines
+                )
+                self.assertEqual(expected, result.stdout)
+                self.assertEqual(0, result.returncode)
+
+    def test_parallel_stream(self) -> None:
+        result = self._batch(
+            "--parallel", "4", "--stream", "--jsonl", lines="hello a\nbye b\n"
+        )
+        records = map(json.loads, result.stdout.splitlines())
+        self.assertEqual(
+            ["Bye, b\n", "Hello, a\n"], sorted(r["stdout"] for r in records)
+        )
+
+    def test_parallel_stop_on_error(self) -> None:
+        result = self._batch("--parallel", "2", lines="hello\n" * 20)
+        self.assertEqual(1, result.stderr.count("exit status 2"))
+        self.assertEqual(2, result.returncode)
+
+
+if __name__ == "__main__":
+    unittest.main()
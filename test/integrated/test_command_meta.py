@@ -0,0 +1,116 @@
+import json
+import unittest
+from glob import glob
+
+from .cli_fixture import CLITestCase, write
+
+
+class TestCommandMeta(CLITestCase):
+    """Checks the command docstring and signature caching"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        write(
+            f"{self._tmp.name}/storage/cli/tools.py",
+            '''
+            """
+            Decorated commands sharing the wrapper code
+            """
+            import functools
+
+
+            def _logged(func):
+                @functools.wraps(func)
+                def _wrapper(*args, **kwargs):
+                    return func(*args, **kwargs)
+
+                return _wrapper
+
+
+            @_logged
+            def greet(name: str) -> None:
+                """
+                Greet somebody
+
+                Args:
+                    name (str): whom to greet
+                """
+                print(f"Greetings, {name}")
+
+
+            @_logged
+            def count(number: int) -> None:
+                """
+                Count up to the number
+
+                Args:
+                    number (int): where to stop
+                """
+                print(*range(number))
+            ''',
+        )
+
+    def test_decorated_commands(self) -> None:
+        for env in ({}, {"DYNACLI_CACHE_DIR": self._cache_dir}):
+            with self.subTest(env=env):
+                output = self._run("tools", "-h", **env)
+                self.assertIn("Greet somebody", output)
+                self.assertIn("Count up to the number", output)
+                self.assertIn("where to stop", self._run("tools", "count", "-h", **env))
+                self.assertEqual("0 1 2\n", self._run("tools", "count", "3", **env))
+
+    def test_commands_without_wraps(self) -> None:
+        write(
+            f"{self._tmp.name}/storage/cli/deco.py",
+            '''
+            """
+            Commands decorated without functools.wraps
+            """
+
+
+            def _named(func):
+                def _wrapper(*args, **kwargs):
+                    return func(*args, **kwargs)
+
+                _wrapper.__name__ = func.__name__
+                _wrapper.__doc__ = func.__doc__
+                return _wrapper
+
+
+            @_named
+            def alpha(*args: str) -> None:
+                """
+                Alpha command
+                """
+
+
+            @_named
+            def beta(*args: str) -> None:
+                """
+                Beta command
+                """
+            ''',
+        )
+        for _ in range(2):  # building and reading the index
+            output = self._run("deco", "-h", DYNACLI_CACHE_DIR=self._cache_dir)
+            self.assertRegex(output, r"alpha +Alpha command")
+            self.assertRegex(output, r"beta +Beta command")
+
+    def test_docs_from_index(self) -> None:
+        self._run("hello", "-h", DYNACLI_CACHE_DIR=self._cache_dir)
+        (index_file,) = glob(f"{self._cache_dir}/index-*.json")
+        with open(index_file) as f:
+            index = json.load(f)
+        (entry,) = (
+            entry for key, entry in index["commands"].items() if ":hello:hello:" in key
+        )
+        entry["docs"]["param_docs"]["name"] = "indexed name"
+        with open(index_file, "w") as f:
+            json.dump(index, f)
+        self.assertIn(
+            "indexed name", self._run("hello", "-h", DYNACLI_CACHE_DIR=self._cache_dir)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import unittest
+from typing import List
+
+from .cli_fixture import MODULES, CLITestCase, write
+
+
+class TestCompletion(CLITestCase):
+    """Checks the shell completion"""
+
+    def _complete(self, *words: str) -> List[str]:
+        return self._run(
+            "__complete", *words, DYNACLI_CACHE_DIR=self._cache_dir
+        ).splitlines()
+
+    def test_candidates(self) -> None:
+        self.assertEqual(["bye", "heavy", "hello"], self._complete(""))
+        self.assertEqual(["hello"], self._complete("hel"))
+        self.assertEqual(["-h", "--help"], self._complete("hello", "-"))
+        self.assertEqual([], self._complete("unknown", ""))
+
+    def test_no_import(self) -> None:
+        marker = f"{self._tmp.name}/imported"
+        write(
+            f"{self._tmp.name}/storage/cli/touch.py",
+            f"""
+            open({marker!r}, "w").close()
+
+
+            def touch() -> None:
+                \"\"\"
+                Touch
+                \"\"\"
+            """,
+        )
+        self.assertIn("touch", self._complete(""))
+        self.assertIn("touch", self._complete(""))
+        self.assertFalse(os.path.exists(marker))
+
+    def test_invalidated_by_new_module(self) -> None:
+        self._complete("")
+        write(
+            f"{self._tmp.name}/storage/cli/wave.py",
+            MODULES["cli/bye.py"].replace("bye", "wave"),
+        )
+        self.assertEqual(["wave"], self._complete("w"))
+
+    def test_choices(self) -> None:
+        write(
+            f"{self._tmp.name}/storage/cli/wave.py",
+            """
+            from enum import Enum
+            from typing import Literal, Optional
+
+            Hand = Enum("Hand", "LEFT RIGHT")
+
+
+            def wave(mode: Literal["slow", "fast"], hand: Optional[Hand] = None) -> None:
+                \"\"\"
+                Wave
+
+                Args:
+                    mode (str): how to wave
+                    hand (Hand): which hand to wave
+                \"\"\"
+            """,
+        )
+        self.assertEqual(["slow", "fast"], self._complete("wave", ""))
+        self.assertEqual(["LEFT", "RIGHT"], self._complete("wave", "slow", ""))
+
+    def test_scripts(self) -> None:
+        for shell in ("bash", "zsh", "fish"):
+            with self.subTest(shell=shell):
+                script = self._run("--completion", shell)
+                self.assertIn("__complete", script)
+                self.assertIn("testcli", script)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+import unittest
+from subprocess import run
+from typing import List
+
+from .cli_fixture import CLITestCase
+
+
+class TestDirectRoute(CLITestCase):
+    """Checks the command lines run without the state machine"""
+
+    def _get_profile(self, *args: str) -> List[str]:
+        report_file = f"{self._tmp.name}/profile.json"
+        run(
+            [sys.executable, self._cli, *args],
+            capture_output=True,
+            env={**os.environ, "DYNACLI_PROFILE": report_file},
+        )
+        with open(report_file) as f:
+            (main,) = json.load(f)
+        return [child["name"] for child in main["children"]]
+
+    def test_no_state_machine(self) -> None:
+        names = self._get_profile("hello", "world")
+        self.assertIn("route directly", names)
+        self.assertNotIn("state _initial_state", names)
+        self.assertIn("state _initial_state", self._get_profile("hello", "-h"))
+
+    def test_error_message(self) -> None:
+        result = run(
+            [sys.executable, self._cli, "hello"], capture_output=True, text=True
+        )
+        self.assertEqual(2, result.returncode)
+        self.assertEqual(
+            "usage: testcli hello [-h] name\n"
+            "testcli hello: error: the following arguments are required: name\n",
+            result.stderr,
+        )
+        self.assertIn("state _initial_state", self._get_profile("hello"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import sys
+import unittest
+from subprocess import run
+
+from .cli_fixture import CLITestCase, write
+
+
+class TestFileTypes(CLITestCase):
+    """Checks the file arguments opened and mapped for the commands"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        write(
+            f"{self._tmp.name}/storage/cli/files.py",
+            """
+            \"\"\"
+            File arguments
+            \"\"\"
+            from pathlib import Path
+            from typing import BinaryIO, TextIO
+
+            _opened = []
+
+
+            def inspect(data: memoryview, stream: BinaryIO, text: TextIO, where: Path):
+                \"\"\"
+                Print what the arguments are
+
+                Args:
+                    data (memoryview): mapped file
+                    stream (BinaryIO): binary file
+                    text (TextIO): text file
+                    where (Path): path
+                \"\"\"
+                _opened.extend((data.obj, stream))
+                print(type(data.obj).__name__, data.readonly, bytes(data[:5]))
+                print(stream.read(), text.read(), type(where).__name__)
+
+
+            def closed():
+                \"\"\"
+                Print if the files of the previous command are closed
+                \"\"\"
+                print(*(f.closed for f in _opened))
+            """,
+        )
+        self._file = f"{self._tmp.name}/data.txt"
+        write(self._file, "hello world")
+
+    def test_types(self) -> None:
+        result = run(
+            [
+                sys.executable,
+                self._cli,
+                "files",
+                "inspect",
+                self._file,
+                "-",
+                self._file,
+                "x",
+            ],
+            input="from stdin",
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(
+            "mmap True b'hello'\nb'from stdin' hello world PosixPath\n", result.stdout
+        )
+
+    def test_stdin_is_read(self) -> None:
+        result = run(
+            [
+                sys.executable,
+                self._cli,
+                "files",
+                "inspect",
+                "-",
+                self._file,
+                self._file,
+                "x",
+            ],
+            input="piped",
+            capture_output=True,
+            text=True,
+        )
+        self.assertTrue(result.stdout.startswith("bytes True b'piped'\n"))
+
+    def test_closed_after_command(self) -> None:
+        result = run(
+            [sys.executable, self._cli, "--shell"],
+            input=f"files inspect {self._file} {self._file} {self._file} x\nfiles closed\n",
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual("True True", result.stdout.splitlines()[-1])
+
+    def test_missing_file(self) -> None:
+        result = run(
+            [sys.executable, self._cli, "files", "inspect", "missing", "-", "-", "x"],
+            capture_output=True,
+            text=True,
+        )
+        self.assertIn("can't open 'missing': No such file or directory", result.stderr)
+        self.assertEqual(2, result.returncode)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import unittest
+
+from .cli_fixture import MODULES, CLITestCase, write
+
+
+class TestFeatureIndex(CLITestCase):
+    """Checks the persistent feature index"""
+
+    def test_same_help(self) -> None:
+        expected = self._run("-h")
+        self.assertEqual(expected, self._run("-h", DYNACLI_CACHE_DIR=self._cache_dir))
+        self.assertEqual(expected, self._run("-h", DYNACLI_CACHE_DIR=self._cache_dir))
+
+    def test_help_from_index(self) -> None:
+        self._run("-h", DYNACLI_CACHE_DIR=self._cache_dir)
+        self._patch_index("hello.py", "Indexed hello")
+        self.assertIn(
+            "Indexed hello", self._run("-h", DYNACLI_CACHE_DIR=self._cache_dir)
+        )
+
+    def test_invalidated_by_file_change(self) -> None:
+        self._run("-h", DYNACLI_CACHE_DIR=self._cache_dir)
+        self._patch_index("hello.py", "Indexed hello")
+        write(f"{self._tmp.name}/storage/cli/hello.py", MODULES["cli/hello.py"] + "\n")
+        output = self._run("-h", DYNACLI_CACHE_DIR=self._cache_dir)
+        self.assertNotIn("Indexed hello", output)
+        self.assertIn("Say hello", output)
+
+    def test_invalidated_by_new_module(self) -> None:
+        self._run("-h", DYNACLI_CACHE_DIR=self._cache_dir)
+        write(
+            f"{self._tmp.name}/storage/cli/wave.py",
+            MODULES["cli/bye.py"].replace("bye", "wave"),
+        )
+        self.assertIn("wave", self._run("-h", DYNACLI_CACHE_DIR=self._cache_dir))
+
+    def test_execute(self) -> None:
+        self._run("-h", DYNACLI_CACHE_DIR=self._cache_dir)
+        self.assertEqual(
+            "Hello, world\n",
+            self._run("hello", "world", DYNACLI_CACHE_DIR=self._cache_dir),
+        )
+
+    def test_all_listed_once(self) -> None:
+        pack = f"{self._tmp.name}/storage/cli/pack"
+        write(f"{pack}/__init__.py", '__all__ = ["hello", "bye", "wave"]')
+        for name in ("hello", "bye", "wave"):
+            write(f"{pack}/{name}.py", MODULES["cli/bye.py"].replace("bye", name))
+        expected = self._run("pack", "-h")
+        report_file = f"{self._tmp.name}/profile.json"
+        for env, scans in (({}, 0), ({"DYNACLI_CACHE_DIR": self._cache_dir}, 1)):
+            with self.subTest(env=env):
+                self.assertEqual(
+                    expected,
+                    self._run("pack", "-h", DYNACLI_PROFILE=report_file, **env),
+                )
+                with open(report_file) as f:
+                    (main,) = json.load(f)
+                (state,) = (
+                    c
+                    for c in main["children"]
+                    if c["name"] == "state _check_feature_all_"
+                )
+                self.assertEqual(
+                    scans,
+                    sum(
+                        c["count"]
+                        for c in state["children"]
+                        if c["name"] == f"scan {pack}"
+                    ),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from .cli_fixture import CLITestCase, write
+
+
+class TestLazyImports(CLITestCase):
+    """Checks the modules a feature package imports are executed only when used"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        tools = f"{self._tmp.name}/storage/cli/tools"
+        write(f"{tools}/__init__.py", '"""\nTools\n"""\nfrom . import slow\n')
+        write(
+            f"{tools}/quick.py",
+            '''
+            """
+            Quick tools
+            """
+            def ping() -> None:
+                """
+                Ping
+                """
+                print("pong")
+            ''',
+        )
+        write(
+            f"{tools}/slow.py",
+            '''
+            """
+            Slow tools
+            """
+            print("slow executed")
+
+
+            def crunch() -> None:
+                """
+                Crunch
+                """
+            ''',
+        )
+
+    def test_not_executed(self) -> None:
+        self.assertEqual("slow executed\npong\n", self._run("tools", "quick", "ping"))
+        self.assertEqual(
+            "pong\n", self._run("tools", "quick", "ping", DYNACLI_LAZY_IMPORTS="1")
+        )
+
+    def test_same_help(self) -> None:
+        expected = self._run("tools", "-h")
+        self.assertIn("Slow tools", expected)
+        self.assertEqual(expected, self._run("tools", "-h", DYNACLI_LAZY_IMPORTS="1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
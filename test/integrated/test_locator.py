@@ -0,0 +1,71 @@
+import json
+import os
+import unittest
+from typing import List
+
+from .cli_fixture import CLI, CLITestCase, write
+
+
+class TestFeatureLocator(CLITestCase):
+    """Checks listing the feature directories by the fake remote storage"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self._log = f"{self._tmp.name}/requests.log"
+        python_path = os.path.dirname(os.path.abspath(__file__))
+        if os.environ.get("PYTHONPATH"):  # e.g. dynacli is not installed
+            python_path += f"{os.pathsep}{os.environ['PYTHONPATH']}"
+        self._env = {
+            "PYTHONPATH": python_path,
+            "DYNACLI_LOCATOR": "fake_remote:make_locator",
+            "FAKE_REMOTE_LATENCY": "0.05",
+            "FAKE_REMOTE_LOG": self._log,
+        }
+
+    def _get_requests(self) -> List[List[str]]:
+        if not os.path.exists(self._log):
+            return []
+        with open(self._log) as f:
+            return [json.loads(line) for line in f]
+
+    def test_same_help(self) -> None:
+        self.assertEqual(self._run("-h"), self._run("-h", **self._env))
+        self.assertEqual([[f"{self._tmp.name}/storage/cli"]], self._get_requests())
+
+    def test_execute(self) -> None:
+        self.assertEqual("Hello, world\n", self._run("hello", "world", **self._env))
+        self.assertEqual(1, len(self._get_requests()))
+
+    def test_cached(self) -> None:
+        for _ in range(2):
+            self.assertEqual(
+                "Hello, world\n",
+                self._run(
+                    "hello", "world", DYNACLI_CACHE_DIR=self._cache_dir, **self._env
+                ),
+            )
+        self.assertEqual(1, len(self._get_requests()))
+
+    def test_meta_path_opt_in(self) -> None:
+        for marked, n_requests in ((False, 0), (True, 1)):
+            with self.subTest(marked=marked):
+                if os.path.exists(self._log):
+                    os.remove(self._log)
+                write(
+                    self._cli,
+                    CLI.replace(
+                        "from dynacli import main",
+                        "from fake_remote import make_locator\n"
+                        "from dynacli import main\n\n"
+                        "finder = make_locator()\n"
+                        f"finder.dynacli_feature_locator = {marked}\n"
+                        "sys.meta_path.append(finder)",
+                    ),
+                )
+                env = {**self._env, "DYNACLI_LOCATOR": ""}
+                self.assertEqual("Hello, world\n", self._run("hello", "world", **env))
+                self.assertEqual(n_requests, len(self._get_requests()))
+
+
+if __name__ == "__main__":
+    unittest.main()
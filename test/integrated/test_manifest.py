@@ -0,0 +1,121 @@
+import os
+import sys
+import unittest
+from subprocess import run
+
+from dynacli._manifest import load_manifest
+
+from .cli_fixture import CLITestCase, write
+
+
+class TestManifest(CLITestCase):
+    """Checks the CLI running from the frozen manifest"""
+
+    def _compile(self, file_name: str) -> str:
+        manifest = f"{self._tmp.name}/{file_name}"
+        result = run(
+            [
+                sys.executable,
+                "-m",
+                "dynacli.bootstrap._cli",
+                "compile",
+                manifest,
+                f"{self._tmp.name}/storage",
+                "root_packages=cli",
+            ],
+            capture_output=True,
+            text=True,
+        )
+        self.assertIn("Successfully compiled", result.stdout)
+        return manifest
+
+    def test_same_output(self) -> None:
+        for file_name in ("manifest.py", "manifest.marshal"):
+            manifest = self._compile(file_name)
+            for args in (["-h"], ["hello", "-h"], ["hello", "world"]):
+                with self.subTest(manifest=file_name, args=args):
+                    self.assertEqual(
+                        self._run(*args), self._run(*args, DYNACLI_MANIFEST=manifest)
+                    )
+
+    def test_no_discovery(self) -> None:
+        manifest = self._compile("manifest.marshal")
+        os.remove(f"{self._tmp.name}/storage/cli/bye.py")
+        self.assertIn("Say bye", self._run("-h", DYNACLI_MANIFEST=manifest))
+        self.assertEqual(
+            "Hello, world\n", self._run("hello", "world", DYNACLI_MANIFEST=manifest)
+        )
+
+    def test_typed_arguments(self) -> None:
+        write(
+            f"{self._tmp.name}/storage/cli/typed.py",
+            """
+            \"\"\"
+            Typed arguments
+            \"\"\"
+            from dataclasses import dataclass
+            from datetime import date
+            from typing import Iterator, List, Literal, Optional
+
+
+            @dataclass
+            class Point:
+                x: int
+
+
+            def count(values: Iterator[int], mode: Literal["sum", "max"] = "sum") -> None:
+                \"\"\"
+                Count the values
+
+                Args:
+                    values (Iterator[int]): file of the values
+                    mode (str): how to count
+                \"\"\"
+                print(sum(values) if mode == "sum" else max(values))
+
+
+            def convert(
+                day: date, sizes: List[int], point: Point, name: Optional[str] = None
+            ) -> None:
+                \"\"\"
+                Print the converted arguments
+
+                Args:
+                    day (date): day
+                    sizes (list): sizes
+                    point (Point): point
+                    name (str): name
+                \"\"\"
+                print(repr(day), sizes, point, name)
+            """,
+        )
+        values = f"{self._tmp.name}/values"
+        with open(values, "w") as f:
+            f.write("1\n2\n3\n")
+        manifest = self._compile("manifest.marshal")
+        commands = load_manifest(manifest)["tree"]["children"]["typed"]["children"]
+        self.assertIsNotNone(commands["count"]["params"])
+        self.assertIsNotNone(commands["convert"]["params"])
+        for args in (
+            ["typed", "count", "-h"],
+            ["typed", "count", values, "max"],
+            ["typed", "count", values, "min"],
+            ["typed", "convert", "2024-02-29", "1,2", '{"x": 1}'],
+            ["typed", "convert", "yesterday", "1,2", '{"x": 1}', "x"],
+        ):
+            with self.subTest(args=args):
+                expected, result = (
+                    run(
+                        [sys.executable, self._cli, *args],
+                        capture_output=True,
+                        env={**os.environ, **env},
+                        text=True,
+                    )
+                    for env in ({}, {"DYNACLI_MANIFEST": manifest})
+                )
+                self.assertEqual(expected.stdout, result.stdout)
+                self.assertEqual(expected.stderr, result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import sys
+import unittest
+from subprocess import CompletedProcess, run
+
+from .cli_fixture import CLITestCase, write
+
+
+class TestMap(CLITestCase):
+    """Checks the command run for every argument tuple"""
+
+    def _map(self, *args: str, lines: str = "") -> CompletedProcess:
+        return run(
+            [sys.executable, self._cli, "--map", *args],
+            input=lines,
+            capture_output=True,
+            text=True,
+        )
+
+    def test_stdin(self) -> None:
+        result = self._map("-", "hello", lines="world\n'the world'\n")
+        self.assertEqual("Hello, world\nHello, the world\n", result.stdout)
+        self.assertEqual(0, result.returncode)
+
+    def test_glob(self) -> None:
+        for name in ("a.txt", "b.txt", "c.csv"):
+            write(f"{self._tmp.name}/data/{name}", "")
+        result = self._map(f"{self._tmp.name}/data/*.txt", "bye")
+        self.assertEqual(
+            f"Bye, {self._tmp.name}/data/a.txt\nBye, {self._tmp.name}/data/b.txt\n",
+            result.stdout,
+        )
+
+    def test_aggregated_status(self) -> None:
+        result = self._map(
+            "-",
+            "--continue-on-error",
+            "--parallel",
+            "2",
+            "hello",
+            lines="a\n\nb c\nd\n",
+        )
+        self.assertEqual("Hello, a\nHello, d\n", result.stdout)
+        self.assertIn("1 of 3 runs failed", result.stderr)
+        self.assertEqual(2, result.returncode)
+
+    def test_command_resolved_once(self) -> None:
+        imported = f"{self._tmp.name}/imported"
+        for name in ("greet", "wave"):
+            write(
+                f"{self._tmp.name}/storage/cli/{name}.py",
+                f"""
+                with open({imported!r}, "a") as f:
+                    f.write("{name}\\n")
+
+
+                def {name}(name: str) -> None:
+                    \"\"\"
+                    Print the name
+
+                    Args:
+                        name (str): the name
+                    \"\"\"
+                    print(name)
+                """,
+            )
+        result = self._map(
+            "-",
+            "--parallel",
+            "2",
+            "--executor",
+            "process",
+            "greet",
+            lines="a\nb\nc\nd\n",
+        )
+        self.assertEqual("a\nb\nc\nd\n", result.stdout)
+        with open(imported) as f:
+            self.assertEqual("greet\n", f.read())
+
+    def test_no_command(self) -> None:
+        result = self._map("-")
+        self.assertIn("--map needs the command to run", result.stderr)
+        self.assertEqual(2, result.returncode)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import unittest
+from importlib.util import find_spec
+from unittest import skipUnless
+
+from .cli_fixture import CLITestCase, write
+
+
+class TestOutput(CLITestCase):
+    """Checks the values returned by the commands printed by --output"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        write(
+            f"{self._tmp.name}/storage/cli/hosts.py",
+            """
+            from dataclasses import dataclass
+
+
+            @dataclass
+            class Host:
+                name: str
+                cpus: int
+
+
+            def hosts(count: int):
+                \"\"\"
+                List the hosts
+
+                Args:
+                    count (int): number of hosts
+                \"\"\"
+                return [Host(f"host{i}", 2 ** i) for i in range(count)]
+            """,
+        )
+
+    def test_formats(self) -> None:
+        expected = [{"name": "host0", "cpus": 1}, {"name": "host1", "cpus": 2}]
+        self.assertEqual(
+            expected, json.loads(self._run("--output", "json", "hosts", "2"))
+        )
+        self.assertEqual(
+            "name   cpus\n-----  ----\nhost0  1\nhost1  2\n",
+            self._run("hosts", "2", DYNACLI_OUTPUT="table"),
+        )
+
+    @skipUnless(find_spec("yaml"), "PyYAML is not installed")
+    def test_yaml(self) -> None:
+        self.assertEqual(
+            "- name: host0\n  cpus: 1\n- name: host1\n  cpus: 2\n",
+            self._run("--output=yaml", "hosts", "2"),
+        )
+
+    def test_no_output(self) -> None:
+        self.assertEqual("", self._run("hosts", "2"))
+        self.assertEqual(
+            "Hello, world\n", self._run("--output", "json", "hello", "world")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from .cli_fixture import CLI, MODULES, CLITestCase, write
+
+
+class TestParallelScan(CLITestCase):
+    """Checks the concurrent listing of the search path directories"""
+
+    _ROOTS = ("user", "group", "system")
+
+    def setUp(self) -> None:
+        super().setUp()
+        write(
+            self._cli,
+            CLI.replace(
+                'search_path = [f"{cwd}/storage/"]',
+                f"search_path = [f'{{cwd}}/{{root}}/' for root in {self._ROOTS}]",
+            ).replace('main(search_path, ["cli"])', "main(search_path)"),
+        )
+        hello = MODULES["cli/hello.py"]
+        write(f"{self._tmp.name}/user/hello.py", hello)
+        write(f"{self._tmp.name}/group/bye.py", MODULES["cli/bye.py"])
+        write(f"{self._tmp.name}/system/hello.py", hello.replace("Say", "System"))
+        write(f"{self._tmp.name}/system/wave.py", hello.replace("hello", "wave"))
+
+    def test_same_help(self) -> None:
+        expected = self._run("-h")
+        self.assertNotIn("System", expected)
+        for env in ({}, {"DYNACLI_CACHE_DIR": self._cache_dir}):
+            self.assertEqual(expected, self._run("-h", DYNACLI_SCAN_WORKERS="3", **env))
+        self.assertEqual(
+            "Hello, world\n", self._run("hello", "world", DYNACLI_SCAN_WORKERS="2")
+        )
+
+    def test_cached_listing_on_timeout(self) -> None:
+        from dynacli import _index
+
+        paths_ = [f"{self._tmp.name}/{root}/" for root in self._ROOTS]
+        index = _index._FeatureIndex.open(self._cache_dir, paths_, [""], 3, 0.1)
+        self.assertIn("wave", dict(index.iter_modules(paths_)))
+        index.save()
+        time.sleep(0.01)  # a new mtime for the directory
+        write(f"{self._tmp.name}/system/later.py", "")
+        scan_dir = _index._scan_dir
+
+        def _slow_scan_dir(path_: str) -> list:
+            if path_.startswith(f"{self._tmp.name}/system"):
+                time.sleep(0.5)
+            return scan_dir(path_)
+
+        with patch.object(_index, "_scan_dir", _slow_scan_dir):
+            index = _index._FeatureIndex.open(self._cache_dir, paths_, [""], 3, 0.1)
+            modules = dict(index.iter_modules(paths_))
+            self.assertNotIn("later", modules)
+            self.assertIn("wave", modules)
+            time.sleep(0.5)
+            index.save()
+            index = _index._FeatureIndex.open(self._cache_dir, paths_, [""], 3, 0.1)
+            self.assertIn("later", dict(index.iter_modules(paths_)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import json
+import os
+import sys
+import unittest
+from subprocess import run
+
+from .cli_fixture import CLITestCase
+
+
+class TestProfile(CLITestCase):
+    """Checks the startup profiling report"""
+
+    def test_report_file(self) -> None:
+        report_file = f"{self._tmp.name}/profile.json"
+        self._run("hello", "world", DYNACLI_PROFILE=report_file)
+        with open(report_file) as f:
+            (main,) = json.load(f)
+        self.assertEqual("main", main["name"])
+        names = [child["name"] for child in main["children"]]
+        self.assertIn("route directly", names)
+        self.assertIn("parse_args", names)
+        self.assertIn("command hello", names)
+
+    def test_report_stderr(self) -> None:
+        result = run(
+            [sys.executable, self._cli, "-h"],
+            capture_output=True,
+            env={**os.environ, "DYNACLI_PROFILE": "1"},
+            text=True,
+        )
+        self.assertIn("import hello", result.stderr)
+        self.assertIn("add_lazy_parser hello", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import socket
+import sys
+import time
+import unittest
+from io import StringIO
+from subprocess import DEVNULL, Popen, run
+from unittest.mock import patch
+
+from dynacli import _server
+
+from .cli_fixture import MODULES, CLITestCase, write
+
+
+class TestServer(CLITestCase):
+    """Checks the command lines run by the resident server"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self._socket = f"{self._tmp.name}/server.sock"
+        write(
+            f"{self._tmp.name}/storage/cli/parent.py",
+            '''
+            import os
+
+
+            def parent() -> None:
+                """
+                Print the parent process id
+                """
+                print(os.getppid())
+            ''',
+        )
+        server = Popen(
+            [sys.executable, self._cli, "--serve"],
+            env={**os.environ, "DYNACLI_SERVER": self._socket},
+            stderr=DEVNULL,
+        )
+        self._server_pid = server.pid
+        self.addCleanup(server.wait)
+        self.addCleanup(server.terminate)
+        deadline = time.monotonic() + 10
+        while not os.path.exists(self._socket) and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def test_same_output(self) -> None:
+        for args in (["-h"], ["hello", "-h"], ["hello", "world"]):
+            with self.subTest(args=args):
+                self.assertEqual(
+                    self._run(*args), self._run(*args, DYNACLI_SERVER=self._socket)
+                )
+
+    def test_run_by_server(self) -> None:
+        self.assertEqual(
+            f"{self._server_pid}\n", self._run("parent", DYNACLI_SERVER=self._socket)
+        )
+
+    def test_exit_code(self) -> None:
+        result = run(
+            [sys.executable, self._cli, "hello"],
+            capture_output=True,
+            env={**os.environ, "DYNACLI_SERVER": self._socket},
+            text=True,
+        )
+        self.assertEqual(2, result.returncode)
+        self.assertIn("the following arguments are required: name", result.stderr)
+
+    def test_untrusted_server(self) -> None:
+        socket_path = f"{self._tmp.name}/other.sock"
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+            listener.bind(socket_path)
+            listener.listen()
+            with (
+                patch.object(os, "getuid", return_value=os.getuid() + 1),
+                patch("sys.stderr", new_callable=StringIO) as stderr,
+            ):
+                self.assertIsNone(_server.forward(socket_path))
+            self.assertIn("served by another user", stderr.getvalue())
+            conn, _ = listener.accept()
+            with conn:
+                self.assertEqual(b"", conn.recv(1))  # nothing is sent
+
+    def test_reload(self) -> None:
+        self._run("-h", DYNACLI_SERVER=self._socket)
+        write(
+            f"{self._tmp.name}/storage/cli/hello.py",
+            MODULES["cli/hello.py"].replace("Hello,", "Hi,"),
+        )
+        # the search path is checked at most every CHECK_INTERVAL seconds
+        self.assertEqual(
+            "Hello, world\n", self._run("hello", "world", DYNACLI_SERVER=self._socket)
+        )
+        time.sleep(_server.CHECK_INTERVAL)
+        self.assertEqual(
+            "Hi, world\n", self._run("hello", "world", DYNACLI_SERVER=self._socket)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
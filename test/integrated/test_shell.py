@@ -0,0 +1,38 @@
+import sys
+import unittest
+from subprocess import run
+
+from .cli_fixture import CLITestCase
+
+
+class TestShell(CLITestCase):
+    """Checks the command lines run by the shell"""
+
+    def _shell(self, *lines: str) -> str:
+        result = run(
+            [sys.executable, self._cli, "--shell"],
+            input="".join(f"{line}\n" for line in lines),
+            capture_output=True,
+            text=True,
+        )
+        return result.stdout
+
+    def test_same_output(self) -> None:
+        commands = [["-h"], ["hello", "-h"], ["hello", "world"], ["bye", "world"]]
+        self.assertEqual(
+            "".join(self._run(*args) for args in commands),
+            self._shell(*(" ".join(args) for args in commands)),
+        )
+
+    def test_repeated_command(self) -> None:
+        self.assertEqual(
+            "Hello, world\nHello, 'quoted world'\n",
+            self._shell("hello world", "hello \"'quoted world'\""),
+        )
+
+    def test_exit(self) -> None:
+        self.assertEqual("Hello, world\n", self._shell("hello world", "exit", "-h"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import os
+import unittest
+
+from .cli_fixture import CLITestCase
+
+
+class TestStaticHelp(CLITestCase):
+    """Checks the help built from the feature sources"""
+
+    def test_same_help(self) -> None:
+        os.remove(f"{self._tmp.name}/storage/cli/heavy.py")
+        self.assertEqual(self._run("-h"), self._run("-h", DYNACLI_STATIC_HELP="1"))
+
+    def test_no_import(self) -> None:
+        self.assertIn("failed to import heavy", self._run("-h"))
+        self.assertIn(
+            "Needs a dependency which is not installed",
+            self._run("-h", DYNACLI_STATIC_HELP="1", DYNACLI_CACHE_DIR=self._cache_dir),
+        )
+        self.assertIn(
+            "Needs a dependency which is not installed",
+            self._run("-h", DYNACLI_CACHE_DIR=self._cache_dir),
+        )
+
+    def test_execute(self) -> None:
+        self.assertEqual(
+            "Hello, world\n", self._run("hello", "world", DYNACLI_STATIC_HELP="1")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
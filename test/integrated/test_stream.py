@@ -0,0 +1,59 @@
+import json
+import sys
+import unittest
+from subprocess import PIPE, Popen
+
+from .cli_fixture import CLITestCase, write
+
+
+class TestStream(CLITestCase):
+    """Checks the iterator results streamed to stdout"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        write(
+            f"{self._tmp.name}/storage/cli/records.py",
+            """
+            def records(count: int):
+                \"\"\"
+                Generate the records
+
+                Args:
+                    count (int): number of records
+                \"\"\"
+                for i in range(count):
+                    yield {"id": i, "name": f"name, {i}"}
+            """,
+        )
+
+    def test_formats(self) -> None:
+        self.assertEqual("{'id': 0, 'name': 'name, 0'}\n", self._run("records", "1"))
+        self.assertEqual(
+            [{"id": 0, "name": "name, 0"}, {"id": 1, "name": "name, 1"}],
+            [
+                json.loads(line)
+                for line in self._run(
+                    "records", "2", DYNACLI_STREAM_FORMAT="jsonl"
+                ).splitlines()
+            ],
+        )
+        self.assertEqual(
+            'id,name\n0,"name, 0"\n1,"name, 1"\n',
+            self._run("records", "2", DYNACLI_STREAM_FORMAT="csv"),
+        )
+
+    def test_closed_pipe(self) -> None:
+        process = Popen(
+            [sys.executable, self._cli, "records", "100000000"],
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+        process.stdout.readline()
+        process.stdout.close()
+        self.assertEqual(b"", process.stderr.read())
+        self.assertEqual(1, process.wait(timeout=10))
+        process.stderr.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
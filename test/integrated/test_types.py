@@ -0,0 +1,141 @@
+import sys
+import unittest
+from subprocess import run
+
+from .cli_fixture import CLI, CLITestCase, write
+
+
+class TestTypes(CLITestCase):
+    """Checks the argument types converted by the compiled converters"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        write(
+            f"{self._tmp.name}/storage/cli/typed.py",
+            """
+            \"\"\"
+            Typed arguments
+            \"\"\"
+            from dataclasses import dataclass
+            from datetime import date
+            from decimal import Decimal
+            from typing import List, Literal, Optional, Tuple
+
+
+            @dataclass
+            class Point:
+                x: int
+                y: Decimal
+
+
+            def convert(
+                name: Optional[str],
+                sizes: List[int],
+                pair: Tuple[str, float],
+                mode: Literal["fast", "safe"],
+                day: date,
+                price: Decimal,
+                point: Point,
+            ) -> None:
+                \"\"\"
+                Print the converted arguments
+
+                Args:
+                    name (str): name
+                    sizes (list): sizes
+                    pair (tuple): pair
+                    mode (str): mode
+                    day (date): day
+                    price (Decimal): price
+                    point (Point): point
+                \"\"\"
+                print(name, sizes, pair, mode, repr(day), repr(price), point)
+
+
+            def total(*days: date) -> None:
+                \"\"\"
+                Print the number of days
+
+                Args:
+                    *days (date): days
+                \"\"\"
+                print(len(days), days[-1])
+
+
+            def scale(value: float, factor: Optional[int] = None, *tags: str) -> None:
+                \"\"\"
+                Print the scaled value
+
+                Args:
+                    value (float): value
+                    factor (int): factor, 2 if missing
+                    *tags (str): tags
+                \"\"\"
+                print(value * (factor or 2), tags)
+            """,
+        )
+
+    def test_conversion(self) -> None:
+        self.assertEqual(
+            "x [1, 2] ('a', 1.5) safe datetime.date(2024, 2, 29) Decimal('9.99') "
+            "Point(x=1, y=Decimal('0.1'))\n",
+            self._run(
+                "typed",
+                "convert",
+                "x",
+                "1,2",
+                "a,1.5",
+                "safe",
+                "2024-02-29",
+                "9.99",
+                '{"x": 1, "y": "0.1"}',
+            ),
+        )
+
+    def test_invalid_values(self) -> None:
+        valid = ["x", "1", "a,1", "fast", "2024-01-01", "1", '{"x": 1, "y": "1"}']
+        for i, (invalid, error) in enumerate(
+            [
+                ("1,x", "invalid List[int] value: '1,x'"),
+                ("a", "invalid Tuple[str, float] value: 'a'"),
+                ("slow", "invalid choice: 'slow' (choose from 'fast', 'safe')"),
+                ("yesterday", "invalid date value: 'yesterday'"),
+                ("1.2.3", "invalid Decimal value: '1.2.3'"),
+            ],
+            start=1,
+        ):
+            with self.subTest(invalid=invalid):
+                args = [*valid[:i], invalid, *valid[i + 1 :]]
+                result = run(
+                    [sys.executable, self._cli, "typed", "convert", *args],
+                    capture_output=True,
+                    text=True,
+                )
+                self.assertIn(error, result.stderr)
+                self.assertEqual(2, result.returncode)
+
+    def test_many_values(self) -> None:
+        days = [f"2024-01-{day % 28 + 1:02}" for day in range(20000)]
+        self.assertEqual("20000 2024-01-08\n", self._run("typed", "total", *days))
+
+    def test_defaults(self) -> None:
+        self.assertEqual("3.0 ()\n", self._run("typed", "scale", "1.5"))
+        self.assertEqual(
+            "4.5 ('a', 'b')\n", self._run("typed", "scale", "1.5", "3", "a", "b")
+        )
+
+    def test_registered_converter(self) -> None:
+        write(
+            self._cli,
+            CLI.replace(
+                "from dynacli import main",
+                "from datetime import date\n"
+                "from dynacli import main, register_converter\n\n"
+                "register_converter(date, lambda value: date.fromordinal(int(value)))",
+            ),
+        )
+        self.assertEqual("1 0001-01-02\n", self._run("typed", "total", "2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
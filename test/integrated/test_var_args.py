@@ -0,0 +1,173 @@
+import sys
+import unittest
+from subprocess import PIPE, CompletedProcess, Popen, run
+
+from .cli_fixture import CLITestCase, write
+
+
+class TestVarArgs(CLITestCase):
+    """Checks the *args and **kwargs values converted at once"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        write(
+            f"{self._tmp.name}/storage/cli/collect.py",
+            """
+            def collect(name: str, *values: int, **options: int) -> None:
+                \"\"\"
+                Print the sums of the values
+
+                Args:
+                    name (str): name
+                    *values (int): values
+                    **options (int): options
+                \"\"\"
+                print(name, sum(values), sum(options.values()), sorted(options)[:2])
+            """,
+        )
+        write(
+            f"{self._tmp.name}/storage/cli/running.py",
+            """
+            from typing import Iterator
+
+
+            def running(numbers: Iterator[int]) -> None:
+                \"\"\"
+                Print the running totals
+
+                Args:
+                    numbers (Iterator[int]): the file of numbers
+                \"\"\"
+                total = 0
+                for number in numbers:
+                    total += number
+                    print(total, flush=True)
+            """,
+        )
+
+    def _collect(self, *args: str) -> CompletedProcess:
+        return run(
+            [sys.executable, self._cli, *args],
+            capture_output=True,
+            text=True,
+        )
+
+    def test_many_values(self) -> None:
+        values = [str(i) for i in range(50000)]
+        options = [f"key-{i}={i}" for i in range(50000)]
+        self.assertEqual(
+            "x 1249975000 1249975000 ['key_0', 'key_1']\n",
+            self._run("collect", "x", *values, *options),
+        )
+
+    def test_options_among_values(self) -> None:
+        self.assertEqual(
+            "x -1 3 ['a', 'b']\n", self._run("collect", "x", "1", "-2", "a=1", "b=2")
+        )
+        self.assertEqual(
+            "x 3 1 ['a']\n",
+            self._run("--output", "json", "collect", "x", "1", "2", "a=1"),
+        )
+
+    def test_response_files(self) -> None:
+        write(f"{self._tmp.name}/values", "1\n2\r\n\n")
+        self.assertEqual(
+            "x 4 3 ['a', 'b']\n",
+            self._run("collect", "x", f"@{self._tmp.name}/values", "1", "a=1", "b=2"),
+        )
+        result = run(
+            [sys.executable, self._cli, "collect", "x", "@-", "c=3"],
+            input="1\0002\0b=2\0",
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual("x 3 5 ['b', 'c']\n", result.stdout)
+
+    def test_escaped_values(self) -> None:
+        write(
+            f"{self._tmp.name}/storage/cli/mail.py",
+            """
+            def mail(*names: str, **headers: str) -> None:
+                \"\"\"
+                Print the names and the headers
+
+                Args:
+                    *names (str): names
+                    **headers (str): headers
+                \"\"\"
+                print(names, headers)
+            """,
+        )
+        self.assertEqual(
+            "('@alice', '@@bob', '@') {'to': '@team'}\n",
+            self._run("mail", "@@alice", "@@@bob", "@", "to=@team"),
+        )
+
+    def test_args_from(self) -> None:
+        result = run(
+            [sys.executable, self._cli, "collect", "x", "1", "--args-from", "-"],
+            input="".join(f"{i}\n" for i in range(100000)) + "a=1\n",
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual("x 4999950001 1 ['a']\n", result.stdout)
+
+    def test_lazy_iterator(self) -> None:
+        process = Popen(
+            [sys.executable, self._cli, "running", "-"],
+            stdin=PIPE,
+            stdout=PIPE,
+            text=True,
+        )
+        for number, total in [(1, "1\n"), (2, "3\n")]:
+            process.stdin.write(f"{number}\n")
+            process.stdin.flush()
+            self.assertEqual(total, process.stdout.readline())
+        process.stdin.close()
+        self.assertEqual(0, process.wait(timeout=10))
+        process.stdout.close()
+
+    def test_invalid_values(self) -> None:
+        for args, error in [
+            (["1", "x", "a=1"], "argument values: invalid int value: 'x'"),
+            (["1", "a=x"], "argument options <name>=<value>: invalid int value: 'x'"),
+            (["-1", "x", "a=1"], "argument values: invalid int value: 'x'"),
+            (["@missing"], "argument values: can't open 'missing'"),
+            (["--args-from", "missing"], "argument --args-from: can't open 'missing'"),
+        ]:
+            with self.subTest(args=args):
+                result = self._collect("collect", "x", *args)
+                self.assertIn(error, result.stderr)
+                self.assertEqual(2, result.returncode)
+
+    def test_invalid_lazy_item(self) -> None:
+        result = run(
+            [sys.executable, self._cli, "running", "-"],
+            input="1\nx\n",
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual("1\n", result.stdout)
+        self.assertEqual(
+            "usage: testcli running [-h] numbers\n"
+            "testcli running: error: invalid int value: 'x'\n",
+            result.stderr,
+        )
+        self.assertEqual(2, result.returncode)
+
+    def test_invalid_values_from_stdin(self) -> None:
+        for args in (["@-"], ["--args-from", "-"]):
+            with self.subTest(args=args):
+                result = run(
+                    [sys.executable, self._cli, "collect", "x", *args],
+                    input="1\n2\nx\n",
+                    capture_output=True,
+                    text=True,
+                )
+                self.assertEqual("", result.stdout)
+                self.assertIn("invalid int value: 'x'", result.stderr)
+                self.assertEqual(2, result.returncode)
+
+
+if __name__ == "__main__":
+    unittest.main()